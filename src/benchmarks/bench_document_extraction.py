@@ -0,0 +1,88 @@
+"""
+Benchmark CV text extraction through a temporary file vs. straight from memory.
+
+Usage (from the src/ directory):
+    python -m benchmarks.bench_document_extraction [--iterations 200] [--pages 3]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+import docx
+import fitz  # PyMuPDF
+
+from modules.document.document import extract_text_from_docx, extract_text_from_pdf
+
+SAMPLE_LINE = "Senior software engineer with experience in Python, FastAPI, distributed systems and cloud infrastructure."
+
+def make_pdf(pages: int) -> bytes:
+    """Build a synthetic text PDF with the given number of pages"""
+    doc = fitz.open()
+    for page_number in range(pages):
+        page = doc.new_page()
+        text = "\n".join(f"{page_number}.{line} {SAMPLE_LINE}" for line in range(40))
+        page.insert_textbox(fitz.Rect(36, 36, 576, 806), text, fontsize=8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+def make_docx(paragraphs: int) -> bytes:
+    """Build a synthetic DOCX with the given number of paragraphs"""
+    document = docx.Document()
+    for number in range(paragraphs):
+        document.add_paragraph(f"{number} {SAMPLE_LINE}")
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def extract_via_tempfile(data: bytes, suffix: str) -> str:
+    """The previous implementation: write to a temp file, reopen by path, unlink"""
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+        temp_file.write(data)
+        temp_path = temp_file.name
+    try:
+        if suffix == ".pdf":
+            doc = fitz.open(temp_path)
+            text = "".join(page.get_text() for page in doc)
+            doc.close()
+        else:
+            text = "\n".join(para.text for para in docx.Document(temp_path).paragraphs)
+        return text
+    finally:
+        os.remove(temp_path)
+
+def extract_in_memory(data: bytes, suffix: str) -> str:
+    """The current implementation"""
+    if suffix == ".pdf":
+        return extract_text_from_pdf(data)
+    return extract_text_from_docx(data)
+
+def run(label: str, data: bytes, suffix: str, iterations: int) -> None:
+    for name, func in (("tempfile", extract_via_tempfile), ("in-memory", extract_in_memory)):
+        func(data, suffix)  # warm-up
+        start = time.perf_counter()
+        for _ in range(iterations):
+            func(data, suffix)
+        elapsed = time.perf_counter() - start
+        disk_io = 2 * len(data) * iterations if name == "tempfile" else 0
+        print(
+            f"{label:<6} {name:<10} {elapsed / iterations * 1000:8.3f} ms/doc  "
+            f"disk I/O {disk_io / (1024 * 1024):8.2f} MB total"
+        )
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=3)
+    args = parser.parse_args()
+
+    pdf = make_pdf(args.pages)
+    docx_data = make_docx(args.pages * 40)
+    print(f"PDF: {len(pdf)} bytes, DOCX: {len(docx_data)} bytes, {args.iterations} iterations\n")
+    run("PDF", pdf, ".pdf", args.iterations)
+    run("DOCX", docx_data, ".docx", args.iterations)
+
+if __name__ == "__main__":
+    main()
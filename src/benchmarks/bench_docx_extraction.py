@@ -0,0 +1,85 @@
+"""
+Benchmark DOCX text extraction: python-docx object model vs. streaming XML.
+
+Builds a small corpus of synthetic CVs (plain, with tables, with large embedded
+images) and reports time per document and peak Python memory for both
+extractors.
+
+Usage (from the src/ directory):
+    python -m benchmarks.bench_docx_extraction [--iterations 50]
+"""
+import argparse
+import io
+import os
+import struct
+import time
+import tracemalloc
+import zlib
+
+import docx
+from docx.shared import Inches
+
+from modules.document.docx_stream import extract_docx_text_streaming
+from modules.document.document import extract_docx_text_full
+
+SAMPLE_LINE = "Led a team of five engineers delivering a Python/FastAPI platform used by 2M users."
+
+def make_png(width: int, height: int) -> bytes:
+    """Build an incompressible RGB PNG (random pixels) of the given size"""
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    rows = b"".join(b"\x00" + os.urandom(width * 3) for _ in range(height))
+    header = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(rows, 1)) + chunk(b"IEND", b"")
+
+def make_cv(paragraphs: int, tables: int = 0, images: int = 0) -> bytes:
+    """Build a synthetic DOCX CV"""
+    document = docx.Document()
+    document.add_heading("Jane Doe - Senior Software Engineer", level=1)
+    for number in range(paragraphs):
+        document.add_paragraph(f"{number}. {SAMPLE_LINE}", style="List Bullet")
+    for _ in range(tables):
+        table = document.add_table(rows=6, cols=3)
+        for row in table.rows:
+            for cell in row.cells:
+                cell.text = "Python, SQL, Kubernetes"
+    for _ in range(images):
+        document.add_picture(io.BytesIO(make_png(600, 400)), width=Inches(4))
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def measure(func, data: bytes, iterations: int):
+    func(data)  # warm-up
+    start = time.perf_counter()
+    for _ in range(iterations):
+        text = func(data)
+    elapsed = (time.perf_counter() - start) / iterations
+
+    tracemalloc.start()
+    func(data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak, len(text)
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=50)
+    args = parser.parse_args()
+
+    corpus = {
+        "short": make_cv(30),
+        "long": make_cv(400),
+        "tables": make_cv(60, tables=5),
+        "images": make_cv(60, images=6),
+    }
+
+    print(f"{'document':<8} {'size':>9}  {'extractor':<10} {'ms/doc':>8} {'peak KB':>9} {'chars':>7}")
+    for name, data in corpus.items():
+        for label, func in (("python-docx", extract_docx_text_full), ("streaming", extract_docx_text_streaming)):
+            elapsed, peak, chars = measure(func, data, args.iterations)
+            print(f"{name:<8} {len(data):>9}  {label:<10} {elapsed * 1000:8.2f} {peak / 1024:9.0f} {chars:>7}")
+
+if __name__ == "__main__":
+    main()
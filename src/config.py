@@ -1,83 +1,445 @@
+"""
+Application settings.
+
+Settings are read from the environment (and the .env file) once, into a
+frozen, typed Settings object shared by the whole process. Call
+get_settings() to read them; reload_settings() re-reads the environment and is
+only called explicitly (on SIGHUP, see main.py), never per request.
+
+Values consumed while the application starts (rate limits, CORS, cache and
+pool sizes) keep their startup values until the process is restarted.
+"""
+import logging
 import os
-from dotenv import load_dotenv
-from typing import List
+import threading
+from dataclasses import dataclass, field
+from types import MappingProxyType
+from typing import Mapping, Optional, Tuple
+
+from dotenv import dotenv_values, load_dotenv
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Variables set in the process environment (container, orchestrator) before
+# the .env file was read; the .env file never overrides them
+_PROCESS_ENV_KEYS = frozenset(os.environ)
 
-try:
-    from exa_py import Exa
-except ImportError:
-    print("Error: The 'exa_py' package is not installed. Please install it using: pip install exa-py")
-    Exa = None
+JOB_ANALYSIS_MODES = ("skip", "structured")
 
-def get_cors_origins() -> List[str]:
+def get_cors_origins() -> Tuple[str, ...]:
     """
-    Get the list of allowed CORS origins from environment variable.
+    Get the allowed CORS origins from environment variable.
     Format: comma-separated list of origins, e.g., "http://localhost:3000,https://example.com"
-    
+
     Returns:
-        List of allowed origins or ["*"] as fallback
+        Allowed origins or ("*",) as fallback
     """
     origins_str = os.getenv("ALLOWED_ORIGINS", "*")
-    
+
     # If the value is "*", return it as a wildcard
     if origins_str == "*":
-        return ["*"]
-        
+        return ("*",)
+
     # Otherwise, split by comma and strip whitespace
-    return [origin.strip() for origin in origins_str.split(",") if origin.strip()]
+    return tuple(origin.strip() for origin in origins_str.split(",") if origin.strip())
+
+def _env_bool(name: str, default: str) -> bool:
+    return os.getenv(name, default).lower() == "true"
+
+
+@dataclass(frozen=True)
+class CorsSettings:
+    allow_origins: Tuple[str, ...]
+    allow_credentials: bool
+    allow_methods: Tuple[str, ...]
+    allow_headers: Tuple[str, ...]
+
+
+@dataclass(frozen=True)
+class RateLimitSettings:
+    # Global limit (applied to all endpoints if not overridden)
+    global_limit: str
+    # Endpoint-specific limits (these override the global limit)
+    endpoints: Mapping[str, str]
+
+
+@dataclass(frozen=True)
+class OpenRouterPoolSettings:
+    max_connections: int
+    max_keepalive_connections: int
+    keepalive_expiry: float
+
+
+@dataclass(frozen=True)
+class OpenRouterSettings:
+    api_key: Optional[str] = field(repr=False)
+    model: str
+    api_url: str
+    timeout: float
+    http2: bool
+    # Shared connection pool used by all OpenRouter calls
+    pool: OpenRouterPoolSettings
+
+
+@dataclass(frozen=True)
+class DocumentCacheSettings:
+    max_entries: int
+    # Directory for the compressed on-disk tier; empty disables it
+    disk_dir: str
+    max_disk_entries: int
+
+
+@dataclass(frozen=True)
+class DocumentSettings:
+    # Number of worker processes; 0 runs extraction inline on the event loop
+    workers: int
+    # Wall-clock limit per document before its worker is killed
+    task_timeout: float
+    # Address space ceiling per worker process (0 disables the limit)
+    memory_limit_mb: int
+    max_pages: int
+    # Stop extracting a PDF once this many characters are collected
+    # (~4 characters per token); 0 extracts everything
+    max_chars: int
+    # Extract PDF page chunks in parallel across the worker processes
+    pdf_parallel: bool
+    pdf_chunk_pages: int
+    # Extracted text cache keyed by the SHA-256 of the uploaded file
+    cache: DocumentCacheSettings
+
+
+@dataclass(frozen=True)
+class ImageCacheSettings:
+    max_entries: int
+    # Images whose 256-bit dHashes differ in at most max_distance bits (and
+    # whose aspect ratios match) share a result
+    max_distance: int
+
+
+@dataclass(frozen=True)
+class ImageSettings:
+    # Downscale so the image fits both limits (0 disables a limit)
+    max_side: int
+    max_pixels: int
+    # Job postings are text, colour rarely helps the model read them
+    grayscale: bool
+    # Re-encoding format ("jpeg" or "webp") and quality
+    format: str
+    quality: int
+    # Screenshots accepted for one job description, and how many images
+    # the model takes per request (more are combined into composite tiles)
+    max_uploads: int
+    model_max_images: int
+    # Cache of image analyses keyed by perceptual hash
+    cache: ImageCacheSettings
+
+
+@dataclass(frozen=True)
+class PromptSettings:
+    # Most tokens a generation prompt may use; CV, job description and company
+    # sections are trimmed (company first, job description last) to fit
+    input_budget_tokens: int
+    # Characters per token used to estimate prompt sizes
+    chars_per_token: float
+    # Output tokens allowed per word of the requested word limit
+    output_tokens_per_word: float
+    # CV items (bullets, sentences) most relevant to the job description kept
+    # in the prompt, 0 sends the whole CV
+    cv_top_k: int
+    # Leading CV lines (name, title) always kept
+    cv_header_lines: int
+
+
+@dataclass(frozen=True)
+class CoverLetterCacheSettings:
+    # Generated letters keyed by a hash of the complete model request; a
+    # repeated request within ttl seconds gets the same letter
+    max_entries: int
+    ttl: float
+    # Results of requests sent with an Idempotency-Key, replayed to retries
+    # with the same key for idempotency_ttl seconds
+    idempotency_ttl: float
+
+
+@dataclass(frozen=True)
+class BatchSettings:
+    # Most job postings accepted in one batch request
+    max_items: int
+    # Batch items (company lookup and letter generation) processed at once
+    concurrency: int
+
+
+@dataclass(frozen=True)
+class RetrySettings:
+    max_attempts: int
+    base_delay: float
+    max_delay: float
+    # Longest upstream Retry-After we wait for; longer ones fail the call
+    max_retry_after: float
+    # Per-process cap on retries per upstream within a sliding window
+    budget_max_retries: int
+    budget_window_seconds: float
+
+
+@dataclass(frozen=True)
+class JobAnalysisCacheSettings:
+    max_entries: int
+    # Entries are fresh for ttl seconds, then served for up to stale_ttl more
+    # seconds while they are refreshed in the background
+    ttl: float
+    stale_ttl: float
+
 
-def load_config():
-    """Load and return application configuration from environment variables"""
-    # Load environment variables
+@dataclass(frozen=True)
+class JobAnalysisSettings:
+    # "skip" omits the analysis call and prompts with the raw job description,
+    # "structured" runs it and prompts with the structured requirements instead
+    mode: str
+    # Analyses keyed by the normalized job description and model
+    cache: JobAnalysisCacheSettings
+
+
+@dataclass(frozen=True)
+class CompanyCacheSettings:
+    max_entries: int
+    # Profiles are fresh for ttl seconds, then served for up to stale_ttl
+    # more seconds while a background refresh runs
+    ttl: float
+    stale_ttl: float
+    # How long "no results" answers are cached
+    negative_ttl: float
+    # gzip JSON Lines file saved on shutdown and loaded on startup; empty disables it
+    persist_path: str
+    # Snapshot written by the prefetch command, loaded on startup; empty disables it
+    snapshot_path: str
+
+
+@dataclass(frozen=True)
+class CompanyNamesSettings:
+    # "Name | Alias | ..." per line; empty uses the bundled list
+    seed_file: str
+    # Companies learned from lookups are added until the index is full
+    max_entries: int
+    # Lowest 1 - edit distance / length accepted as a typo of a known name
+    min_similarity: float
+
+
+@dataclass(frozen=True)
+class CompanySettings:
+    # Upper bound on the company lookup stage of a generation request;
+    # the letter is generated without company info if it is exceeded
+    stage_timeout: float
+    # Company profiles looked up with Exa, cached by canonical name
+    cache: CompanyCacheSettings
+    # Index mapping company name variants onto one canonical company
+    names: CompanyNamesSettings
+
+
+@dataclass(frozen=True)
+class ExaSettings:
+    api_key: Optional[str] = field(repr=False)
+    # Per-attempt timeout and size of the thread pool the blocking SDK runs on
+    timeout: float
+    max_workers: int
+
+
+@dataclass(frozen=True)
+class Settings:
+    env: str
+    debug: bool
+    cors: CorsSettings
+    rate_limits: RateLimitSettings
+    openrouter: OpenRouterSettings
+    # CV document extraction (runs in a pool of worker processes)
+    document: DocumentSettings
+    # Preprocessing of job description images before vision calls
+    image: ImageSettings
+    # Size control of the cover letter prompt and completion
+    prompt: PromptSettings
+    # Generated letters reused for repeated and retried requests
+    cover_letter_cache: CoverLetterCacheSettings
+    # Batch generation: one CV, many job postings
+    batch: BatchSettings
+    # Retry policy for external API calls (OpenRouter, Exa)
+    retry: RetrySettings
+    job_analysis: JobAnalysisSettings
+    company: CompanySettings
+    exa: ExaSettings
+
+
+def load_settings() -> Settings:
+    """Read the application settings from environment variables (and the .env file)"""
+    # Load environment variables; variables already set take precedence
     load_dotenv()
-    
+
     # Determine the environment
     env = os.getenv("APP_ENV", "development").lower()
-    
-    config = {
-        # Application environment
-        "env": env,
-        "debug": env != "production",
-        
-        # CORS configuration
-        "cors": {
-            "allow_origins": get_cors_origins(),
-            "allow_credentials": True,
-            "allow_methods": ["*"] if env != "production" else ["GET", "POST"],
-            "allow_headers": ["*"],
-        },
-        
-        # Rate limiting configuration - different limits based on environment
-        "rate_limits": {
-            # Global limit (applied to all endpoints if not overridden)
-            "global": "60/minute" if env == "development" else "30/minute",
-            
-            # Endpoint-specific limits (these override the global limit)
-            "endpoints": {
+
+    job_analysis_mode = os.getenv("JOB_ANALYSIS_MODE", "skip").lower()
+    if job_analysis_mode not in JOB_ANALYSIS_MODES:
+        raise ValueError(
+            f"JOB_ANALYSIS_MODE must be one of {', '.join(JOB_ANALYSIS_MODES)}, got {job_analysis_mode!r}"
+        )
+
+    return Settings(
+        env=env,
+        debug=env != "production",
+
+        cors=CorsSettings(
+            allow_origins=get_cors_origins(),
+            allow_credentials=True,
+            allow_methods=("*",) if env != "production" else ("GET", "POST"),
+            allow_headers=("*",),
+        ),
+
+        # Rate limiting - different limits based on environment
+        rate_limits=RateLimitSettings(
+            global_limit="60/minute" if env == "development" else "30/minute",
+            endpoints=MappingProxyType({
                 # Main endpoint - more restricted due to resource usage
                 "generate_cover_letter": "10/hour" if env == "development" else "5/hour",
-                
+
                 # Analysis endpoints
                 "analyze_company": "30/hour" if env == "development" else "15/hour",
                 "analyze_job_desc_image": "20/hour" if env == "development" else "10/hour",
-            }
-        },
-        
-        # OpenRouter API configuration
-        "openrouter": {
-            "api_key": os.getenv("OPENROUTER_API_KEY"),
-            "model": os.getenv("OPENROUTER_MODEL", "google/gemini-2.0-flash-001"),
-            "api_url": "https://openrouter.ai/api/v1/chat/completions"
-        },
-        
-        # Exa AI configuration
-        "exa": {
-            "api_key": os.getenv("EXA_API_KEY"),
-            "client": None  # Will be initialized if API key exists
-        }
-    }
-    
-    # Initialize Exa client if API key exists and Exa module is available
-    if config["exa"]["api_key"] and Exa is not None:
-        config["exa"]["client"] = Exa(api_key=config["exa"]["api_key"])
-    
-    return config 
\ No newline at end of file
+            }),
+        ),
+
+        openrouter=OpenRouterSettings(
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            model=os.getenv("OPENROUTER_MODEL", "google/gemini-2.0-flash-001"),
+            api_url="https://openrouter.ai/api/v1/chat/completions",
+            timeout=float(os.getenv("OPENROUTER_TIMEOUT", "30")),
+            http2=_env_bool("OPENROUTER_HTTP2", "true"),
+            pool=OpenRouterPoolSettings(
+                max_connections=int(os.getenv("OPENROUTER_MAX_CONNECTIONS", "100")),
+                max_keepalive_connections=int(os.getenv("OPENROUTER_MAX_KEEPALIVE_CONNECTIONS", "20")),
+                keepalive_expiry=float(os.getenv("OPENROUTER_KEEPALIVE_EXPIRY", "30")),
+            ),
+        ),
+
+        document=DocumentSettings(
+            workers=int(os.getenv("DOCUMENT_WORKERS", "2")),
+            task_timeout=float(os.getenv("DOCUMENT_TASK_TIMEOUT", "20")),
+            memory_limit_mb=int(os.getenv("DOCUMENT_MEMORY_LIMIT_MB", "1024")),
+            max_pages=int(os.getenv("DOCUMENT_MAX_PAGES", "50")),
+            max_chars=int(os.getenv("DOCUMENT_MAX_CHARS", "30000")),
+            pdf_parallel=_env_bool("DOCUMENT_PDF_PARALLEL", "true"),
+            pdf_chunk_pages=int(os.getenv("DOCUMENT_PDF_CHUNK_PAGES", "4")),
+            cache=DocumentCacheSettings(
+                max_entries=int(os.getenv("DOCUMENT_CACHE_MAX_ENTRIES", "256")),
+                disk_dir=os.getenv("DOCUMENT_CACHE_DIR", ""),
+                max_disk_entries=int(os.getenv("DOCUMENT_CACHE_MAX_DISK_ENTRIES", "10000")),
+            ),
+        ),
+
+        image=ImageSettings(
+            max_side=int(os.getenv("IMAGE_MAX_SIDE", "2048")),
+            max_pixels=int(os.getenv("IMAGE_MAX_PIXELS", str(1536 * 1536))),
+            grayscale=_env_bool("IMAGE_GRAYSCALE", "true"),
+            format=os.getenv("IMAGE_FORMAT", "jpeg").lower(),
+            quality=int(os.getenv("IMAGE_QUALITY", "80")),
+            max_uploads=int(os.getenv("IMAGE_MAX_UPLOADS", "5")),
+            model_max_images=int(os.getenv("IMAGE_MODEL_MAX_IMAGES", "5")),
+            cache=ImageCacheSettings(
+                max_entries=int(os.getenv("IMAGE_CACHE_MAX_ENTRIES", "512")),
+                max_distance=int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "12")),
+            ),
+        ),
+
+        prompt=PromptSettings(
+            input_budget_tokens=int(os.getenv("PROMPT_INPUT_TOKEN_BUDGET", "6000")),
+            chars_per_token=float(os.getenv("PROMPT_CHARS_PER_TOKEN", "4")),
+            output_tokens_per_word=float(os.getenv("PROMPT_OUTPUT_TOKENS_PER_WORD", "1.6")),
+            cv_top_k=int(os.getenv("PROMPT_CV_TOP_K", "25")),
+            cv_header_lines=int(os.getenv("PROMPT_CV_HEADER_LINES", "3")),
+        ),
+
+        cover_letter_cache=CoverLetterCacheSettings(
+            max_entries=int(os.getenv("COVER_LETTER_CACHE_MAX_ENTRIES", "256")),
+            ttl=float(os.getenv("COVER_LETTER_CACHE_TTL", "600")),
+            idempotency_ttl=float(os.getenv("COVER_LETTER_IDEMPOTENCY_TTL", "600")),
+        ),
+
+        batch=BatchSettings(
+            max_items=int(os.getenv("BATCH_MAX_ITEMS", "50")),
+            concurrency=int(os.getenv("BATCH_CONCURRENCY", "4")),
+        ),
+
+        retry=RetrySettings(
+            max_attempts=int(os.getenv("RETRY_MAX_ATTEMPTS", "3")),
+            base_delay=float(os.getenv("RETRY_BASE_DELAY", "1.0")),
+            max_delay=float(os.getenv("RETRY_MAX_DELAY", "10.0")),
+            max_retry_after=float(os.getenv("RETRY_MAX_RETRY_AFTER", "30")),
+            budget_max_retries=int(os.getenv("RETRY_BUDGET_MAX_RETRIES", "20")),
+            budget_window_seconds=float(os.getenv("RETRY_BUDGET_WINDOW_SECONDS", "60")),
+        ),
+
+        job_analysis=JobAnalysisSettings(
+            mode=job_analysis_mode,
+            cache=JobAnalysisCacheSettings(
+                max_entries=int(os.getenv("JOB_ANALYSIS_CACHE_MAX_ENTRIES", "1024")),
+                ttl=float(os.getenv("JOB_ANALYSIS_CACHE_TTL", "21600")),
+                stale_ttl=float(os.getenv("JOB_ANALYSIS_CACHE_STALE_TTL", "86400")),
+            ),
+        ),
+
+        company=CompanySettings(
+            stage_timeout=float(os.getenv("COMPANY_STAGE_TIMEOUT", "8")),
+            cache=CompanyCacheSettings(
+                max_entries=int(os.getenv("COMPANY_CACHE_MAX_ENTRIES", "2048")),
+                ttl=float(os.getenv("COMPANY_CACHE_TTL", "604800")),
+                stale_ttl=float(os.getenv("COMPANY_CACHE_STALE_TTL", "2592000")),
+                negative_ttl=float(os.getenv("COMPANY_CACHE_NEGATIVE_TTL", "3600")),
+                persist_path=os.getenv("COMPANY_CACHE_FILE", ""),
+                snapshot_path=os.getenv("COMPANY_CACHE_SNAPSHOT", ""),
+            ),
+            names=CompanyNamesSettings(
+                seed_file=os.getenv("COMPANY_NAMES_FILE", ""),
+                max_entries=int(os.getenv("COMPANY_NAME_INDEX_MAX_ENTRIES", "20000")),
+                min_similarity=float(os.getenv("COMPANY_NAME_MIN_SIMILARITY", "0.85")),
+            ),
+        ),
+
+        exa=ExaSettings(
+            api_key=os.getenv("EXA_API_KEY"),
+            timeout=float(os.getenv("EXA_TIMEOUT", "10")),
+            max_workers=int(os.getenv("EXA_MAX_WORKERS", "8")),
+        ),
+    )
+
+# Process-wide settings, loaded on first use
+_settings: Optional[Settings] = None
+_settings_lock = threading.Lock()
+
+def get_settings() -> Settings:
+    """Return the process-wide settings, loading them on first use"""
+    global _settings
+    if _settings is None:
+        with _settings_lock:
+            if _settings is None:
+                _settings = load_settings()
+    return _settings
+
+def reload_settings() -> Settings:
+    """
+    Re-read the settings from the environment and the .env file.
+
+    Requests already running keep the settings they started with. Values the
+    .env file sets override the ones it set before, but, as at startup, not
+    variables from the process environment.
+
+    Returns:
+        The new settings
+    """
+    global _settings
+    # Later edits of the .env file must win over the values loaded before
+    for key, value in dotenv_values().items():
+        if key not in _PROCESS_ENV_KEYS and value is not None:
+            os.environ[key] = value
+    settings = load_settings()
+    with _settings_lock:
+        _settings = settings
+    logger.info(f"Settings reloaded ({settings.env} environment)")
+    return settings
@@ -1,29 +1,49 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import PlainTextResponse, HTMLResponse
+from fastapi.responses import PlainTextResponse, HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+import asyncio
+import json
 import logging
+import math
 import os
+import signal
 import uuid
 from dotenv import load_dotenv
+from slowapi.errors import RateLimitExceeded
 from fastapi import FastAPI, Form, HTTPException, UploadFile, File, Request
-from typing import Optional, List
+from typing import Any, Dict, Optional, List
 import time
+from contextlib import asynccontextmanager
 from contextvars import ContextVar
 
 # Internal imports
-from config import load_config
-from modules.document.document import extract_docs
-from modules.job.job import analyze_job_description_image, analyze_job_requirements
-from modules.company.company import analyze_company_info
-from modules.cover_letter.cover_letter import generate_cover_letter
+from config import get_settings, reload_settings
+from modules.document.document import extract_docs, upload_digest
+from modules.document.pool import start_extraction_pool, shutdown_extraction_pool
+from modules.job.job import analyze_job_description_images, analyze_job_requirements
+from modules.company.cache import load_company_cache, save_company_cache
+from modules.company.company import analyze_company_info, shutdown_exa_executor
+from modules.cover_letter.cache import get_idempotency_store, idempotency_key
+from modules.cover_letter.cover_letter import CoverLetterStreamFormatter, generate_cover_letter, stream_cover_letter
 from modules.errors import register_exception_handlers
 from modules.errors.exceptions import ValidationError, DocumentProcessingError
 # Add monitoring imports
 from modules.monitoring import setup_metrics
-from modules.monitoring.prometheus import StepTimer, COVER_LETTER_GENERATED, API_ERRORS, increment_counter_with_exemplar
-from modules.rate_limit import setup_rate_limiting, limiter
+from modules.monitoring.prometheus import (
+    COVER_LETTER_FIRST_BYTE,
+    COVER_LETTER_GENERATED,
+    API_ERRORS,
+    StepTimer,
+    UpstreamCallTracker,
+    increment_counter_with_exemplar,
+)
+from modules.rate_limit import setup_rate_limiting, limiter, hit_shared_limit
+from modules.clients import start_clients, close_clients, refresh_clients
+from modules.pipeline import Stage, run_stages
+from modules.prompt import select_relevant_cv
+from modules.upload import FieldRule, UploadGuardMiddleware
 
 # Import routers
 from modules.job import router as job_router
@@ -54,8 +74,36 @@ for handler in logging.getLogger().handlers:
     ))
     handler.addFilter(RequestIDFilter())
 
-# Load configuration
-config = load_config()
+# Settings consumed at startup; request handlers call get_settings() so
+# that a reload (SIGHUP) applies to the requests that follow
+settings = get_settings()
+
+# Define allowed file types and size limits
+ALLOWED_CV_EXTENSIONS = ['.pdf', '.docx', '.doc']
+ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
+ALLOWED_CV_CONTENT_TYPES = [
+    'application/pdf', 
+    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+    'application/msword'
+]
+ALLOWED_IMAGE_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/jpg']
+MAX_CV_SIZE_MB = 3
+MAX_IMAGE_SIZE_MB = 5
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+# Limits enforced by UploadGuardMiddleware while uploads stream in
+CV_UPLOAD_RULE = FieldRule(max_bytes=MAX_CV_SIZE_MB * 1024 * 1024, allowed_types=["pdf", "docx"])
+IMAGE_UPLOAD_RULE = FieldRule(
+    max_bytes=MAX_IMAGE_SIZE_MB * 1024 * 1024,
+    allowed_types=["png", "jpeg"],
+    max_files=settings.image.max_uploads
+)
+UPLOAD_RULES = {
+    "/api/generate_cover_letter": {"cv_file": CV_UPLOAD_RULE, "job_desc_image": IMAGE_UPLOAD_RULE},
+    "/api/generate_cover_letter/stream": {"cv_file": CV_UPLOAD_RULE, "job_desc_image": IMAGE_UPLOAD_RULE},
+    "/api/generate_cover_letter/batch": {"cv_file": CV_UPLOAD_RULE},
+    "/job/analyze_job_desc_image": {"job_desc_image": IMAGE_UPLOAD_RULE},
+}
 
 # Create request ID middleware
 async def request_id_middleware(request: Request, call_next):
@@ -81,11 +129,53 @@ async def request_id_middleware(request: Request, call_next):
         # Reset context var
         request_id_ctx_var.reset(token)
 
+def reload_configuration() -> None:
+    """Re-read the settings and refresh the clients that depend on them (on SIGHUP)"""
+    try:
+        reload_settings()
+        refresh_clients()
+    except Exception as e:
+        # Keep serving with the previous settings
+        logger.error(f"Could not reload configuration: {str(e)}")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: create long-lived resources on startup and
+    release them on shutdown.
+    """
+    # Exa client and the shared keep-alive connection pool for all OpenRouter calls
+    await start_clients()
+    # Warm document extraction worker processes so the first CV doesn't pay for their startup
+    await start_extraction_pool()
+    # Company profiles cached by a previous run
+    await load_company_cache()
+    
+    # Settings are only re-read when asked to: `kill -HUP <pid>`
+    loop = asyncio.get_running_loop()
+    try:
+        loop.add_signal_handler(signal.SIGHUP, reload_configuration)
+        reload_on_sighup = True
+    except (AttributeError, NotImplementedError, RuntimeError):
+        # No SIGHUP on Windows, and handlers can only be set from the main thread
+        logger.info("Configuration reload on SIGHUP is not available")
+        reload_on_sighup = False
+    try:
+        yield
+    finally:
+        if reload_on_sighup:
+            loop.remove_signal_handler(signal.SIGHUP)
+        await save_company_cache()
+        shutdown_exa_executor()
+        shutdown_extraction_pool()
+        await close_clients()
+
 # Create FastAPI app
 app = FastAPI(
     title="Cover Letter Generator API",
     description="API for generating personalized cover letters based on CV and job description",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # --- Add Static Files Mounting ---
@@ -100,6 +190,11 @@ templates_dir = os.path.join(os.path.dirname(__file__), "templates")
 os.makedirs(templates_dir, exist_ok=True)
 templates = Jinja2Templates(directory=templates_dir)
 
+# Validate upload sizes and file signatures while the body is streaming in.
+# Registered before (i.e. inside) the request ID middleware so its rejections
+# reach the endpoint unwrapped and are logged with the request ID.
+app.add_middleware(UploadGuardMiddleware, rules=UPLOAD_RULES)
+
 # Add request ID middleware
 app.middleware("http")(request_id_middleware)
 
@@ -109,14 +204,14 @@ register_exception_handlers(app)
 # Configure CORS with environment-based settings
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=config["cors"]["allow_origins"],
-    allow_credentials=config["cors"]["allow_credentials"],
-    allow_methods=config["cors"]["allow_methods"],
-    allow_headers=config["cors"]["allow_headers"],
+    allow_origins=settings.cors.allow_origins,
+    allow_credentials=settings.cors.allow_credentials,
+    allow_methods=settings.cors.allow_methods,
+    allow_headers=settings.cors.allow_headers,
 )
 
 # Setup rate limiting
-setup_rate_limiting(app, config)
+setup_rate_limiting(app, settings)
 
 # Setup Prometheus metrics
 setup_metrics(app)
@@ -150,7 +245,7 @@ async def health_check():
     return {
         "status": "healthy",
         "api_version": app.version,
-        "environment": config["env"],
+        "environment": get_settings().env,
         "system": {
             "python_version": platform.python_version(),
             "platform": platform.platform(),
@@ -161,18 +256,6 @@ async def health_check():
         "timestamp": time.time()
     }
 
-# Define allowed file types and size limits
-ALLOWED_CV_EXTENSIONS = ['.pdf', '.docx', '.doc']
-ALLOWED_IMAGE_EXTENSIONS = ['.jpg', '.jpeg', '.png']
-ALLOWED_CV_CONTENT_TYPES = [
-    'application/pdf', 
-    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-    'application/msword'
-]
-ALLOWED_IMAGE_CONTENT_TYPES = ['image/jpeg', 'image/png', 'image/jpg']
-MAX_CV_SIZE_MB = 3
-MAX_IMAGE_SIZE_MB = 5
-
 def validate_file(
     file: UploadFile, 
     allowed_extensions: List[str], 
@@ -229,14 +312,311 @@ def validate_file(
             field=field_name
         )
 
+def is_empty_upload(file: UploadFile) -> bool:
+    """Whether an upload is what browsers send for a file input left empty"""
+    return not file.filename and not file.size
+
+def drop_empty_uploads(files: Optional[List[UploadFile]]) -> Optional[List[UploadFile]]:
+    """Remove empty file inputs from a list of uploads, returning None if none are left"""
+    files = [file for file in files or [] if not is_empty_upload(file)]
+    return files or None
+
+def validate_generation_request(
+    cv_file: UploadFile,
+    job_desc_text: Optional[str],
+    job_desc_image: Optional[List[UploadFile]],
+    word_limit: Optional[int]
+) -> None:
+    """
+    Validate the form fields of a cover letter generation request.
+    
+    Raises:
+        ValidationError: If validation fails
+    """
+    if not cv_file or is_empty_upload(cv_file):
+        raise ValidationError("CV file is required")
+    
+    job_desc_image = drop_empty_uploads(job_desc_image)
+    if not job_desc_text and not job_desc_image:
+        raise ValidationError("Either job description text or image must be provided")
+        
+    if word_limit and (word_limit < 250 or word_limit > 400):
+        raise ValidationError("Word limit must be between 250 and 400 words")
+    
+    # Validate CV file
+    validate_file(
+        cv_file, 
+        ALLOWED_CV_EXTENSIONS, 
+        ALLOWED_CV_CONTENT_TYPES, 
+        MAX_CV_SIZE_MB, 
+        "cv_file"
+    )
+    
+    # Validate job description images if provided
+    for image_file in job_desc_image or []:
+        validate_file(
+            image_file, 
+            ALLOWED_IMAGE_EXTENSIONS, 
+            ALLOWED_IMAGE_CONTENT_TYPES, 
+            MAX_IMAGE_SIZE_MB, 
+            "job_desc_image"
+        )
+
+def parse_batch_jobs(jobs: str) -> List[Dict[str, Optional[str]]]:
+    """
+    Parse the job postings of a batch request.
+    
+    Args:
+        jobs: JSON array of {"job_desc_text": ..., "company_name": ...} objects
+            (company_name is optional)
+    
+    Returns:
+        The job postings, each with job_desc_text and company_name keys
+    
+    Raises:
+        ValidationError: If the postings are malformed, empty or too many
+    """
+    try:
+        items = json.loads(jobs)
+    except ValueError as e:
+        raise ValidationError(f"jobs must be a JSON array: {str(e)}", field="jobs")
+    
+    if not isinstance(items, list) or not items:
+        raise ValidationError("jobs must be a non-empty JSON array", field="jobs")
+    max_items = get_settings().batch.max_items
+    if len(items) > max_items:
+        raise ValidationError(f"A batch can contain at most {max_items} jobs", field="jobs")
+    
+    parsed = []
+    for index, item in enumerate(items):
+        job_desc_text = item.get("job_desc_text") if isinstance(item, dict) else None
+        company_name = item.get("company_name") if isinstance(item, dict) else None
+        if not isinstance(job_desc_text, str) or not job_desc_text.strip():
+            raise ValidationError(f"jobs[{index}] needs a job_desc_text", field="jobs")
+        if company_name is not None and not isinstance(company_name, str):
+            raise ValidationError(f"jobs[{index}].company_name must be a string", field="jobs")
+        parsed.append({"job_desc_text": job_desc_text, "company_name": company_name or None})
+    return parsed
+
+def build_generation_stages(
+    cv_file: UploadFile,
+    job_desc_text: Optional[str],
+    job_desc_image: Optional[List[UploadFile]],
+    company_name: Optional[str],
+    word_limit: Optional[int]
+) -> List[Stage]:
+    """
+    Build the stages of the cover letter pipeline.
+    
+    The pipeline is a small dependency graph: CV extraction, job description
+    analysis and company lookup are independent and run concurrently, the
+    letter generation waits for the stages it consumes.
+    """
+    config = get_settings()
+    
+    # Step 1: Process CV document
+    async def extract_cv_stage(results):
+        try:
+            cv_text = await extract_docs(cv_file)
+            if not cv_text or len(cv_text.strip()) < 10:
+                raise DocumentProcessingError("Could not extract sufficient text from CV document", "CV")
+            logger.info(f"CV processed: {len(cv_text)} characters extracted")
+            return cv_text
+        except Exception as e:
+            logger.error(f"Error processing document: {str(e)}")
+            # Keep the status of errors that aren't the document's fault (a busy extraction pool)
+            status_code = e.status_code if isinstance(e, DocumentProcessingError) else 400
+            raise DocumentProcessingError(f"Error processing your CV: {str(e)}", "CV", status_code=status_code)
+    
+    # Step 2: Process job description
+    async def job_description_stage(results):
+        try:
+            if job_desc_text:
+                logger.info("Job description processed from text input")
+                return job_desc_text
+            elif job_desc_image:
+                images = [(await image_file.read(), image_file.content_type) for image_file in job_desc_image]
+                job_description = await analyze_job_description_images(images)
+                logger.info(f"Job description processed from {len(images)} image(s)")
+                return job_description
+            else:
+                raise ValidationError("Either job description text or image must be provided")
+        except Exception as e:
+            logger.error(f"Error processing job description: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error analyzing job description: {str(e)}")
+    
+    async def job_analysis_stage(results):
+        try:
+            # Analyze job requirements
+            job_analysis = await analyze_job_requirements(results["job_description"])
+            logger.info(f"Job requirements extracted: {len(job_analysis)} requirements found")
+            return job_analysis
+        except Exception as e:
+            logger.error(f"Error processing job description: {str(e)}")
+            raise HTTPException(status_code=500, detail=f"Error analyzing job description: {str(e)}")
+    
+    # Keep only the parts of the CV relevant to this job
+    async def cv_selection_stage(results):
+        return select_relevant_cv(
+            results["cv_text"],
+            results["job_description"],
+            top_k=config.prompt.cv_top_k,
+            header_lines=config.prompt.cv_header_lines,
+        )
+    
+    # Step 3: Get company information if provided
+    async def company_info_stage(results):
+        if not company_name:
+            return None
+        try:
+            # Time-boxed: a slow lookup must not hold up the letter. The shared
+            # lookup keeps running and fills the company cache for next time.
+            company_info = await asyncio.wait_for(
+                analyze_company_info(company_name),
+                timeout=config.company.stage_timeout
+            )
+            logger.info(f"Company information retrieved for {company_name}")
+            return company_info
+        except asyncio.TimeoutError:
+            logger.warning(
+                f"Company lookup for {company_name} exceeded {config.company.stage_timeout}s, "
+                "continuing without company information"
+            )
+            return None
+        except Exception as e:
+            logger.warning(f"Error retrieving company info for {company_name}: {str(e)}")
+            # Continue without company info rather than failing
+            logger.info("Continuing without company information")
+            return None
+    
+    # Step 4: Generate cover letter
+    async def letter_generation_stage(results):
+        try:
+            cover_letter = await generate_cover_letter(**generation_arguments(results, word_limit))
+            if not cover_letter or len(cover_letter.strip()) < 50:
+                raise HTTPException(
+                    status_code=500, 
+                    detail="Generated cover letter is too short or empty. Please try again."
+                )
+            logger.info(f"Cover letter generated: {len(cover_letter)} characters")
+            return cover_letter
+        except Exception as e:
+            logger.error(f"Error generating cover letter: {str(e)}")
+            raise letter_generation_error(e)
+    
+    return [
+        Stage("cv_text", extract_cv_stage, step_name="document_processing"),
+        Stage("job_description", job_description_stage, step_name="job_description"),
+        Stage("job_analysis", job_analysis_stage, depends_on=["job_description"], step_name="job_analysis"),
+        Stage("cv_selection", cv_selection_stage, depends_on=["cv_text", "job_description"], step_name="cv_selection"),
+        Stage("company_info", company_info_stage, step_name="company_analysis"),
+        Stage(
+            "cover_letter",
+            letter_generation_stage,
+            depends_on=generation_dependencies(),
+            step_name="letter_generation",
+        ),
+    ]
+
+def generation_dependencies() -> List[str]:
+    """
+    Stages whose results the letter generation consumes.
+    
+    Stages only run if the letter generation (directly or transitively) needs
+    them: the job requirements analysis is an extra upstream call and is only
+    made when its structured output replaces the raw job description.
+    """
+    dependencies = ["cv_selection", "job_description", "company_info"]
+    if get_settings().job_analysis.mode == "structured":
+        dependencies.append("job_analysis")
+    return dependencies
+
+def generation_arguments(results: Dict[str, Any], word_limit: Optional[int]) -> Dict[str, Any]:
+    """Arguments for generate_cover_letter()/stream_cover_letter() from the pipeline results"""
+    job_analysis = results.get("job_analysis")
+    return {
+        "resume_text": results["cv_selection"],
+        "job_description": results["job_description"],
+        "company_info": results["company_info"],
+        "word_limit": word_limit,
+        "job_requirements": job_analysis["analysis"] if job_analysis else None,
+    }
+
+async def request_idempotency_key(
+    request: Request,
+    cv_file: UploadFile,
+    job_desc_text: Optional[str],
+    job_desc_image: Optional[List[UploadFile]],
+    company_name: Optional[str],
+    word_limit: Optional[int]
+) -> Optional[str]:
+    """
+    Idempotency store key of a generation request, if it has an Idempotency-Key header.
+    
+    Raises:
+        ValidationError: If the header value is too long
+    """
+    header = request.headers.get("Idempotency-Key")
+    if not header:
+        return None
+    if len(header) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise ValidationError(
+            f"must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters",
+            field="Idempotency-Key"
+        )
+    # Content digests, so a different file uploaded under the same name and
+    # size does not get the letter of the earlier request
+    cv_digest = await upload_digest(cv_file)
+    images = [await upload_digest(image) for image in job_desc_image or []]
+    return idempotency_key(header, cv_file.filename, cv_digest, job_desc_text, images, company_name, word_limit)
+
+def letter_generation_error(e: Exception) -> HTTPException:
+    """
+    Map a failed letter generation call to an HTTP error.
+
+    When the upstream asked for a longer wait than we retry after, the
+    request fails with 503 and the upstream's Retry-After.
+    """
+    if isinstance(e, HTTPException):
+        return e
+    retry_after = getattr(e, "retry_after", None)
+    if retry_after is not None:
+        return HTTPException(
+            status_code=503,
+            detail=f"Error generating cover letter: {str(e)}",
+            headers={"Retry-After": str(math.ceil(retry_after))}
+        )
+    return HTTPException(status_code=500, detail=f"Error generating cover letter: {str(e)}")
+
+def generation_http_error(e: Exception, request_id: Optional[str]) -> HTTPException:
+    """Log a failed generation request, record it in the metrics and map it to an HTTP error"""
+    if isinstance(e, ValidationError):
+        logger.warning(f"Validation error: {str(e)}")
+        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "validation_error", request_id)
+        return HTTPException(status_code=400, detail=str(e))
+        
+    if isinstance(e, DocumentProcessingError):
+        logger.error(f"Document processing error: {str(e)}")
+        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "document_error", request_id)
+        return HTTPException(status_code=e.status_code if e.status_code >= 500 else 422, detail=str(e))
+        
+    if isinstance(e, HTTPException):
+        # Re-raise HTTP exceptions
+        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "error", request_id)
+        return e
+        
+    logger.error(f"Unexpected error generating cover letter: {str(e)}")
+    increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "error", request_id)
+    return HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+
 # Main cover letter generation endpoint
 @app.post("/api/generate_cover_letter", response_class=PlainTextResponse)
-@limiter.limit(config["rate_limits"]["endpoints"]["generate_cover_letter"])
+@limiter.shared_limit(settings.rate_limits.endpoints["generate_cover_letter"], scope="generate_cover_letter")
 async def generate_cover_letter_main(
     request: Request,  # Required for rate limiting
     cv_file: UploadFile = File(...),
     job_desc_text: Optional[str] = Form(None),
-    job_desc_image: UploadFile = File(None),
+    job_desc_image: Optional[List[UploadFile]] = File(None),
     company_name: Optional[str] = Form(None),
     word_limit: Optional[int] = Form(300)
 ):
@@ -244,135 +624,292 @@ async def generate_cover_letter_main(
     Main entry point for generating a cover letter from the frontend form.
     This consolidated endpoint handles:
     1. CV document parsing
-    2. Job description (text or image)
+    2. Job description (text, or one or more screenshots)
     3. Company information (optional)
     4. Word limit setting (optional, defaults to 300)
     5. Cover letter generation
+    
+    Steps 1-3 are independent and run concurrently; generation starts once
+    their results are available.
+    
+    Requests with an Idempotency-Key header that repeat an earlier request
+    (same key and form fields) get its letter, waiting for it if it is still
+    being generated.
     """
     start_time = time.time()
     logger.info("Starting cover letter generation process")
     request_id = getattr(request.state, "request_id", None)
+    job_desc_image = drop_empty_uploads(job_desc_image)
     
     try:
-        # Validate inputs
-        if not cv_file:
-            raise ValidationError("CV file is required")
-            
-        if not job_desc_text and not job_desc_image:
-            raise ValidationError("Either job description text or image must be provided")
-            
-        if word_limit and (word_limit < 250 or word_limit > 400):
-            raise ValidationError("Word limit must be between 250 and 400 words")
-        
-        # Validate CV file
-        validate_file(
-            cv_file, 
-            ALLOWED_CV_EXTENSIONS, 
-            ALLOWED_CV_CONTENT_TYPES, 
-            MAX_CV_SIZE_MB, 
-            "cv_file"
-        )
-        
-        # Validate job description image if provided
-        if job_desc_image:
-            validate_file(
-                job_desc_image, 
-                ALLOWED_IMAGE_EXTENSIONS, 
-                ALLOWED_IMAGE_CONTENT_TYPES, 
-                MAX_IMAGE_SIZE_MB, 
-                "job_desc_image"
-            )
-            
-        # Step 1: Process CV document
-        try:
-            with StepTimer("document_processing", request_id):
-                cv_text = await extract_docs(cv_file)
-                if not cv_text or len(cv_text.strip()) < 10:
-                    raise DocumentProcessingError("Could not extract sufficient text from CV document", "CV")
-                logger.info(f"CV processed: {len(cv_text)} characters extracted")
-        except Exception as e:
-            logger.error(f"Error processing document: {str(e)}")
-            raise DocumentProcessingError(f"Error processing your CV: {str(e)}", "CV")
-        
-        # Step 2: Process job description
-        job_description = None
-        try:
-            with StepTimer("job_analysis", request_id):
-                if job_desc_text:
-                    job_description = job_desc_text
-                    logger.info("Job description processed from text input")
-                elif job_desc_image:
-                    job_description = await analyze_job_description_image(await job_desc_image.read(), job_desc_image.content_type)
-                    logger.info("Job description processed from image")
-                else:
-                    raise ValidationError("Either job description text or image must be provided")
-                    
-                # Analyze job requirements
-                job_analysis = await analyze_job_requirements(job_description)
-                logger.info(f"Job requirements extracted: {len(job_analysis)} requirements found")
-        except Exception as e:
-            logger.error(f"Error processing job description: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error analyzing job description: {str(e)}")
+        validate_generation_request(cv_file, job_desc_text, job_desc_image, word_limit)
+        key = await request_idempotency_key(request, cv_file, job_desc_text, job_desc_image, company_name, word_limit)
+        stages = build_generation_stages(cv_file, job_desc_text, job_desc_image, company_name, word_limit)
         
-        # Step 3: Get company information if provided
-        company_info = None
-        if company_name:
-            try:
-                with StepTimer("company_analysis", request_id):
-                    company_info = analyze_company_info(company_name)
-                    logger.info(f"Company information retrieved for {company_name}")
-            except Exception as e:
-                logger.warning(f"Error retrieving company info for {company_name}: {str(e)}")
-                # Continue without company info rather than failing
-                company_info = None
-                logger.info("Continuing without company information")
+        async def run_pipeline() -> str:
+            with UpstreamCallTracker("generate_cover_letter", request_id) as upstream_calls:
+                results = await run_stages(stages, request_id, targets=["cover_letter"])
+            logger.info(f"Cover letter pipeline made {upstream_calls.count} upstream call(s)")
+            return results["cover_letter"]
         
-        # Step 4: Generate cover letter
-        try:
-            with StepTimer("letter_generation", request_id):
-                cover_letter = await generate_cover_letter(
-                    resume_text=cv_text,
-                    job_description=job_description,
-                    company_info=company_info,
-                    word_limit=word_limit
-                )
-                if not cover_letter or len(cover_letter.strip()) < 50:
-                    raise HTTPException(
-                        status_code=500, 
-                        detail="Generated cover letter is too short or empty. Please try again."
-                    )
-                logger.info(f"Cover letter generated: {len(cover_letter)} characters")
-        except Exception as e:
-            logger.error(f"Error generating cover letter: {str(e)}")
-            raise HTTPException(status_code=500, detail=f"Error generating cover letter: {str(e)}")
+        # Duplicates of a request with an Idempotency-Key share its pipeline run
+        if key:
+            cover_letter = await get_idempotency_store().run(key, run_pipeline)
+        else:
+            cover_letter = await run_pipeline()
         
         generation_time = time.time() - start_time
         logger.info(f"Cover letter generated successfully in {generation_time:.2f} seconds")
+        COVER_LETTER_FIRST_BYTE.labels(mode="full").observe(generation_time)
         
         # Record success in metrics
         increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "success", request_id)
         
         return cover_letter
         
-    except ValidationError as e:
-        logger.warning(f"Validation error: {str(e)}")
-        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "validation_error", request_id)
-        raise HTTPException(status_code=400, detail=str(e))
-        
-    except DocumentProcessingError as e:
-        logger.error(f"Document processing error: {str(e)}")
-        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "document_error", request_id)
-        raise HTTPException(status_code=422, detail=str(e))
-        
-    except HTTPException as e:
-        # Re-raise HTTP exceptions
-        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "error", request_id)
+    except Exception as e:
+        raise generation_http_error(e, request_id)
+
+# Headers of streamed responses (SSE, NDJSON)
+STREAMING_HEADERS = {
+    "Cache-Control": "no-cache",
+    # Tell reverse proxies (nginx) not to buffer the stream
+    "X-Accel-Buffering": "no",
+}
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Encode one Server-Sent Event with a JSON payload"""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+# Streaming variant of the generation endpoint
+@app.post("/api/generate_cover_letter/stream")
+@limiter.shared_limit(settings.rate_limits.endpoints["generate_cover_letter"], scope="generate_cover_letter")
+async def generate_cover_letter_stream(
+    request: Request,  # Required for rate limiting
+    cv_file: UploadFile = File(...),
+    job_desc_text: Optional[str] = Form(None),
+    job_desc_image: Optional[List[UploadFile]] = File(None),
+    company_name: Optional[str] = Form(None),
+    word_limit: Optional[int] = Form(300)
+):
+    """
+    Generate a cover letter like /api/generate_cover_letter, streaming the letter
+    as Server-Sent Events while the model writes it.
+    
+    Events:
+        chunk: {"text": ...} formatted text to append to the letter
+        done: {"text": ...} the complete formatted letter, replacing the chunks
+        error: {"detail": ...} generation failed after streaming had started
+    
+    Errors before the first piece of the letter arrives are returned as
+    regular HTTP errors, like the non-streaming endpoint. A request repeating
+    the Idempotency-Key of an earlier one receives that request's letter as
+    a single chunk.
+    """
+    start_time = time.time()
+    logger.info("Starting streamed cover letter generation")
+    request_id = getattr(request.state, "request_id", None)
+    job_desc_image = drop_empty_uploads(job_desc_image)
+    
+    try:
+        validate_generation_request(cv_file, job_desc_text, job_desc_image, word_limit)
+        key = await request_idempotency_key(request, cv_file, job_desc_text, job_desc_image, company_name, word_limit)
+    except Exception as e:
+        raise generation_http_error(e, request_id)
+    
+    # A duplicate of a request with an Idempotency-Key waits for that
+    # request's letter and receives it in one piece
+    store = get_idempotency_store()
+    earlier = store.find(key) if key else None
+    if earlier is not None:
+        try:
+            cover_letter = await asyncio.shield(earlier)
+        except Exception as e:
+            raise generation_http_error(e, request_id)
+        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "success", request_id)
+        return StreamingResponse(
+            iter([sse_event("chunk", {"text": cover_letter}), sse_event("done", {"text": cover_letter})]),
+            media_type="text/event-stream",
+            headers=STREAMING_HEADERS
+        )
+    
+    stages = build_generation_stages(cv_file, job_desc_text, job_desc_image, company_name, word_limit)
+    # Formatted text to append to the letter, then None once the job ends
+    chunks: asyncio.Queue = asyncio.Queue()
+    
+    async def write_letter() -> str:
+        try:
+            with UpstreamCallTracker("generate_cover_letter_stream", request_id) as upstream_calls:
+                # Everything the letter needs, without the letter itself
+                results = await run_stages(stages, request_id, targets=generation_dependencies())
+                
+                formatter = CoverLetterStreamFormatter()
+                pieces = stream_cover_letter(**generation_arguments(results, word_limit))
+                try:
+                    with StepTimer("letter_generation", request_id):
+                        async for piece in pieces:
+                            text = formatter.feed(piece)
+                            if text:
+                                chunks.put_nowait(text)
+                except Exception as e:
+                    logger.error(f"Error generating cover letter: {str(e)}")
+                    raise letter_generation_error(e)
+                finally:
+                    await pieces.aclose()
+            logger.info(f"Cover letter pipeline made {upstream_calls.count} upstream call(s)")
+            
+            cover_letter = formatter.text()
+            if len(cover_letter.strip()) < 50:
+                raise HTTPException(
+                    status_code=500,
+                    detail="Generated cover letter is too short or empty. Please try again."
+                )
+            return cover_letter
+        finally:
+            chunks.put_nowait(None)
+    
+    # The letter is written by a task of its own: with an Idempotency-Key,
+    # duplicates attach to it and it completes for a retry if this client goes away
+    job = store.start(key, write_letter) if key else asyncio.ensure_future(write_letter())
+    
+    # Wait for the first piece so failures before it still get a proper status code
+    try:
+        first_text = await chunks.get()
+    except asyncio.CancelledError:
+        if not key:
+            job.cancel()
         raise
-        
+    if first_text is None:
+        try:
+            await asyncio.shield(job)
+            error: Exception = HTTPException(status_code=500, detail="Received empty response")
+        except Exception as e:
+            error = e
+        raise generation_http_error(error, request_id)
+    
+    async def events():
+        COVER_LETTER_FIRST_BYTE.labels(mode="stream").observe(time.time() - start_time)
+        try:
+            text = first_text
+            while text is not None:
+                yield sse_event("chunk", {"text": text})
+                text = await chunks.get()
+            
+            cover_letter = await asyncio.shield(job)
+            generation_time = time.time() - start_time
+            logger.info(f"Cover letter streamed successfully in {generation_time:.2f} seconds ({len(cover_letter)} characters)")
+            increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "success", request_id)
+            yield sse_event("done", {"text": cover_letter})
+        except Exception as e:
+            # The status code has been sent already; report the error in the stream
+            logger.error(f"Error streaming cover letter: {str(e)}")
+            increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "error", request_id)
+            detail = e.detail if isinstance(e, HTTPException) else f"Error generating cover letter: {str(e)}"
+            yield sse_event("error", {"detail": detail})
+        finally:
+            # Without an Idempotency-Key nobody else wants the letter
+            if not key:
+                job.cancel()
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=STREAMING_HEADERS)
+
+# Batch variant: one CV, many job postings
+@app.post("/api/generate_cover_letter/batch")
+async def generate_cover_letter_batch(
+    request: Request,  # Required for rate limiting
+    cv_file: UploadFile = File(...),
+    jobs: str = Form(...),
+    word_limit: Optional[int] = Form(300)
+):
+    """
+    Generate cover letters for several job postings from one CV.
+    
+    jobs is a JSON array of {"job_desc_text": ..., "company_name": ...}
+    objects. The CV is extracted once; company lookups and letter generation
+    for the postings run concurrently, at most BATCH_CONCURRENCY at a time.
+    
+    Each posting counts as one request against the generation rate limit.
+    Postings beyond the remaining allowance are reported as failed with
+    status 429; if none is allowed the whole request fails with 429.
+    
+    The response is NDJSON with one line per posting, in completion order:
+        {"index": ..., "company_name": ..., "status": "success", "cover_letter": ...}
+        {"index": ..., "company_name": ..., "status": "error", "status_code": ..., "detail": ...}
+    where index is the posting's position in jobs.
+    """
+    start_time = time.time()
+    request_id = getattr(request.state, "request_id", None)
+    config = get_settings()
+    
+    try:
+        items = parse_batch_jobs(jobs)
+        validate_generation_request(cv_file, items[0]["job_desc_text"], None, word_limit)
     except Exception as e:
-        logger.error(f"Unexpected error generating cover letter: {str(e)}")
-        increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "error", request_id)
-        raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
+        raise generation_http_error(e, request_id)
+    logger.info(f"Starting batch cover letter generation for {len(items)} jobs")
+    
+    # Account every posting against the generation rate limit
+    allowed: List[int] = []
+    rejected: List[int] = []
+    rate_limit_error: Optional[RateLimitExceeded] = None
+    for index in range(len(items)):
+        try:
+            hit_shared_limit(request, config.rate_limits.endpoints["generate_cover_letter"], "generate_cover_letter")
+            allowed.append(index)
+        except RateLimitExceeded as e:
+            rejected.append(index)
+            rate_limit_error = e
+    if not allowed:
+        raise rate_limit_error
+    
+    def item_stages(index: int) -> List[Stage]:
+        item = items[index]
+        return build_generation_stages(cv_file, item["job_desc_text"], None, item["company_name"], word_limit)
+    
+    # Extract the CV once for all postings
+    try:
+        results = await run_stages(item_stages(allowed[0]), request_id, targets=["cv_text"])
+    except Exception as e:
+        raise generation_http_error(e, request_id)
+    cv_text = results["cv_text"]
+    
+    semaphore = asyncio.Semaphore(max(1, config.batch.concurrency))
+    
+    async def generate_item(index: int) -> Dict[str, Any]:
+        line: Dict[str, Any] = {"index": index, "company_name": items[index]["company_name"]}
+        try:
+            async with semaphore:
+                results = await run_stages(
+                    item_stages(index), request_id, targets=["cover_letter"], inputs={"cv_text": cv_text}
+                )
+            increment_counter_with_exemplar(COVER_LETTER_GENERATED, "status", "success", request_id)
+            line.update(status="success", cover_letter=results["cover_letter"])
+        except Exception as e:
+            error = generation_http_error(e, request_id)
+            line.update(status="error", status_code=error.status_code, detail=error.detail)
+        return line
+    
+    tasks = [asyncio.ensure_future(generate_item(index)) for index in allowed]
+    
+    async def lines():
+        try:
+            for index in rejected:
+                yield json.dumps({
+                    "index": index,
+                    "company_name": items[index]["company_name"],
+                    "status": "error",
+                    "status_code": 429,
+                    "detail": f"Rate limit exceeded: {rate_limit_error.detail}",
+                }, ensure_ascii=False) + "\n"
+            for task in asyncio.as_completed(tasks):
+                yield json.dumps(await task, ensure_ascii=False) + "\n"
+            logger.info(f"Batch of {len(items)} jobs finished in {time.time() - start_time:.2f} seconds")
+        finally:
+            # The client went away: stop the postings still being processed
+            for task in tasks:
+                task.cancel()
+    
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=STREAMING_HEADERS)
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,5 @@
+from .bktree import BKTree, hamming_distance
+from .lru import LRUCache
+from .perceptual import PerceptualHashCache
+from .singleflight import SingleFlight
+from .ttl import CacheEntry, TTLCache, approximate_size
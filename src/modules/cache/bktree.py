@@ -0,0 +1,76 @@
+"""
+BK-tree for nearest-neighbour lookups in a discrete metric space.
+"""
+from typing import Callable, Dict, Generic, List, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+def hamming_distance(a: int, b: int) -> int:
+    """Number of differing bits between two integer hashes"""
+    return bin(a ^ b).count("1")
+
+
+class _Node(Generic[T]):
+    __slots__ = ("item", "children")
+
+    def __init__(self, item: T):
+        self.item = item
+        self.children: Dict[int, "_Node[T]"] = {}
+
+
+class BKTree(Generic[T]):
+    """
+    Burkhard-Keller tree: finds all items within a distance of a query without
+    comparing against every item, using the triangle inequality.
+
+    Args:
+        distance: Metric returning a non-negative integer distance
+    """
+    def __init__(self, distance: Callable[[T, T], int] = hamming_distance):
+        self.distance = distance
+        self._root: Optional[_Node[T]] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return self._size
+
+    def add(self, item: T) -> None:
+        """Insert an item; items at distance 0 from an existing one are ignored"""
+        if self._root is None:
+            self._root = _Node(item)
+            self._size = 1
+            return
+
+        node = self._root
+        while True:
+            d = self.distance(item, node.item)
+            if d == 0:
+                return
+            child = node.children.get(d)
+            if child is None:
+                node.children[d] = _Node(item)
+                self._size += 1
+                return
+            node = child
+
+    def search(self, item: T, max_distance: int) -> List[Tuple[int, T]]:
+        """
+        Return (distance, item) pairs within max_distance of item, nearest first.
+        """
+        if self._root is None:
+            return []
+
+        matches = []
+        pending = [self._root]
+        while pending:
+            node = pending.pop()
+            d = self.distance(item, node.item)
+            if d <= max_distance:
+                matches.append((d, node.item))
+            # Only subtrees at distance d +/- max_distance can hold matches
+            for child_distance, child in node.children.items():
+                if d - max_distance <= child_distance <= d + max_distance:
+                    pending.append(child)
+
+        matches.sort(key=lambda match: match[0])
+        return matches
@@ -0,0 +1,85 @@
+"""
+Bounded in-memory LRU cache with Prometheus instrumentation.
+"""
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from modules.monitoring.prometheus import CACHE_ENTRIES, CACHE_EVICTIONS, CACHE_REQUESTS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class LRUCache:
+    """
+    Least-recently-used cache holding at most max_entries items.
+
+    Not thread-safe: meant to be used from the event loop only.
+
+    Args:
+        name: Cache name, used as the "cache" label on the cache metrics
+        max_entries: Maximum number of entries before the oldest is evicted
+        on_evict: Called with (key, value) for each entry evicted to make room
+    """
+    def __init__(self, name: str, max_entries: int, on_evict: Optional[Callable[[Hashable, Any], None]] = None):
+        self.name = name
+        self.max_entries = max_entries
+        self.on_evict = on_evict
+        self._data: "OrderedDict[Hashable, Any]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value (marking it recently used), or default on a miss"""
+        if key in self._data:
+            self._data.move_to_end(key)
+            CACHE_REQUESTS.labels(cache=self.name, result="hit").inc()
+            return self._data[key]
+
+        CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+        return default
+
+    def peek(self, key: Hashable, default: Any = None) -> Any:
+        """Return the cached value without touching recency or metrics"""
+        return self._data.get(key, default)
+
+    def touch(self, key: Hashable) -> None:
+        """Mark a key as recently used without recording a lookup"""
+        if key in self._data:
+            self._data.move_to_end(key)
+
+    def set(self, key: Hashable, value: Any) -> None:
+        """Store a value, evicting the least recently used entries if needed"""
+        if self.max_entries <= 0:
+            return
+
+        self._data[key] = value
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.max_entries:
+            evicted_key, evicted_value = self._data.popitem(last=False)
+            CACHE_EVICTIONS.labels(cache=self.name, tier="memory").inc()
+            logger.debug(f"Evicted {evicted_key!r} from {self.name} cache")
+            if self.on_evict is not None:
+                self.on_evict(evicted_key, evicted_value)
+
+        CACHE_ENTRIES.labels(cache=self.name, tier="memory").set(len(self._data))
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        """Remove and return a value"""
+        value = self._data.pop(key, default)
+        CACHE_ENTRIES.labels(cache=self.name, tier="memory").set(len(self._data))
+        return value
+
+    def clear(self) -> None:
+        """Remove all entries"""
+        self._data.clear()
+        CACHE_ENTRIES.labels(cache=self.name, tier="memory").set(0)
+
+    def items(self):
+        """Snapshot of (key, value) pairs from least to most recently used"""
+        return list(self._data.items())
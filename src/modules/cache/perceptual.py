@@ -0,0 +1,87 @@
+"""
+Cache keyed by perceptual hashes, matching near-duplicate keys.
+"""
+import logging
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from modules.monitoring.prometheus import CACHE_REQUESTS, PERCEPTUAL_CACHE_MATCH_DISTANCE
+from .bktree import BKTree, hamming_distance
+from .lru import LRUCache
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class PerceptualHashCache:
+    """
+    LRU cache whose lookups match any stored hash within a Hamming distance.
+
+    Hashes belong to a group and are only compared with hashes of the same
+    group, for hashes that must never match across groups however close they
+    are (such as combined hashes of different numbers of images). Each group
+    is indexed in its own BK-tree. Entries evicted from the LRU are left in
+    the trees and skipped on lookup; the trees are rebuilt once they hold
+    twice as many hashes as the cache.
+
+    Not thread-safe: meant to be used from the event loop only.
+
+    Args:
+        name: Cache name, used as the "cache" label on the cache metrics
+        max_entries: Maximum number of entries before the oldest is evicted
+        max_distance: Largest Hamming distance treated as the same image
+    """
+    def __init__(self, name: str, max_entries: int, max_distance: int):
+        self.name = name
+        self.max_distance = max_distance
+        # Keyed by (group, hash)
+        self._entries = LRUCache(name, max_entries)
+        self._trees: Dict[Hashable, BKTree[int]] = {}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(
+        self,
+        image_hash: int,
+        max_distance: Optional[int] = None,
+        match: Optional[Callable[[Any], bool]] = None,
+        group: Hashable = None,
+    ) -> Optional[Any]:
+        """
+        Return the value stored for the nearest matching hash, or None.
+
+        Args:
+            image_hash: Hash to look up
+            max_distance: Match radius overriding the cache default
+            match: Optional check a candidate's value must pass to be returned,
+                for confirming a hash match with other properties of the image
+            group: Group of the hash; only hashes of the same group match
+        """
+        if max_distance is None:
+            max_distance = self.max_distance
+        tree = self._trees.get(group)
+        for distance, candidate in tree.search(image_hash, max_distance) if tree is not None else []:
+            key = (group, candidate)
+            if key not in self._entries:
+                continue
+            if match is None or match(self._entries.peek(key)):
+                PERCEPTUAL_CACHE_MATCH_DISTANCE.labels(cache=self.name).observe(distance)
+                logger.debug(f"{self.name} cache matched {image_hash:x} at distance {distance}")
+                return self._entries.get(key)
+
+        CACHE_REQUESTS.labels(cache=self.name, result="miss").inc()
+        return None
+
+    def set(self, image_hash: int, value: Any, group: Hashable = None) -> None:
+        """Store a value under a hash"""
+        self._entries.set((group, image_hash), value)
+        self._trees.setdefault(group, BKTree(hamming_distance)).add(image_hash)
+
+        if sum(len(tree) for tree in self._trees.values()) > 2 * max(len(self._entries), 1):
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Rebuild the trees from the hashes still in the cache"""
+        trees: Dict[Hashable, BKTree[int]] = {}
+        for (group, image_hash), _ in self._entries.items():
+            trees.setdefault(group, BKTree(hamming_distance)).add(image_hash)
+        self._trees = trees
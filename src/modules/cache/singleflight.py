@@ -0,0 +1,70 @@
+"""
+Single-flight coalescing of concurrent identical calls.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable
+
+from modules.monitoring.prometheus import COALESCED_REQUESTS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class SingleFlight:
+    """
+    Runs at most one call per key at a time; concurrent callers with the same
+    key wait for the call already in flight and share its result or exception.
+
+    The call runs in its own task and callers wait on it through
+    asyncio.shield, so a caller that is cancelled (e.g. its client went away)
+    stops waiting without cancelling the call the other callers depend on.
+
+    Not thread-safe: meant to be used from the event loop only.
+
+    Args:
+        name: Used as the "name" label on the coalesced requests metric
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[Hashable, asyncio.Future] = {}
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._calls
+
+    def start(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> asyncio.Future:
+        """
+        Start func() for a key unless a call for it is already in flight.
+
+        Returns:
+            The future of the in-flight call
+        """
+        future = self._calls.get(key)
+        if future is None:
+            future = asyncio.ensure_future(func())
+            self._calls[key] = future
+            future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    async def do(self, key: Hashable, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Return the result of func(), sharing it with concurrent calls for the same key.
+
+        Args:
+            key: Identifies identical calls
+            func: Coroutine function performing the call
+
+        Returns:
+            The result of the shared call
+        """
+        if key in self._calls:
+            COALESCED_REQUESTS.labels(name=self.name).inc()
+            logger.debug(f"Joined in-flight {self.name} call")
+
+        return await asyncio.shield(self.start(key, func))
+
+    def _finish(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._calls.get(key) is future:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller was cancelled
+        if not future.cancelled():
+            future.exception()
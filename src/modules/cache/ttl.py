@@ -0,0 +1,184 @@
+"""
+Bounded TTL cache with stale-while-revalidate refreshes.
+"""
+import asyncio
+import logging
+import sys
+import time
+from typing import Any, Awaitable, Callable, Hashable, NamedTuple, Optional
+
+from modules.monitoring.prometheus import CACHE_HIT_RATIO, CACHE_MEMORY_BYTES, CACHE_REQUESTS
+from .lru import LRUCache
+from .singleflight import SingleFlight
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def approximate_size(value: Any) -> int:
+    """Rough deep size in bytes of a value built from str/bytes/numbers/containers"""
+    size = sys.getsizeof(value)
+    if isinstance(value, dict):
+        size += sum(approximate_size(k) + approximate_size(v) for k, v in value.items())
+    elif isinstance(value, (list, tuple, set, frozenset)):
+        size += sum(approximate_size(item) for item in value)
+    return size
+
+
+class CacheEntry(NamedTuple):
+    value: Any
+    stored_at: float
+    ttl: float
+    size: int
+
+
+class TTLCache:
+    """
+    LRU cache whose entries are fresh for a TTL and then served stale while a
+    background task refreshes them.
+
+    An entry younger than its TTL is returned as is. Within stale_ttl seconds
+    after that it is still returned immediately, and a single background
+    refresh per key replaces it. Older entries are treated as missing.
+    Concurrent misses for the same key share a single load.
+
+    Not thread-safe: meant to be used from the event loop only.
+
+    Args:
+        name: Cache name, used as the "cache" label on the cache metrics
+        max_entries: Maximum number of entries before the oldest is evicted
+        ttl: Seconds an entry is fresh
+        stale_ttl: Seconds past the TTL an entry may still be served while refreshing
+    """
+    def __init__(self, name: str, max_entries: int, ttl: float, stale_ttl: float = 0.0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = LRUCache(name, max_entries, on_evict=self._on_evict)
+        self._flights = SingleFlight(name)
+        self._memory_bytes = 0
+        self._hits = 0
+        self._lookups = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def memory_bytes(self) -> int:
+        """Approximate memory held by the cached keys and values"""
+        return self._memory_bytes
+
+    def _on_evict(self, key: Hashable, entry: CacheEntry) -> None:
+        self._memory_bytes -= entry.size
+        CACHE_MEMORY_BYTES.labels(cache=self.name).set(self._memory_bytes)
+
+    def _record_lookup(self, result: str) -> None:
+        self._lookups += 1
+        if result != "miss":
+            self._hits += 1
+        CACHE_REQUESTS.labels(cache=self.name, result=result).inc()
+        CACHE_HIT_RATIO.labels(cache=self.name).set(self._hits / self._lookups)
+
+    def get_entry(self, key: Hashable) -> Optional[CacheEntry]:
+        """Return the entry for a key if it is fresh or stale (no metrics, no refresh)"""
+        entry = self._entries.peek(key)
+        if entry is None:
+            return None
+        if time.time() - entry.stored_at > entry.ttl + self.stale_ttl:
+            self.pop(key)
+            return None
+        return entry
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """
+        Return the value for a key if it is fresh, or None, recording the lookup.
+
+        Stale entries count as misses: no loader is available to refresh them.
+        """
+        entry = self.get_entry(key)
+        if entry is None or time.time() - entry.stored_at > entry.ttl:
+            self._record_lookup("miss")
+            return None
+        self._entries.touch(key)
+        self._record_lookup("hit")
+        return entry.value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None, stored_at: Optional[float] = None) -> None:
+        """
+        Store a value.
+
+        Args:
+            key: Cache key
+            value: Value to cache
+            ttl: Freshness lifetime overriding the cache default
+            stored_at: Time the value was produced (defaults to now)
+        """
+        self.pop(key)
+        entry = CacheEntry(
+            value=value,
+            stored_at=time.time() if stored_at is None else stored_at,
+            ttl=self.ttl if ttl is None else ttl,
+            size=approximate_size(key) + approximate_size(value),
+        )
+        self._entries.set(key, entry)
+        if key in self._entries:
+            self._memory_bytes += entry.size
+            CACHE_MEMORY_BYTES.labels(cache=self.name).set(self._memory_bytes)
+
+    def pop(self, key: Hashable) -> None:
+        """Remove a key"""
+        entry = self._entries.pop(key)
+        if entry is not None:
+            self._memory_bytes -= entry.size
+            CACHE_MEMORY_BYTES.labels(cache=self.name).set(self._memory_bytes)
+
+    def items(self):
+        """Snapshot of (key, CacheEntry) pairs from least to most recently used"""
+        return self._entries.items()
+
+    async def get_or_load(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        ttl_for: Optional[Callable[[Any], Optional[float]]] = None,
+    ) -> Any:
+        """
+        Return the cached value for a key, loading it on a miss.
+
+        Args:
+            key: Cache key
+            loader: Coroutine function producing the value
+            ttl_for: Optional function choosing the TTL for a loaded value
+                (None means the cache default)
+
+        Returns:
+            The cached or freshly loaded value
+        """
+        entry = self.get_entry(key)
+        if entry is not None:
+            self._entries.touch(key)
+            if time.time() - entry.stored_at <= entry.ttl:
+                self._record_lookup("hit")
+            else:
+                self._record_lookup("stale")
+                self._refresh(key, loader, ttl_for)
+            return entry.value
+
+        self._record_lookup("miss")
+        return await self._flights.do(key, lambda: self._load(key, loader, ttl_for))
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl_for) -> Any:
+        value = await loader()
+        self.set(key, value, ttl=ttl_for(value) if ttl_for else None)
+        return value
+
+    def _refresh(self, key: Hashable, loader: Callable[[], Awaitable[Any]], ttl_for) -> None:
+        """Start a background refresh of a stale key unless a load is running"""
+        if key in self._flights:
+            return
+
+        def log_failure(future: asyncio.Future) -> None:
+            if not future.cancelled() and future.exception() is not None:
+                # Keep serving the stale value until it expires
+                logger.warning(f"Background refresh of {self.name} cache entry failed: {str(future.exception())}")
+
+        self._flights.start(key, lambda: self._load(key, loader, ttl_for)).add_done_callback(log_failure)
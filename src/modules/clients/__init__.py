@@ -0,0 +1 @@
+from .registry import close_clients, get_exa_client, refresh_clients, start_clients
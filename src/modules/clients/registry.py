@@ -0,0 +1,149 @@
+"""
+Registry of the long-lived upstream clients.
+
+The Exa client and the pooled OpenRouter client are created once, at
+application startup, from the process-wide settings and closed at shutdown
+rather than being rebuilt for every request. After an explicit settings
+reload, refresh_clients() replaces the clients whose settings changed.
+"""
+import json
+import logging
+from typing import Any, Dict, Optional, Union
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import ExaSettings, get_settings
+from modules.openrouter import close_openrouter_client, init_openrouter_client
+
+try:
+    from exa_py import Exa
+    from exa_py.api import ExaJSONEncoder
+except ImportError:
+    Exa = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+if Exa is not None:
+    class TimeoutExa(Exa):
+        """
+        Exa client whose HTTP requests time out.
+
+        The SDK sends every request through requests.post without a timeout,
+        so a call to an unresponsive API blocks its thread forever. Requests
+        go through a pooled session with a timeout instead; errors are raised
+        the way the SDK raises them.
+
+        Args:
+            api_key: Exa API key
+            timeout: Connect and read timeout in seconds
+            max_connections: Connections kept open (one per worker thread)
+        """
+        def __init__(self, api_key: str, timeout: float, max_connections: int):
+            super().__init__(api_key=api_key)
+            self.timeout = timeout
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+            self.session.mount("https://", adapter)
+            self.session.mount("http://", adapter)
+
+        def request(
+            self,
+            endpoint: str,
+            data: Optional[Union[Dict[str, Any], str]] = None,
+            method: str = "POST",
+            params: Optional[Dict[str, Any]] = None,
+        ) -> Any:
+            # Streaming responses are read by the caller, keep the SDK's handling
+            if isinstance(data, dict) and data.get("stream"):
+                return super().request(endpoint, data, method, params)
+
+            if isinstance(data, str):
+                json_data = data
+            else:
+                json_data = json.dumps(data, cls=ExaJSONEncoder) if data else None
+            res = self.session.request(
+                method.upper(),
+                self.base_url + endpoint,
+                data=json_data,
+                headers=self.headers,
+                params=params,
+                timeout=self.timeout,
+            )
+            if res.status_code >= 400:
+                raise ValueError(f"Request failed with status code {res.status_code}: {res.text}")
+            return res.json()
+
+        def close(self) -> None:
+            """Close the pooled connections"""
+            self.session.close()
+
+# Process-wide Exa client and the API key it was created with
+_exa_client: Optional["Exa"] = None
+_exa_api_key: Optional[str] = None
+
+def create_exa_client(exa_config: ExaSettings) -> Optional["Exa"]:
+    """
+    Build an Exa client.
+
+    Args:
+        exa_config: The Exa settings
+
+    Returns:
+        The client, or None if no API key is configured or exa_py is not installed
+    """
+    if not exa_config.api_key:
+        return None
+    if Exa is None:
+        logger.error("The 'exa_py' package is not installed. Please install it using: pip install exa-py")
+        return None
+    return TimeoutExa(exa_config.api_key, timeout=exa_config.timeout, max_connections=exa_config.max_workers)
+
+def get_exa_client() -> Optional["Exa"]:
+    """
+    Return the shared Exa client, or None if Exa is not configured.
+
+    The client is normally created at startup; it is created lazily here so
+    that the service functions keep working outside the FastAPI app.
+    """
+    global _exa_client, _exa_api_key
+    if _exa_client is None:
+        exa_config = get_settings().exa
+        _exa_client = create_exa_client(exa_config)
+        _exa_api_key = exa_config.api_key
+    return _exa_client
+
+async def start_clients() -> None:
+    """Create the shared upstream clients. Called once at application startup."""
+    await init_openrouter_client()
+    if get_exa_client() is None:
+        logger.warning("Exa client not configured, company lookups are disabled")
+
+def refresh_clients() -> None:
+    """
+    Replace clients whose settings changed. Called after the settings are reloaded.
+
+    OpenRouter API keys are sent per request and take effect immediately; the
+    OpenRouter connection pool keeps its limits until the next restart.
+    """
+    global _exa_client, _exa_api_key
+    exa_config = get_settings().exa
+    if exa_config.api_key != _exa_api_key:
+        previous = _exa_client
+        _exa_client = create_exa_client(exa_config)
+        _exa_api_key = exa_config.api_key
+        # Calls already running keep the client they started with; closing its
+        # pool only drops idle connections, busy ones close once they are done
+        if previous is not None:
+            previous.close()
+        logger.info("Exa client recreated with the reloaded API key")
+
+async def close_clients() -> None:
+    """Close the shared upstream clients. Called at application shutdown."""
+    global _exa_client, _exa_api_key
+    if _exa_client is not None:
+        _exa_client.close()
+    _exa_client = None
+    _exa_api_key = None
+    await close_openrouter_client()
@@ -0,0 +1,224 @@
+"""
+Cache of company profiles looked up with Exa.
+
+Company descriptions change on the order of weeks, so profiles are cached by
+canonical company name (see modules.company.names) with a long TTL and refreshed in the background once
+stale. Names Exa finds nothing for are cached briefly as well, so a misspelled
+name does not hit Exa on every request. The cache can be persisted to a
+gzip-compressed JSON Lines file on shutdown and loaded again at startup. A
+snapshot in the same format, written by the prefetch command
+(modules.company.prefetch), is loaded at startup as well.
+"""
+import asyncio
+import gzip
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Dict, Hashable, List, Optional
+
+from config import get_settings
+from modules.cache import CacheEntry, TTLCache
+from .names import get_company_name_index
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class CompanyProfileCache(TTLCache):
+    """
+    TTLCache of company profiles with negative caching and file persistence.
+
+    Values are the formatted profile text, or None when Exa found nothing.
+    The name each profile was found under is kept alongside, so the company
+    name index can learn it again after a restart.
+
+    Args:
+        max_entries: Maximum number of companies before the least recently used is evicted
+        ttl: Seconds a profile is fresh
+        stale_ttl: Seconds past the TTL a profile may still be served while refreshing
+        negative_ttl: Seconds a "no results" answer is fresh
+        persist_path: gzip JSON Lines file the cache is saved to and loaded from (None disables it)
+        snapshot_path: Prefetched snapshot in the same format, only loaded (None disables it)
+    """
+    def __init__(
+        self,
+        max_entries: int,
+        ttl: float,
+        stale_ttl: float,
+        negative_ttl: float,
+        persist_path: Optional[str] = None,
+        snapshot_path: Optional[str] = None,
+    ):
+        super().__init__("company_profiles", max_entries, ttl, stale_ttl)
+        self.negative_ttl = negative_ttl
+        self.persist_path = persist_path
+        self.snapshot_path = snapshot_path
+        # Display name (as searched on Exa) by cache key
+        self.names: Dict[Hashable, str] = {}
+
+    def _on_evict(self, key: Hashable, entry: CacheEntry) -> None:
+        super()._on_evict(key, entry)
+        self.names.pop(key, None)
+
+    def ttl_for(self, profile: Optional[str]) -> Optional[float]:
+        """TTL for a looked-up profile: short for misses, the default otherwise"""
+        return self.negative_ttl if profile is None else None
+
+    def read(self, path: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        Read the unexpired records of a file written by save().
+
+        Does not touch the cache, so it can run in a worker thread.
+
+        Args:
+            path: File to read (defaults to the persistence file)
+
+        Returns:
+            The records, as saved
+        """
+        path = path or self.persist_path
+        if not path or not os.path.exists(path):
+            return []
+
+        now = time.time()
+        records = []
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as f:
+                for line in f:
+                    record = json.loads(line)
+                    if now - record["stored_at"] > record["ttl"] + self.stale_ttl:
+                        continue
+                    records.append(record)
+        except (OSError, EOFError, ValueError, KeyError) as e:
+            # The file is only a cache; start with what was read so far
+            logger.warning(f"Could not fully read company cache from {path}: {str(e)}")
+        return records
+
+    def insert(self, records: List[Dict[str, Any]]) -> int:
+        """
+        Add records returned by read(), skipping ones older than the entry
+        already cached for the same company.
+
+        Returns:
+            Number of records added
+        """
+        inserted = 0
+        for record in records:
+            current = self.get_entry(record["key"])
+            if current is not None and current.stored_at >= record["stored_at"]:
+                continue
+            self.set(record["key"], record["value"], ttl=record["ttl"], stored_at=record["stored_at"])
+            # Files written before names were saved have none
+            if record.get("name"):
+                self.names[record["key"]] = record["name"]
+            inserted += 1
+        return inserted
+
+    async def load(self, path: Optional[str] = None) -> int:
+        """
+        Load entries saved by save(): the file is read in a worker thread and
+        its entries added on the event loop.
+
+        Args:
+            path: File to load (defaults to the persistence file)
+
+        Returns:
+            Number of entries loaded
+        """
+        records = await asyncio.to_thread(self.read, path)
+        return self.insert(records)
+
+    def save(self, entries=None, path: Optional[str] = None) -> int:
+        """
+        Write entries to the persistence file, least recently used first.
+
+        Args:
+            entries: Snapshot from items() (defaults to the current entries)
+            path: File to write (defaults to the persistence file)
+
+        Returns:
+            Number of entries saved
+        """
+        path = path or self.persist_path
+        if not path:
+            return 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        if entries is None:
+            entries = self.items()
+
+        # Write to a temp file and rename so a crash never leaves a truncated file
+        fd, temp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.open(raw, "wt", encoding="utf-8") as f:
+                for key, entry in entries:
+                    f.write(json.dumps({
+                        "key": key,
+                        "name": self.names.get(key),
+                        "value": entry.value,
+                        "stored_at": entry.stored_at,
+                        "ttl": entry.ttl,
+                    }) + "\n")
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        return len(entries)
+
+
+# Process-wide cache, created on first use
+_cache: Optional[CompanyProfileCache] = None
+
+def get_company_cache(max_entries: Optional[int] = None) -> CompanyProfileCache:
+    """
+    Return the shared company profile cache.
+
+    Args:
+        max_entries: Size of the cache if this call creates it, overriding
+            COMPANY_CACHE_MAX_ENTRIES
+    """
+    global _cache
+    if _cache is None:
+        cache_config = get_settings().company.cache
+        _cache = CompanyProfileCache(
+            max_entries=cache_config.max_entries if max_entries is None else max_entries,
+            ttl=cache_config.ttl,
+            stale_ttl=cache_config.stale_ttl,
+            negative_ttl=cache_config.negative_ttl,
+            persist_path=cache_config.persist_path or None,
+            snapshot_path=cache_config.snapshot_path or None,
+        )
+    return _cache
+
+async def load_company_cache() -> None:
+    """Load the persisted company cache and prefetched snapshot. Called once at application startup."""
+    cache = get_company_cache()
+    for path in (cache.persist_path, cache.snapshot_path):
+        if path:
+            # Whichever file has the newer profile of a company wins
+            loaded = await cache.load(path)
+            logger.info(f"Loaded {loaded} company profiles from {path}")
+    
+    if len(cache):
+        # Companies found before the restart resolve as known names again,
+        # searched under the name they were found with
+        index = get_company_name_index()
+        for key, entry in cache.items():
+            name = cache.names.get(key)
+            if entry.value is not None and name:
+                index.learn(name)
+
+async def save_company_cache() -> None:
+    """Persist the company cache. Called at application shutdown."""
+    cache = get_company_cache()
+    if cache.persist_path:
+        try:
+            # Snapshot on the event loop, write in a thread
+            saved = await asyncio.to_thread(cache.save, cache.items())
+            logger.info(f"Saved {saved} company profiles to {cache.persist_path}")
+        except OSError as e:
+            logger.warning(f"Failed to save company cache to {cache.persist_path}: {str(e)}")
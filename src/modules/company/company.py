@@ -1,24 +1,121 @@
 from fastapi import HTTPException, Form, Request
+import asyncio
+import functools
 import logging
+import re
 import time
-from typing import Dict, Any, Union, Optional
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, Union, Optional, Tuple
 
-from config import load_config
+import requests
+
+from config import get_settings
+from modules.clients import get_exa_client
 from modules.errors.exceptions import APIRequestError, ConfigurationError, ValidationError
+from modules.monitoring.prometheus import UPSTREAM_LATENCY, record_upstream_call
 from modules.rate_limit import limiter
+from modules.retry import build_retry_policy, is_retryable_status
 from . import router
+from .cache import get_company_cache
+from .names import get_company_name_index
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-async def execute_exa_search(exa_client, query: str, max_retries: int = 3) -> Dict[str, Any]:
+# The Exa SDK reports HTTP failures as "Request failed with status code <N>: ..."
+EXA_STATUS_CODE_PATTERN = re.compile(r"status code (\d{3})")
+
+# The Exa SDK is synchronous (requests), so calls run on a bounded thread pool
+# instead of blocking the event loop; created on first use
+_exa_executor: Optional[ThreadPoolExecutor] = None
+
+def get_exa_executor() -> ThreadPoolExecutor:
+    """Return the thread pool Exa SDK calls run on"""
+    global _exa_executor
+    if _exa_executor is None:
+        _exa_executor = ThreadPoolExecutor(
+            max_workers=get_settings().exa.max_workers,
+            thread_name_prefix="exa"
+        )
+    return _exa_executor
+
+def shutdown_exa_executor() -> None:
+    """Stop the Exa thread pool without waiting for abandoned calls. Called at application shutdown."""
+    global _exa_executor
+    if _exa_executor is not None:
+        _exa_executor.shutdown(wait=False, cancel_futures=True)
+        _exa_executor = None
+
+def classify_exa_error(exc: BaseException) -> Tuple[bool, str, Optional[float]]:
+    """
+    Decide whether a failed Exa call should be retried.
+
+    The Exa SDK raises a ValueError carrying the HTTP status code in its message
+    for non-2xx responses, and lets requests' own exceptions propagate.
+
+    Returns:
+        (retryable, reason, retry_after) as expected by RetryPolicy
+    """
+    if isinstance(exc, (requests.Timeout, asyncio.TimeoutError)):
+        return True, "timeout", None
+    if isinstance(exc, requests.ConnectionError):
+        return True, "connection", None
+
+    match = EXA_STATUS_CODE_PATTERN.search(str(exc))
+    if match:
+        status_code = int(match.group(1))
+        return is_retryable_status(status_code), str(status_code), None
+
+    return False, type(exc).__name__, None
+
+async def _search_once(exa_client, query: str) -> Dict[str, Any]:
+    """
+    Perform a single Exa search_and_contents call for a company query.
+
+    The blocking SDK call runs on the Exa thread pool and is abandoned after
+    the configured timeout. The client's HTTP requests time out as well (see
+    modules.clients.registry.TimeoutExa), so an abandoned call frees its
+    thread instead of holding it while Exa never answers.
+
+    Raises:
+        asyncio.TimeoutError: If Exa does not answer within the timeout
+    """
+    company = query.split(':')[0].replace('Description of ', '')
+    record_upstream_call("exa")
+    search = functools.partial(
+        exa_client.search_and_contents,
+        query=query,
+        num_results=1,
+        use_autoprompt=True,
+        summary={
+            "query": f"What does {company} do as a company? What are their main products and services?"
+        },
+        highlights={
+            "numSentences": 3,
+            "highlightsPerUrl": 2,
+            "query": f"Key information about {company} company"
+        },
+        category="company"  # Add company category filter for better results
+    )
+
+    loop = asyncio.get_running_loop()
+    start_time = time.perf_counter()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(get_exa_executor(), search),
+            timeout=get_settings().exa.timeout
+        )
+    finally:
+        UPSTREAM_LATENCY.labels(api_name="exa").observe(time.perf_counter() - start_time)
+
+async def execute_exa_search(exa_client, query: str, max_retries: Optional[int] = None) -> Dict[str, Any]:
     """
     Execute a search query with the Exa API with retry logic.
     
     Args:
         exa_client: The initialized Exa client
         query: Search query string
-        max_retries: Maximum number of retry attempts
+        max_retries: Maximum number of attempts (defaults to the configured retry policy)
         
     Returns:
         Search results from Exa
@@ -26,46 +123,34 @@ async def execute_exa_search(exa_client, query: str, max_retries: int = 3) -> Di
     Raises:
         APIRequestError: If the API call fails after all retries
     """
-    # Retry configuration
-    retry_delays = [1, 2, 4]  # Exponential backoff
-    last_exception = None
-    
-    for attempt in range(max_retries):
-        try:
-            search_results = exa_client.search_and_contents(
-                query=query,
-                num_results=1,
-                use_autoprompt=True,
-                summary={
-                    "query": f"What does {query.split(':')[0].replace('Description of ', '')} do as a company? What are their main products and services?"
-                },
-                highlights={
-                    "numSentences": 3,
-                    "highlightsPerUrl": 2,
-                    "query": f"Key information about {query.split(':')[0].replace('Description of ', '')} company"
-                },
-                category="company"  # Add company category filter for better results
-            )
-            return search_results
-            
-        except Exception as e:
-            last_exception = e
-            logger.warning(f"Exa API error (attempt {attempt+1}/{max_retries}): {str(e)}")
-            
-            # Wait before retrying with exponential backoff
-            time.sleep(retry_delays[min(attempt, len(retry_delays)-1)])
+    policy = build_retry_policy("exa", classify_exa_error, max_attempts=max_retries)
     
-    # If we get here, all retries failed
-    raise APIRequestError(
-        message=f"Failed after {max_retries} attempts: {str(last_exception)}",
-        service_name="Exa AI",
-        details={"query": query, "last_error": str(last_exception)}
-    )
+    try:
+        return await policy.call(_search_once, exa_client, query)
+    except asyncio.TimeoutError as e:
+        raise APIRequestError(
+            message=f"Search timed out after {get_settings().exa.timeout}s",
+            service_name="Exa AI",
+            status_code=504,
+            details={"query": query, "last_error": "timeout"}
+        ) from e
+    except Exception as e:
+        raise APIRequestError(
+            message=f"Search failed: {str(e)}",
+            service_name="Exa AI",
+            details={"query": query, "last_error": str(e)}
+        ) from e
 
 async def analyze_company_info(company_name: str) -> Union[str, Dict[str, Any]]:
     """
     Analyze a company based on name input using Exa AI.
     
+    The name is first resolved through the company name index (see
+    modules.company.names), so spelling variants of a known company share one
+    cache entry and one search. Profiles are cached by canonical name (see
+    modules.company.cache): stale profiles are served while a background
+    refresh runs, and names with no results are cached briefly.
+    
     Args:
         company_name: Company name to search for
         
@@ -76,16 +161,41 @@ async def analyze_company_info(company_name: str) -> Union[str, Dict[str, Any]]:
     if not company_name or not company_name.strip():
         raise ValidationError("Company name cannot be empty", field="company_name")
     
-    # Load configuration
-    config = load_config()
-    exa_client = config["exa"]["client"]
+    exa_client = get_exa_client()
     
     if not exa_client:
         raise ConfigurationError(
             message="Exa AI client not properly configured. Please check your API key.",
             config_item="EXA_API_KEY"
         )
+    
+    resolved = get_company_name_index().resolve(company_name)
+    if resolved.match != "none":
+        logger.debug(f"Resolved company {company_name!r} to {resolved.name!r} ({resolved.match} match)")
+    
+    cache = get_company_cache()
+    
+    async def load_profile() -> Optional[str]:
+        profile = await _fetch_company_profile(exa_client, resolved.name)
+        if profile is not None:
+            # Saved with the profile, for the name index after a restart
+            cache.names[resolved.key] = resolved.name
+        return profile
+    
+    company_info = await cache.get_or_load(resolved.key, load_profile, ttl_for=cache.ttl_for)
+    
+    if company_info is None:
+        logger.warning(f"No results found for company: {company_name}")
+        return f"No detailed information found for {company_name}. You might want to include your own knowledge about the company in your cover letter."
+    return company_info
 
+async def _fetch_company_profile(exa_client, company_name: str) -> Optional[str]:
+    """
+    Search Exa for a company and format the best result.
+    
+    Returns:
+        The formatted company profile, or None if Exa found nothing
+    """
     # Prepare search query for the company
     search_query = f"Description of {company_name} company:"
     
@@ -119,10 +229,11 @@ async def analyze_company_info(company_name: str) -> Union[str, Dict[str, Any]]:
             if source_title or source_url:
                 company_info += f"Source: {source_title} ({source_url})"
             
+            # Later variants of this name resolve to it
+            get_company_name_index().learn(company_name)
             return company_info
         else:
-            logger.warning(f"No results found for company: {company_name}")
-            return f"No detailed information found for {company_name}. You might want to include your own knowledge about the company in your cover letter."
+            return None
     
     except Exception as e:
         # If it's not already an APIRequestError, wrap it
@@ -136,7 +247,7 @@ async def analyze_company_info(company_name: str) -> Union[str, Dict[str, Any]]:
 
 # API Routes
 @router.post("/analyze_company", response_model=str)
-@limiter.limit(load_config()["rate_limits"]["endpoints"]["analyze_company"])
+@limiter.limit(get_settings().rate_limits.endpoints["analyze_company"])
 async def analyze_company_route(
     request: Request,  # Required for rate limiting
     company_name: str = Form(...)
@@ -0,0 +1,284 @@
+"""
+Company name index mapping spelling variants onto one canonical company.
+
+Users type the same company many ways ("Google", "google inc", "Google LLC",
+"Alphabet/Google"), and each spelling used to be a separate cache entry and a
+separate Exa search. Names are canonicalized (Unicode NFKC, accents and
+punctuation removed, case-folded, legal forms such as "Inc" or "PT ... Tbk"
+stripped) and then matched against an index of known companies, first
+exactly and then with a trigram search confirmed by edit distance.
+
+The index is seeded from a bundled list of companies and their aliases
+(known_companies.txt) and learns every company a lookup found a profile for.
+"""
+import heapq
+import logging
+import os
+import re
+import unicodedata
+from collections import Counter, defaultdict
+from itertools import chain
+from typing import Dict, Iterable, List, NamedTuple, Optional
+
+from config import get_settings
+from modules.monitoring.prometheus import COMPANY_NAME_MATCHES
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Seed list shipped with the application
+DEFAULT_SEED_FILE = os.path.join(os.path.dirname(__file__), "known_companies.txt")
+
+# Legal forms and filler words dropped from the start or end of a name
+LEGAL_PREFIXES = {"the", "pt"}
+LEGAL_SUFFIXES = {
+    "inc", "incorporated", "llc", "llp", "lp", "ltd", "limited", "corp", "corporation",
+    "co", "company", "plc", "gmbh", "ag", "sa", "se", "nv", "bv", "ab", "oy", "spa", "srl",
+    "pty", "pte", "kk", "sdn", "bhd", "tbk", "persero", "group", "holding", "holdings", "and",
+}
+
+# Separators between alternative names typed into one field ("Alphabet/Google")
+ALTERNATIVE_NAME_SEPARATORS = re.compile(r"\s*[/|]\s*")
+
+# Periods are dropped rather than split on, so "S.A." reads as "sa" and
+# "Amazon.com" as "amazon"
+DOT_COM_PATTERN = re.compile(r"\.com\b")
+NON_WORD_PATTERN = re.compile(r"[^\w\s]+")
+NON_DIGIT_PATTERN = re.compile(r"\D+")
+
+# Number of trigram candidates whose edit distance is computed per lookup
+FUZZY_CANDIDATES = 8
+
+class CompanyNameMatch(NamedTuple):
+    """Result of resolving a typed company name"""
+    # Canonical key shared by all variants of the company
+    key: str
+    # Name to search for: the known company's name, or the input as typed
+    name: str
+    # exact, alias, fuzzy or none
+    match: str
+
+
+def canonicalize_company_name(company_name: str) -> str:
+    """
+    Reduce a company name to the form variants of it have in common.
+
+    "Google LLC", "google, inc." and "GOOGLE" all become "google", "Nestlé S.A."
+    becomes "nestle" and "Amazon.com, Inc." becomes "amazon". A name consisting
+    only of legal words is kept as is.
+    """
+    text = unicodedata.normalize("NFKC", company_name).casefold().replace("&", " and ")
+    # Drop accents: decompose and remove the combining marks
+    text = "".join(char for char in unicodedata.normalize("NFKD", text) if not unicodedata.combining(char))
+    text = DOT_COM_PATTERN.sub("", text).replace(".", "")
+    tokens = NON_WORD_PATTERN.sub(" ", text).split()
+
+    while len(tokens) > 1 and tokens[0] in LEGAL_PREFIXES:
+        tokens.pop(0)
+    while len(tokens) > 1 and tokens[-1] in LEGAL_SUFFIXES:
+        tokens.pop()
+    return " ".join(tokens)
+
+def trigrams(key: str) -> List[str]:
+    """Padded character trigrams of a canonical name"""
+    padded = f"  {key} "
+    return [padded[i:i + 3] for i in range(len(padded) - 2)]
+
+def bounded_edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    Optimal string alignment distance (Levenshtein plus adjacent transpositions),
+    or limit + 1 once it is known to exceed limit.
+
+    Only a band of width 2 * limit + 1 around the diagonal is computed, so the
+    cost is proportional to len(a) * limit rather than len(a) * len(b).
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    too_far = limit + 1
+    previous_row: List[int] = []
+    row = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        previous_row, row_before = row, previous_row
+        row = [too_far] * (len(b) + 1)
+        if i <= limit:
+            row[0] = i
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        for j in range(low, high + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous_row[j] + 1, row[j - 1] + 1, previous_row[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, row_before[j - 2] + 1)
+            row[j] = value
+        if min(row[low - 1:high + 1]) > limit:
+            return too_far
+    return min(row[len(b)], too_far)
+
+
+class CompanyNameIndex:
+    """
+    In-memory index of known companies, looked up by canonical name.
+
+    Every company has a canonical key (its canonicalized name) and any number of
+    aliases, all of which resolve to it. Names that match nothing exactly are
+    compared with the indexed names sharing the most trigrams, and the closest
+    one within the similarity threshold wins.
+
+    Not thread-safe: meant to be used from the event loop only.
+
+    Args:
+        max_entries: Most companies the index holds; learning stops once it is full
+        min_similarity: Lowest 1 - edit distance / length accepted as a fuzzy match
+    """
+    def __init__(self, max_entries: int, min_similarity: float):
+        self.max_entries = max_entries
+        self.min_similarity = min_similarity
+        # Per company: canonical key and the name searched for
+        self._keys: List[str] = []
+        self._names: List[str] = []
+        # Canonical names and aliases, each pointing at its company
+        self._terms: List[str] = []
+        self._term_company: List[int] = []
+        self._by_term: Dict[str, int] = {}
+        # Trigram -> ids of the terms containing it
+        self._postings: Dict[str, List[int]] = defaultdict(list)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def add(self, name: str, aliases: Iterable[str] = ()) -> Optional[str]:
+        """
+        Add a company unless its canonical name is already known.
+
+        Args:
+            name: Company name, also used as the Exa search term
+            aliases: Other names that resolve to the company
+
+        Returns:
+            The canonical key of the company, or None if it was not added
+        """
+        key = canonicalize_company_name(name)
+        if not key or key in self._by_term or len(self._keys) >= self.max_entries:
+            return None
+
+        company = len(self._keys)
+        self._keys.append(key)
+        self._names.append(" ".join(name.split()))
+        for term in [key, *map(canonicalize_company_name, aliases)]:
+            if term and term not in self._by_term:
+                self._add_term(term, company)
+        return key
+
+    def _add_term(self, term: str, company: int) -> None:
+        term_id = len(self._terms)
+        self._terms.append(term)
+        self._term_company.append(company)
+        self._by_term[term] = term_id
+        for gram in set(trigrams(term)):
+            self._postings[gram].append(term_id)
+
+    def learn(self, company_name: str) -> None:
+        """Remember a company a lookup found a profile for"""
+        if self.resolve(company_name, record=False).match == "none":
+            if self.add(company_name):
+                logger.debug(f"Added {company_name!r} to the company name index")
+
+    def resolve(self, company_name: str, record: bool = True) -> CompanyNameMatch:
+        """
+        Map a typed company name onto a known company.
+
+        The whole input is tried first, then each part of inputs naming
+        alternatives such as "Alphabet/Google".
+
+        Args:
+            company_name: Name as typed by the user
+            record: Whether to count the result in the match metric
+
+        Returns:
+            The match; unknown names resolve to their own canonical form
+        """
+        whole = canonicalize_company_name(company_name)
+        keys = [whole]
+        parts = ALTERNATIVE_NAME_SEPARATORS.split(company_name.strip())
+        if len(parts) > 1:
+            keys.extend(canonicalize_company_name(part) for part in parts)
+        keys = [key for key in keys if key]
+
+        result = None
+        for key in keys:
+            term_id = self._by_term.get(key)
+            if term_id is not None:
+                company = self._term_company[term_id]
+                match = "exact" if self._keys[company] == key else "alias"
+                result = CompanyNameMatch(self._keys[company], self._names[company], match)
+                break
+        else:
+            for key in keys:
+                company = self._fuzzy_match(key)
+                if company is not None:
+                    result = CompanyNameMatch(self._keys[company], self._names[company], "fuzzy")
+                    break
+
+        if result is None:
+            result = CompanyNameMatch(whole, " ".join(company_name.split()), "none")
+        if record:
+            COMPANY_NAME_MATCHES.labels(match=result.match).inc()
+        return result
+
+    def _fuzzy_match(self, key: str) -> Optional[int]:
+        """Company of the closest indexed term within the similarity threshold"""
+        shared = Counter(chain.from_iterable(self._postings.get(gram, ()) for gram in set(trigrams(key))))
+
+        # Numbers are never typos: "Studio 54" and "Studio 55" are different companies
+        digits = NON_DIGIT_PATTERN.sub("", key)
+
+        best_company, best_similarity = None, self.min_similarity
+        for term_id in heapq.nlargest(FUZZY_CANDIDATES, shared, key=shared.__getitem__):
+            term = self._terms[term_id]
+            if NON_DIGIT_PATTERN.sub("", term) != digits:
+                continue
+            length = max(len(key), len(term))
+            limit = int((1 - best_similarity) * length)
+            if limit == 0:
+                continue
+            distance = bounded_edit_distance(key, term, limit)
+            similarity = 1 - distance / length
+            if distance <= limit and similarity >= best_similarity:
+                best_company, best_similarity = self._term_company[term_id], similarity
+        return best_company
+
+    def load_seed_file(self, path: str) -> int:
+        """
+        Add the companies listed in a seed file ("Name | Alias | Alias" per line, # comments).
+
+        Returns:
+            Number of companies added
+        """
+        added = 0
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line or line.startswith("#"):
+                    continue
+                name, *aliases = [part.strip() for part in line.split("|")]
+                if self.add(name, aliases):
+                    added += 1
+        return added
+
+
+# Process-wide index, created on first use
+_index: Optional[CompanyNameIndex] = None
+
+def get_company_name_index() -> CompanyNameIndex:
+    """Return the shared company name index, seeding it on first use"""
+    global _index
+    if _index is None:
+        names_config = get_settings().company.names
+        _index = CompanyNameIndex(names_config.max_entries, names_config.min_similarity)
+        seed_file = names_config.seed_file or DEFAULT_SEED_FILE
+        try:
+            seeded = _index.load_seed_file(seed_file)
+            logger.info(f"Seeded company name index with {seeded} companies from {seed_file}")
+        except OSError as e:
+            logger.warning(f"Could not read company name seed file {seed_file}: {str(e)}")
+    return _index
@@ -0,0 +1,175 @@
+"""
+Prefetch company profiles into a snapshot the application loads at startup.
+
+Reads company names (one per line, "#" comments allowed) from a file or
+stdin, looks each one up through analyze_company_info with bounded
+concurrency and writes the resulting cache as a gzip-compressed JSON Lines
+snapshot. Point COMPANY_CACHE_SNAPSHOT at the file so a freshly deployed
+instance starts with a warm company cache. Profiles still fresh in an
+existing snapshot are kept rather than fetched again, so the command can be
+scheduled nightly against the same list.
+
+Usage (from the src/ directory):
+    python -m modules.company.prefetch companies.txt --output /app/cache/snapshot.jsonl.gz [--concurrency 8] [--refresh]
+    cat companies.txt | python -m modules.company.prefetch --output snapshot.jsonl.gz
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from typing import Iterable, List, Tuple
+
+from config import get_settings
+from modules.clients import get_exa_client
+from modules.errors.exceptions import AppBaseException
+from .cache import get_company_cache
+from .company import analyze_company_info, shutdown_exa_executor
+from .names import get_company_name_index
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class PrefetchReport:
+    """Outcome of a prefetch run"""
+    def __init__(self, requested: int):
+        self.requested = requested
+        # Distinct companies after resolving name variants
+        self.companies = 0
+        self.fetched = 0
+        self.not_found = 0
+        # Still fresh in the existing snapshot, not fetched again
+        self.cached = 0
+        # (name, error message) per failed lookup
+        self.failures: List[Tuple[str, str]] = []
+        self.saved = 0
+        self.elapsed = 0.0
+
+    def summary(self) -> str:
+        throughput = (self.fetched + self.not_found + len(self.failures)) / self.elapsed if self.elapsed else 0.0
+        return (
+            f"{self.requested} names, {self.companies} companies: "
+            f"{self.fetched} fetched, {self.not_found} not found, {self.cached} already fresh, "
+            f"{len(self.failures)} failed in {self.elapsed:.1f}s ({throughput:.2f} lookups/s); "
+            f"{self.saved} profiles saved"
+        )
+
+
+def read_company_names(lines: Iterable[str]) -> List[str]:
+    """Company names from a list file, skipping blank lines and # comments"""
+    names = []
+    for line in lines:
+        line = line.strip()
+        if line and not line.startswith("#"):
+            names.append(line)
+    return names
+
+async def prefetch_company_profiles(names: List[str], output: str, concurrency: int, refresh: bool = False) -> PrefetchReport:
+    """
+    Look up company profiles and write them to a snapshot file.
+
+    Args:
+        names: Company names as users would type them
+        output: Snapshot file; profiles already in it are merged
+        concurrency: Most lookups in flight at once
+        refresh: Fetch every company again, even ones still fresh in the snapshot
+
+    Returns:
+        Counts of what was fetched, found, skipped and failed
+    """
+    report = PrefetchReport(requested=len(names))
+    cache = get_company_cache()
+    previous = await cache.load(output)
+    if previous:
+        logger.info(f"Loaded {previous} profiles from existing snapshot {output}")
+
+    # One lookup per company, however many variants of its name are listed
+    index = get_company_name_index()
+    companies = {}
+    for name in names:
+        companies.setdefault(index.resolve(name, record=False).key, name)
+    report.companies = len(companies)
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prefetch_one(key: str, name: str) -> None:
+        entry = cache.get_entry(key)
+        if entry is not None and not refresh and time.time() - entry.stored_at <= entry.ttl:
+            report.cached += 1
+            return
+        # Stale entries would be served as is, so drop them to force a fetch
+        cache.pop(key)
+
+        async with semaphore:
+            start_time = time.perf_counter()
+            try:
+                await analyze_company_info(name)
+            except AppBaseException as e:
+                report.failures.append((name, e.message))
+                logger.warning(f"Prefetch of {name!r} failed: {e.message}")
+                return
+
+        entry = cache.get_entry(key)
+        if entry is not None and entry.value is None:
+            report.not_found += 1
+        else:
+            report.fetched += 1
+        logger.info(f"Prefetched {name!r} in {time.perf_counter() - start_time:.2f}s")
+
+    start_time = time.perf_counter()
+    await asyncio.gather(*(prefetch_one(key, name) for key, name in companies.items()))
+    report.elapsed = time.perf_counter() - start_time
+
+    report.saved = await asyncio.to_thread(cache.save, cache.items(), output)
+    return report
+
+def main(argv=None) -> int:
+    config = get_settings()
+    parser = argparse.ArgumentParser(description="Prefetch company profiles into a cache snapshot.")
+    parser.add_argument(
+        "names", nargs="?", type=argparse.FileType("r", encoding="utf-8"), default=sys.stdin,
+        help="File with one company name per line (default: stdin)"
+    )
+    parser.add_argument(
+        "--output", default=config.company.cache.snapshot_path,
+        help="Snapshot file to write (default: COMPANY_CACHE_SNAPSHOT)"
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=config.exa.max_workers,
+        help="Lookups in flight at once (default: EXA_MAX_WORKERS)"
+    )
+    parser.add_argument("--refresh", action="store_true", help="Fetch companies still fresh in the snapshot again")
+    parser.add_argument("--verbose", action="store_true", help="Log every lookup")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+    )
+
+    if not args.output:
+        parser.error("no snapshot file given: pass --output or set COMPANY_CACHE_SNAPSHOT")
+    if get_exa_client() is None:
+        parser.error("EXA_API_KEY is not configured")
+    if args.concurrency < 1:
+        parser.error("--concurrency must be at least 1")
+
+    with args.names:
+        names = read_company_names(args.names)
+
+    # Size the cache so the whole list fits in the snapshot next to the
+    # profiles already in it, unless configured larger
+    get_company_cache(max_entries=max(config.company.cache.max_entries, 2 * len(names)))
+
+    try:
+        report = asyncio.run(prefetch_company_profiles(names, args.output, args.concurrency, args.refresh))
+    finally:
+        shutdown_exa_executor()
+
+    print(report.summary())
+    for name, message in report.failures:
+        print(f"FAILED {name}: {message}", file=sys.stderr)
+    return 1 if report.failures else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,134 @@
+"""
+Reuse of generated cover letters for repeated and retried requests.
+
+Users double-click "Generate" and clients retry on flaky connections, and
+each of those used to run the whole pipeline again, letter generation call
+included. Two layers avoid that:
+
+- Generated letters are cached under a hash of the complete model request
+  (model, prompt text with the CV, job description, company information and
+  word limit, sampling parameters), so a change to any input or to the
+  prompt template gives a new key. Concurrent identical generations share
+  one call.
+- Requests sent with an Idempotency-Key header are registered while they
+  run: a duplicate arriving meanwhile waits for the running request instead
+  of starting its own, and a retry after it finished gets the same letter.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from config import get_settings
+from modules.cache import TTLCache
+from modules.monitoring.prometheus import COALESCED_REQUESTS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Process-wide caches, created on first use
+_letter_cache: Optional[TTLCache] = None
+_idempotency_store: Optional["IdempotencyStore"] = None
+
+def letter_cache_key(payload: Dict[str, Any]) -> str:
+    """Return the letter cache key of an OpenRouter request payload"""
+    canonical = json.dumps(payload, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def get_letter_cache() -> TTLCache:
+    """Return the shared cache of generated (unformatted) letters"""
+    global _letter_cache
+    if _letter_cache is None:
+        cache_config = get_settings().cover_letter_cache
+        _letter_cache = TTLCache("cover_letter", max_entries=cache_config.max_entries, ttl=cache_config.ttl)
+    return _letter_cache
+
+
+class IdempotencyStore:
+    """
+    Cover letters of requests made with an Idempotency-Key, by key.
+
+    A job is the coroutine producing a request's letter. Requests with a key
+    whose job is running attach to it, and requests with a key whose job
+    finished within the TTL get its letter. Failed jobs are not remembered,
+    so a retry after a failure runs again.
+
+    Not thread-safe: meant to be used from the event loop only.
+
+    Args:
+        max_entries: Maximum number of finished results kept
+        ttl: Seconds a finished result is kept
+    """
+    def __init__(self, max_entries: int, ttl: float):
+        self._results = TTLCache("cover_letter_idempotency", max_entries=max_entries, ttl=ttl)
+        self._running: Dict[str, asyncio.Future] = {}
+
+    def find(self, key: str) -> Optional[asyncio.Future]:
+        """Return the future of the running or finished job for a key, or None"""
+        future = self._running.get(key)
+        if future is not None:
+            COALESCED_REQUESTS.labels(name="cover_letter_idempotency").inc()
+            logger.info("Request attached to the running request with the same Idempotency-Key")
+            return future
+
+        cover_letter = self._results.get(key)
+        if cover_letter is None:
+            return None
+        logger.info("Replaying the result of the request with the same Idempotency-Key")
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(cover_letter)
+        return future
+
+    def start(self, key: str, func: Callable[[], Awaitable[str]]) -> asyncio.Future:
+        """
+        Start func() as the job for a key.
+
+        The job runs in its own task, so it completes (and its result is kept
+        for retries) even if the request that started it goes away.
+
+        Returns:
+            The future of the job
+        """
+        future = asyncio.ensure_future(func())
+        self._running[key] = future
+        future.add_done_callback(lambda done: self._finish(key, done))
+        return future
+
+    async def run(self, key: str, func: Callable[[], Awaitable[str]]) -> str:
+        """
+        Return the letter of the job for a key, starting func() if there is none.
+        """
+        future = self.find(key)
+        if future is None:
+            future = self.start(key, func)
+        return await asyncio.shield(future)
+
+    def _finish(self, key: str, future: asyncio.Future) -> None:
+        if self._running.get(key) is future:
+            del self._running[key]
+        if future.cancelled():
+            return
+        # Also marks the exception as retrieved in case nobody awaits it
+        if future.exception() is None:
+            self._results.set(key, future.result())
+
+
+def idempotency_key(header: str, *fingerprint: Any) -> str:
+    """
+    Scope an Idempotency-Key header value to the request it was sent with.
+
+    The fingerprint (form fields, upload names and content digests) keeps a key that
+    is reused for a different request, by mistake or by another client,
+    from returning someone else's letter.
+    """
+    canonical = json.dumps([header, *fingerprint], ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+def get_idempotency_store() -> IdempotencyStore:
+    """Return the shared Idempotency-Key store"""
+    global _idempotency_store
+    if _idempotency_store is None:
+        cache_config = get_settings().cover_letter_cache
+        _idempotency_store = IdempotencyStore(max_entries=cache_config.max_entries, ttl=cache_config.idempotency_ttl)
+    return _idempotency_store
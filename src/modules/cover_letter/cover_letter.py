@@ -1,15 +1,31 @@
-import requests
 import logging
 import re
-import time
-from typing import Optional, Dict, Any
+from typing import AsyncIterator, Optional, Dict, Any
 
-from config import load_config
+from config import OpenRouterSettings, get_settings
 from modules.errors.exceptions import APIRequestError, ConfigurationError
+from modules.openrouter import call_openrouter_api, stream_openrouter_api
+from modules.prompt import PromptSection, estimate_tokens, fit_sections, max_tokens_for_words, record_token_usage
+from .cache import get_letter_cache, letter_cache_key
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+DEFAULT_WORD_LIMIT = 300
+
+# Prompt sections are never trimmed below these sizes (in tokens)
+RESUME_MIN_TOKENS = 600
+JOB_MIN_TOKENS = 400
+COMPANY_MIN_TOKENS = 100
+
+def unescape_cover_letter(text: str) -> str:
+    """Replace escaped newlines, tabs and quotes the model sometimes emits with the real characters"""
+    # Replace escaped newlines with actual newlines
+    formatted_text = text.replace('\\n', '\n')
+    
+    # Handle other escaped characters
+    return formatted_text.replace('\\"', '"').replace("\\'", "'").replace('\\t', '\t')
+
 def format_cover_letter(text: str) -> str:
     """
     Format the cover letter text by replacing escaped newlines and cleaning up spacing.
@@ -20,11 +36,7 @@ def format_cover_letter(text: str) -> str:
     Returns:
         Properly formatted cover letter text
     """
-    # Replace escaped newlines with actual newlines
-    formatted_text = text.replace('\\n', '\n')
-    
-    # Handle other escaped characters
-    formatted_text = formatted_text.replace('\\"', '"').replace("\\'", "'").replace('\\t', '\t')
+    formatted_text = unescape_cover_letter(text)
     
     # Clean up excessive newlines
     formatted_text = re.sub(r'\n{3,}', '\n\n', formatted_text)
@@ -35,98 +47,71 @@ def format_cover_letter(text: str) -> str:
     
     return formatted_text
 
-async def call_openrouter_api(payload: Dict[str, Any], api_key: str, api_url: str, max_retries: int = 3) -> Dict[str, Any]:
+
+class CoverLetterStreamFormatter:
     """
-    Makes an API call to OpenRouter with retry logic.
-    
-    Args:
-        payload: The request payload
-        api_key: OpenRouter API key
-        api_url: OpenRouter API URL
-        max_retries: Maximum number of retry attempts
-        
-    Returns:
-        The parsed JSON response
-        
-    Raises:
-        APIRequestError: If the API call fails after all retries
+    Apply format_cover_letter() to a letter arriving in pieces.
+
+    Each piece of generated text is fed in and the newly formatted text is
+    returned. Text whose formatting may still change (a trailing backslash
+    that may start an escape sequence, trailing newlines that may be
+    collapsed, a possible closing quote) is held back until more text
+    arrives. A leading quote is dropped right away; text() returns the exact
+    format_cover_letter() result once the letter is complete.
     """
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # Retry configuration
-    retry_delays = [1, 3, 5]  # Delays in seconds between retries
-    last_exception = None
-    
-    # Try the request with retries
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-            response_data = response.json()
-            
-            # Check for API errors
-            if response.status_code != 200:
-                error_message = response_data.get('error', {}).get('message', 'Unknown error')
-                logger.warning(f"OpenRouter API error (attempt {attempt+1}/{max_retries}): {error_message}")
-                
-                # If we've exhausted our retries, raise an exception
-                if attempt == max_retries - 1:
-                    raise APIRequestError(
-                        message=error_message,
-                        service_name="OpenRouter",
-                        status_code=response.status_code,
-                        details={"status_code": response.status_code, "response": response_data}
-                    )
-                
-                # Otherwise, wait and retry
-                time.sleep(retry_delays[min(attempt, len(retry_delays)-1)])
-                continue
-            
-            # Success - return the data
-            return response_data
-            
-        except requests.RequestException as e:
-            last_exception = e
-            logger.warning(f"Request error to OpenRouter API (attempt {attempt+1}/{max_retries}): {str(e)}")
-            
-            # If we've exhausted our retries, raise an exception
-            if attempt == max_retries - 1:
-                break
-                
-            # Otherwise, wait and retry
-            time.sleep(retry_delays[min(attempt, len(retry_delays)-1)])
-    
-    # If we get here, all retries failed
-    raise APIRequestError(
-        message=f"Failed after {max_retries} attempts: {str(last_exception)}",
-        service_name="OpenRouter",
-        details={"last_error": str(last_exception)}
-    )
+    def __init__(self):
+        self._raw = []
+        self._emitted = ""
+
+    def feed(self, piece: str) -> str:
+        """
+        Add generated text.
+
+        Returns:
+            Formatted text not returned before (may be empty)
+        """
+        self._raw.append(piece)
+        raw = "".join(self._raw)
+        if raw.endswith("\\"):
+            raw = raw[:-1]
+
+        stable = re.sub(r'\n{3,}', '\n\n', unescape_cover_letter(raw).rstrip("\n"))
+        if stable.startswith('"'):
+            # A closing quote would be dropped as well
+            stable = stable[1:]
+            if stable.endswith('"'):
+                stable = stable[:-1]
+
+        # Letters are a few kilobytes, so reformatting the whole text is cheap
+        if not stable.startswith(self._emitted):
+            return ""
+        delta = stable[len(self._emitted):]
+        self._emitted = stable
+        return delta
 
-async def generate_cover_letter(resume_text: str, job_description: str, company_info: str, word_limit: int = 300) -> str:
+    def text(self) -> str:
+        """The complete letter, formatted like format_cover_letter()"""
+        return format_cover_letter("".join(self._raw))
+
+def build_cover_letter_payload(resume_text: str, job_description: str, company_info: str, word_limit: int = 300, job_requirements: Optional[str] = None) -> Dict[str, Any]:
     """
-    Generate a personalized cover letter using OpenRouter API with CV, job description, and company info.
+    Build the OpenRouter request for a cover letter.
     
     Args:
         resume_text: Extracted text from the user's CV/resume
         job_description: Job description text
         company_info: Information about the company
         word_limit: Maximum number of words for the cover letter (default: 300)
+        job_requirements: Structured job requirements; when provided they are sent
+            in place of the (usually much longer) raw job description
         
     Returns:
-        Generated cover letter text
+        The request payload
     """
-    # Load configuration
-    config = load_config()
-    openrouter_config = config["openrouter"]
-    
-    if not openrouter_config["api_key"]:
-        raise ConfigurationError(
-            message="API key is missing or empty",
-            config_item="OPENROUTER_API_KEY"
-        )
+    config = get_settings()
+    openrouter_config = config.openrouter
+    prompt_config = config.prompt
+    word_limit = word_limit or DEFAULT_WORD_LIMIT
     
     # Create a prompt for the cover letter generation
     system_prompt = """You are an expert cover letter writer with experience in HR and recruitment. 
@@ -150,13 +135,19 @@ Begin with "Dear Hiring Manager," unless a specific name is provided.
 End with "Sincerely," followed by a placeholder for the applicant's name.
 """
 
-    user_prompt = f"""Generate a personalized cover letter based on the following information:
+    if job_requirements:
+        job_heading, job_text = "JOB REQUIREMENTS", job_requirements
+    else:
+        job_heading, job_text = "JOB DESCRIPTION", job_description
+
+    def render_user_prompt(resume_text: str, job_text: str, company_info: str) -> str:
+        return f"""Generate a personalized cover letter based on the following information:
 
 CV/RESUME INFORMATION:
 {resume_text}
 
-JOB DESCRIPTION:
-{job_description}
+{job_heading}:
+{job_text}
 
 COMPANY INFORMATION:
 {company_info}
@@ -169,9 +160,23 @@ that match the job requirements, while also showing knowledge of and enthusiasm
 Adhere strictly to the word limit specified above.
 """
     
+    # Fit the user-supplied sections into what the input budget leaves after the fixed text
+    chars_per_token = prompt_config.chars_per_token
+    fixed_tokens = estimate_tokens(system_prompt + render_user_prompt("", "", ""), chars_per_token)
+    sections = fit_sections(
+        [
+            PromptSection("resume", resume_text, priority=2, min_tokens=RESUME_MIN_TOKENS),
+            PromptSection("job", job_text, priority=3, min_tokens=JOB_MIN_TOKENS),
+            PromptSection("company", str(company_info or ""), priority=1, min_tokens=COMPANY_MIN_TOKENS),
+        ],
+        prompt_config.input_budget_tokens - fixed_tokens,
+        chars_per_token,
+    )
+    user_prompt = render_user_prompt(sections["resume"], sections["job"], sections["company"] or None)
+    
     # Prepare the payload for the OpenRouter API
-    payload = {
-        "model": openrouter_config["model"],
+    return {
+        "model": openrouter_config.model,
         "messages": [
             {
                 "role": "system",
@@ -182,29 +187,51 @@ Adhere strictly to the word limit specified above.
                 "content": user_prompt
             }
         ],
-        "max_tokens": 3000,
+        # Room for the requested number of words, rather than a fixed maximum
+        "max_tokens": max_tokens_for_words(word_limit, prompt_config.output_tokens_per_word),
         "temperature": 0.6,
     }
+
+def estimate_payload_tokens(payload: Dict[str, Any]) -> int:
+    """Estimate the input tokens of a chat completion request"""
+    chars_per_token = get_settings().prompt.chars_per_token
+    return sum(estimate_tokens(message["content"], chars_per_token) for message in payload["messages"])
+
+def _openrouter_settings() -> OpenRouterSettings:
+    """OpenRouter settings, checked for an API key"""
+    openrouter_config = get_settings().openrouter
+    if not openrouter_config.api_key:
+        raise ConfigurationError(
+            message="API key is missing or empty",
+            config_item="OPENROUTER_API_KEY"
+        )
+    return openrouter_config
+
+async def generate_cover_letter(resume_text: str, job_description: str, company_info: str, word_limit: int = 300, job_requirements: Optional[str] = None) -> str:
+    """
+    Generate a personalized cover letter using OpenRouter API with CV, job description, and company info.
+    
+    Args:
+        resume_text: Extracted text from the user's CV/resume
+        job_description: Job description text
+        company_info: Information about the company
+        word_limit: Maximum number of words for the cover letter (default: 300)
+        job_requirements: Structured job requirements; when provided they are sent
+            in place of the (usually much longer) raw job description
+        
+    Returns:
+        Generated cover letter text
+    """
+    openrouter_config = _openrouter_settings()
+    payload = build_cover_letter_payload(resume_text, job_description, company_info, word_limit, job_requirements)
     
     try:
-        # Call OpenRouter API with retry logic
-        response_data = await call_openrouter_api(
-            payload=payload,
-            api_key=openrouter_config["api_key"],
-            api_url=openrouter_config["api_url"]
+        # Identical requests (double submits, retries) reuse the letter
+        cover_letter = await get_letter_cache().get_or_load(
+            letter_cache_key(payload),
+            lambda: _request_cover_letter(payload, openrouter_config)
         )
         
-        # Extract the generated cover letter
-        cover_letter = response_data.get("choices", [{}])[0].get("message", {}).get("content", "")
-        
-        # Handle empty response
-        if not cover_letter.strip():
-            raise APIRequestError(
-                message="Received empty response",
-                service_name="OpenRouter",
-                details={"response": response_data}
-            )
-        
         # Format the cover letter text before returning
         formatted_cover_letter = format_cover_letter(cover_letter)
         
@@ -218,4 +245,94 @@ Adhere strictly to the word limit specified above.
                 service_name="Cover Letter Generator", 
                 details={"error_type": type(e).__name__}
             ) from e
-        raise 
\ No newline at end of file
+        raise 
+
+async def _request_cover_letter(payload: Dict[str, Any], openrouter_config: OpenRouterSettings) -> str:
+    """Ask the model for a cover letter and return its unformatted text"""
+    # Call OpenRouter API with retry logic
+    response_data = await call_openrouter_api(
+        payload=payload,
+        api_key=openrouter_config.api_key,
+        api_url=openrouter_config.api_url
+    )
+    
+    # Extract the generated cover letter
+    choice = response_data.get("choices", [{}])[0]
+    cover_letter = choice.get("message", {}).get("content", "")
+    
+    # Prefer the provider's token counts, falling back to estimates
+    usage = response_data.get("usage") or {}
+    record_token_usage(
+        "cover_letter",
+        usage.get("prompt_tokens", estimate_payload_tokens(payload)),
+        usage.get("completion_tokens", estimate_tokens(cover_letter, get_settings().prompt.chars_per_token)),
+    )
+    if choice.get("finish_reason") == "length":
+        logger.warning(f"Cover letter was cut off at max_tokens={payload['max_tokens']}")
+    
+    # Handle empty response
+    if not cover_letter.strip():
+        raise APIRequestError(
+            message="Received empty response",
+            service_name="OpenRouter",
+            details={"response": response_data}
+        )
+    return cover_letter
+
+async def stream_cover_letter(resume_text: str, job_description: str, company_info: str, word_limit: int = 300, job_requirements: Optional[str] = None) -> AsyncIterator[str]:
+    """
+    Generate a cover letter like generate_cover_letter(), yielding the raw text as the model writes it.
+    
+    Feed the pieces to a CoverLetterStreamFormatter to format them.
+    
+    Yields:
+        Pieces of the unformatted cover letter
+    
+    Raises:
+        APIRequestError: If the stream fails or produces no text
+    """
+    openrouter_config = _openrouter_settings()
+    payload = build_cover_letter_payload(resume_text, job_description, company_info, word_limit, job_requirements)
+    cache_key = letter_cache_key(payload)
+    
+    # A letter generated for an identical request is sent in one piece
+    cached = get_letter_cache().get(cache_key)
+    if cached is not None:
+        yield cached
+        return
+    
+    received = False
+    generated = []
+    pieces = stream_openrouter_api(
+        payload=payload,
+        api_key=openrouter_config.api_key,
+        api_url=openrouter_config.api_url
+    )
+    try:
+        async for piece in pieces:
+            received = received or bool(piece.strip())
+            generated.append(piece)
+            yield piece
+    except APIRequestError:
+        raise
+    except Exception as e:
+        raise APIRequestError(
+            message=f"Error generating cover letter: {str(e)}",
+            service_name="Cover Letter Generator",
+            details={"error_type": type(e).__name__}
+        ) from e
+    finally:
+        await pieces.aclose()
+        # Streamed responses carry no usage, so both directions are estimated
+        record_token_usage(
+            "cover_letter",
+            estimate_payload_tokens(payload),
+            estimate_tokens("".join(generated), get_settings().prompt.chars_per_token),
+        )
+    
+    if not received:
+        raise APIRequestError(
+            message="Received empty response",
+            service_name="OpenRouter",
+        )
+    get_letter_cache().set(cache_key, "".join(generated))
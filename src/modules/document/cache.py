@@ -0,0 +1,129 @@
+"""
+Content-addressed cache for extracted CV text.
+
+Users generate many letters from the same CV, so the normalized text extracted
+from a document is cached under the SHA-256 of the uploaded bytes. A bounded
+in-memory LRU tier serves repeat uploads within a process; an optional
+gzip-compressed on-disk tier survives restarts.
+"""
+import asyncio
+import gzip
+import hashlib
+import logging
+import os
+import tempfile
+from typing import Optional, Union
+
+from config import get_settings
+from modules.cache import LRUCache
+from modules.monitoring.prometheus import CACHE_ENTRIES, CACHE_EVICTIONS, CACHE_REQUESTS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def content_digest(content: Union[bytes, memoryview]) -> str:
+    """Return the hex SHA-256 digest used as the cache key for a document"""
+    return hashlib.sha256(content).hexdigest()
+
+
+class ExtractedTextCache:
+    """
+    Two-tier cache of extracted document text keyed by content digest.
+
+    Args:
+        max_entries: Size of the in-memory LRU tier
+        disk_dir: Directory for the compressed on-disk tier (None disables it)
+        max_disk_entries: Maximum number of files kept on disk (0 = unbounded)
+    """
+    def __init__(self, max_entries: int, disk_dir: Optional[str] = None, max_disk_entries: int = 0):
+        self.memory = LRUCache("cv_text", max_entries)
+        self.disk_dir = disk_dir
+        self.max_disk_entries = max_disk_entries
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.txt.gz")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        try:
+            with open(self._path(key), "rb") as f:
+                return gzip.decompress(f.read()).decode("utf-8")
+        except FileNotFoundError:
+            return None
+        except (OSError, EOFError, UnicodeDecodeError) as e:
+            logger.warning(f"Discarding unreadable CV text cache entry {key}: {str(e)}")
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+
+    def _write_disk(self, key: str, text: str) -> None:
+        # Write to a temp file and rename so readers never see a partial entry
+        fd, temp_path = tempfile.mkstemp(dir=self.disk_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(gzip.compress(text.encode("utf-8")))
+            os.replace(temp_path, self._path(key))
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            raise
+        self._prune_disk()
+
+    def _prune_disk(self) -> None:
+        """Remove the least recently written entries beyond max_disk_entries"""
+        entries = [entry for entry in os.scandir(self.disk_dir) if entry.name.endswith(".txt.gz")]
+        CACHE_ENTRIES.labels(cache="cv_text", tier="disk").set(len(entries))
+        if not self.max_disk_entries or len(entries) <= self.max_disk_entries:
+            return
+
+        entries.sort(key=lambda entry: entry.stat().st_mtime)
+        for entry in entries[:len(entries) - self.max_disk_entries]:
+            try:
+                os.remove(entry.path)
+                CACHE_EVICTIONS.labels(cache="cv_text", tier="disk").inc()
+            except OSError:
+                pass
+        CACHE_ENTRIES.labels(cache="cv_text", tier="disk").set(self.max_disk_entries)
+
+    async def get(self, key: str) -> Optional[str]:
+        """Return the cached text for a content digest, or None"""
+        text = self.memory.get(key)
+        if text is not None or not self.disk_dir:
+            return text
+
+        text = await asyncio.to_thread(self._read_disk, key)
+        CACHE_REQUESTS.labels(cache="cv_text_disk", result="hit" if text is not None else "miss").inc()
+        if text is not None:
+            # Promote to the memory tier
+            self.memory.set(key, text)
+        return text
+
+    async def set(self, key: str, text: str) -> None:
+        """Store extracted text for a content digest in all tiers"""
+        self.memory.set(key, text)
+        if self.disk_dir:
+            try:
+                await asyncio.to_thread(self._write_disk, key, text)
+            except OSError as e:
+                # The disk tier is best effort
+                logger.warning(f"Failed to write CV text cache entry {key}: {str(e)}")
+
+
+# Process-wide cache, created on first use
+_cache: Optional[ExtractedTextCache] = None
+
+def get_text_cache() -> ExtractedTextCache:
+    """Return the shared extracted text cache"""
+    global _cache
+    if _cache is None:
+        cache_config = get_settings().document.cache
+        _cache = ExtractedTextCache(
+            max_entries=cache_config.max_entries,
+            disk_dir=cache_config.disk_dir or None,
+            max_disk_entries=cache_config.max_disk_entries,
+        )
+    return _cache
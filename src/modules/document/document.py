@@ -1,60 +1,213 @@
+import asyncio
 import fitz  # PyMuPDF
 import docx
+import io
 import logging
+import mmap
 import os
-import tempfile
+import zipfile
+from contextlib import asynccontextmanager
 from fastapi import UploadFile
-from typing import Optional
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Union
+from xml.etree import ElementTree
 
+from config import DocumentSettings, get_settings
 from modules.errors.exceptions import DocumentProcessingError, ValidationError
+from modules.monitoring.prometheus import DOCUMENT_PAGES, DOCUMENT_TEXT_BYTES
+from .cache import content_digest, get_text_cache
+from .docx_stream import extract_docx_text_streaming
+from .pool import get_extraction_pool
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# Part of the extracted text cache key: bumped when the normalization of
+# extracted text changes, so text cached in the old form is not reused
+TEXT_NORMALIZATION_VERSION = 2
+
+# Uploads that python-multipart has already spooled to disk and that are at
+# least this large are memory-mapped instead of being copied into memory
+MMAP_THRESHOLD_BYTES = 1024 * 1024
+
+class MappedFile:
+    """
+    Minimal read-only, seekable file object over a memory map.
+
+    mmap objects lack seekable() before Python 3.13, which zipfile (and
+    therefore python-docx) requires.
+    """
+    def __init__(self, mapping: mmap.mmap):
+        self._mapping = mapping
+
+    def read(self, size: int = -1) -> bytes:
+        return self._mapping.read(size)
+
+    def seek(self, offset: int, whence: int = os.SEEK_SET) -> int:
+        self._mapping.seek(offset, whence)
+        return self._mapping.tell()
+
+    def tell(self) -> int:
+        return self._mapping.tell()
+
+    def seekable(self) -> bool:
+        return True
+
+    def readable(self) -> bool:
+        return True
+
+    def getvalue(self) -> bytes:
+        return self._mapping[:]
+
+    @property
+    def mapping(self) -> mmap.mmap:
+        return self._mapping
+
+    def __len__(self) -> int:
+        return len(self._mapping)
+
+DocumentBuffer = Union[bytes, MappedFile]
+
+@asynccontextmanager
+async def open_upload_buffer(upload_file: UploadFile) -> AsyncIterator[DocumentBuffer]:
+    """
+    Expose the content of an upload without writing it to a temporary file.
+
+    Small uploads (kept in memory by the multipart parser) are read as bytes.
+    Large uploads that were spooled to disk are memory-mapped, so their pages are
+    only faulted in as the parser touches them.
+
+    Yields:
+        The upload content as bytes or a MappedFile
+    """
+    spooled = upload_file.file
+    rolled_to_disk = getattr(spooled, "_rolled", False)
+    size = upload_file.size
+
+    if rolled_to_disk and size and size >= MMAP_THRESHOLD_BYTES:
+        spooled.flush()
+        mapping = mmap.mmap(spooled.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            yield MappedFile(mapping)
+        finally:
+            mapping.close()
+    else:
+        await upload_file.seek(0)
+        yield await upload_file.read()
+
+async def upload_digest(upload_file: UploadFile) -> str:
+    """Return the content digest of an upload, leaving it positioned at the start"""
+    async with open_upload_buffer(upload_file) as content:
+        digest = content_digest(content.mapping if isinstance(content, MappedFile) else content)
+    await upload_file.seek(0)
+    return digest
+
 # Document processing service functions
-def extract_text_from_pdf(file_path):
-    """Extract text from a PDF file using PyMuPDF"""
-    try:
-        doc = fitz.open(file_path)
-        text = ""
-        for page in doc:
-            text += page.get_text()
-        doc.close()
+def extract_pdf_text(
+    data: DocumentBuffer,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    start_page: int = 0,
+    stop_page: Optional[int] = None,
+) -> Dict[str, Any]:
+    """
+    Extract text from a range of pages of an in-memory PDF using PyMuPDF.
+    
+    Args:
+        data: The PDF content
+        max_pages: Refuse documents with more pages than this
+        max_chars: Stop after the page that reaches this many characters
+        start_page: First page to extract (0-based)
+        stop_page: Page to stop before (defaults to the end of the document)
         
-        if not text.strip():
-            raise DocumentProcessingError(
-                "Extracted PDF is empty or contains no text",
-                doc_type="PDF",
-                details={"file_path": file_path}
-            )
+    Returns:
+        Dictionary with the extracted "text", the document's "page_count" and
+        the number of "pages_extracted"
+    """
+    try:
+        # PyMuPDF only accepts bytes streams, so a mapped upload is materialized once here
+        stream = data.getvalue() if isinstance(data, MappedFile) else data
+        doc = fitz.open(stream=stream, filetype="pdf")
+        try:
+            page_count = doc.page_count
+            if max_pages and page_count > max_pages:
+                raise DocumentProcessingError(
+                    f"PDF has too many pages ({page_count}). Maximum allowed is {max_pages}",
+                    doc_type="PDF",
+                    details={"page_count": page_count, "max_pages": max_pages}
+                )
             
-        return text
+            stop_page = page_count if stop_page is None else min(stop_page, page_count)
+            
+            # Collect pages in a list and join once instead of repeated concatenation
+            parts = []
+            chars = 0
+            for page_number in range(start_page, stop_page):
+                page_text = doc[page_number].get_text()
+                parts.append(page_text)
+                chars += len(page_text)
+                if max_chars and chars >= max_chars:
+                    break
+        finally:
+            doc.close()
+        
+        return {"text": "".join(parts), "page_count": page_count, "pages_extracted": len(parts)}
     except fitz.FileDataError as e:
         raise DocumentProcessingError(
             f"Invalid or corrupted PDF file: {str(e)}",
             doc_type="PDF",
-            details={"file_path": file_path, "error": str(e)}
+            details={"size_bytes": len(data), "error": str(e)}
         )
+    except DocumentProcessingError:
+        raise
     except Exception as e:
         raise DocumentProcessingError(
             f"Error extracting text from PDF: {str(e)}",
             doc_type="PDF", 
-            details={"file_path": file_path, "error_type": type(e).__name__}
+            details={"size_bytes": len(data), "error_type": type(e).__name__}
         )
 
-def extract_text_from_docx(file_path):
-    """Extract text from a DOCX file using python-docx"""
+def extract_text_from_pdf(data: DocumentBuffer, max_pages: Optional[int] = None, max_chars: Optional[int] = None) -> str:
+    """Extract text from an in-memory PDF using PyMuPDF, refusing documents over max_pages"""
+    text = extract_pdf_text(data, max_pages=max_pages, max_chars=max_chars)["text"]
+    
+    if not text.strip():
+        raise DocumentProcessingError(
+            "Extracted PDF is empty or contains no text",
+            doc_type="PDF",
+            details={"size_bytes": len(data)}
+        )
+        
+    return text
+
+def extract_docx_text_full(data: DocumentBuffer) -> str:
+    """Extract paragraph text from an in-memory DOCX by loading it with python-docx"""
+    if isinstance(data, MappedFile):
+        data.seek(0)
+    doc = docx.Document(data if isinstance(data, MappedFile) else io.BytesIO(data))
+    return "".join(para.text + "\n" for para in doc.paragraphs)
+
+def extract_text_from_docx(data: DocumentBuffer):
+    """
+    Extract text from an in-memory DOCX.
+    
+    Streams word/document.xml (including table cells) and falls back to
+    python-docx if the package can't be read that way.
+    """
     try:
-        doc = docx.Document(file_path)
-        text = ""
-        for para in doc.paragraphs:
-            text += para.text + "\n"
+        text = None
+        try:
+            text = extract_docx_text_streaming(data)
+        except (zipfile.BadZipFile, KeyError, ElementTree.ParseError) as e:
+            logger.warning(f"Streaming DOCX extraction failed ({type(e).__name__}: {str(e)}), falling back to python-docx")
+        
+        if text is None:
+            text = extract_docx_text_full(data)
             
         if not text.strip():
             raise DocumentProcessingError(
                 "Extracted DOCX is empty or contains no text",
                 doc_type="DOCX",
-                details={"file_path": file_path}
+                details={"size_bytes": len(data)}
             )
             
         return text
@@ -62,14 +215,115 @@ def extract_text_from_docx(file_path):
         raise DocumentProcessingError(
             "Invalid or corrupted DOCX file",
             doc_type="DOCX",
-            details={"file_path": file_path}
+            details={"size_bytes": len(data)}
         )
+    except DocumentProcessingError:
+        raise
     except Exception as e:
         raise DocumentProcessingError(
             f"Error extracting text from DOCX: {str(e)}",
             doc_type="DOCX",
-            details={"file_path": file_path, "error_type": type(e).__name__}
+            details={"size_bytes": len(data), "error_type": type(e).__name__}
+        )
+
+async def run_extraction(func: Callable[..., str], content: DocumentBuffer, doc_type: str, *args) -> str:
+    """
+    Run an extraction function in the process pool, or inline if the pool is disabled.
+    
+    Args:
+        func: Module-level extraction function, e.g. extract_text_from_docx
+        content: The document content
+        doc_type: Document type for metrics and error messages
+        args: Extra arguments passed to func
+        
+    Returns:
+        The extracted text
+    """
+    pool = get_extraction_pool()
+    if pool is None:
+        return func(content, *args)
+    
+    # Memory maps can't be sent to another process
+    data = content.getvalue() if isinstance(content, MappedFile) else content
+    return await pool.run(func, data, *args, doc_type=doc_type)
+
+async def extract_pdf_document(content: DocumentBuffer, document_config: DocumentSettings) -> str:
+    """
+    Extract text from a PDF, stopping once the configured character budget is reached.
+    
+    With the process pool enabled and parallel extraction on, the first chunk of
+    pages is extracted (which also yields the page count); the remaining chunks
+    are then extracted in parallel, one wave of pool-sized batches at a time,
+    until the budget is met.
+    
+    Args:
+        content: The PDF content
+        document_config: The document extraction settings
+        
+    Returns:
+        The extracted text (at most max_chars characters when a budget is set)
+    """
+    max_pages = document_config.max_pages
+    max_chars = document_config.max_chars or None
+    chunk_pages = document_config.pdf_chunk_pages
+    pool = get_extraction_pool()
+    
+    if pool is None:
+        result = extract_pdf_text(content, max_pages, max_chars)
+        parts = [result["text"]]
+        page_count, pages_extracted = result["page_count"], result["pages_extracted"]
+    elif not document_config.pdf_parallel:
+        data = content.getvalue() if isinstance(content, MappedFile) else content
+        result = await pool.run(extract_pdf_text, data, max_pages, max_chars, doc_type="PDF")
+        parts = [result["text"]]
+        page_count, pages_extracted = result["page_count"], result["pages_extracted"]
+    else:
+        data = content.getvalue() if isinstance(content, MappedFile) else content
+        first = await pool.run(extract_pdf_text, data, max_pages, max_chars, 0, chunk_pages, doc_type="PDF")
+        parts = [first["text"]]
+        page_count, pages_extracted = first["page_count"], first["pages_extracted"]
+        chars = len(first["text"])
+        
+        chunks = [(start, start + chunk_pages) for start in range(chunk_pages, page_count, chunk_pages)]
+        for wave_start in range(0, len(chunks), pool.max_workers):
+            if max_chars and chars >= max_chars:
+                break
+            remaining = max_chars - chars if max_chars else None
+            wave = chunks[wave_start:wave_start + pool.max_workers]
+            results = await asyncio.gather(*(
+                pool.run(extract_pdf_text, data, None, remaining, start, stop, doc_type="PDF")
+                for start, stop in wave
+            ))
+            # Chunks come back in page order; keep only what the budget still needs
+            for result in results:
+                if max_chars and chars >= max_chars:
+                    break
+                parts.append(result["text"])
+                chars += len(result["text"])
+                pages_extracted += result["pages_extracted"]
+    
+    text = "".join(parts)
+    if max_chars:
+        text = text[:max_chars]
+    
+    DOCUMENT_PAGES.labels(doc_type="PDF", kind="total").observe(page_count)
+    DOCUMENT_PAGES.labels(doc_type="PDF", kind="extracted").observe(pages_extracted)
+    DOCUMENT_TEXT_BYTES.labels(doc_type="PDF").observe(len(text.encode("utf-8")))
+    logger.info(f"PDF extraction: {pages_extracted}/{page_count} pages, {len(text)} characters")
+    
+    if not text.strip():
+        raise DocumentProcessingError(
+            "Extracted PDF is empty or contains no text",
+            doc_type="PDF",
+            details={"size_bytes": len(content), "page_count": page_count}
         )
+    
+    return text
+
+def normalize_whitespace(text: str) -> str:
+    """Collapse runs of spaces and tabs and drop blank lines, keeping one line per line of text"""
+    lines = (" ".join(line.split()) for line in text.splitlines())
+    return "\n".join(line for line in lines if line)
 
 async def extract_docs(cv_file: UploadFile) -> str:
     """
@@ -95,34 +349,39 @@ async def extract_docs(cv_file: UploadFile) -> str:
             details={"allowed_formats": ["pdf", "docx"], "provided": filename.split(".")[-1]}
         )
     
-    # Create a temporary file to store the uploaded content
-    temp_path = None
+    document_config = get_settings().document
+    
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=os.path.splitext(filename)[1]) as temp_file:
-            # Write the uploaded file content to the temp file
-            content = await cv_file.read()
-            
+        # Extract text straight from memory (or a memory map of the spooled upload)
+        async with open_upload_buffer(cv_file) as content:
             if not content:
                 raise ValidationError("Uploaded file is empty", field="cv_file")
-                
-            temp_file.write(content)
-            temp_path = temp_file.name
-        
-        # Extract text based on file type
-        if filename.endswith('.pdf'):
-            text = extract_text_from_pdf(temp_path)
-        elif filename.endswith('.docx'):
-            text = extract_text_from_docx(temp_path)
-        else:
-            # This should never happen due to the earlier check
-            raise ValidationError(
-                "Unsupported file format", 
-                field="cv_file",
-                details={"file_extension": os.path.splitext(filename)[1]}
-            )
+            
+            # Identical uploads (same CV, different jobs) skip extraction entirely
+            text_cache = get_text_cache()
+            digest = content_digest(content.mapping if isinstance(content, MappedFile) else content)
+            cache_key = f"{digest}-v{TEXT_NORMALIZATION_VERSION}"
+            cached_text = await text_cache.get(cache_key)
+            if cached_text is not None:
+                logger.info(f"Using cached text for {filename} ({len(cached_text)} characters)")
+                return cached_text
+            
+            # Extract text based on file type
+            if filename.endswith('.pdf'):
+                text = await extract_pdf_document(content, document_config)
+            elif filename.endswith('.docx'):
+                text = await run_extraction(extract_text_from_docx, content, "DOCX")
+            else:
+                # This should never happen due to the earlier check
+                raise ValidationError(
+                    "Unsupported file format", 
+                    field="cv_file",
+                    details={"file_extension": os.path.splitext(filename)[1]}
+                )
         
-        # Cleanup text - remove excessive whitespace
-        text = " ".join(text.split())
+        # Cleanup text - remove excessive whitespace, keeping the line
+        # structure that CV relevance selection relies on
+        text = normalize_whitespace(text)
         
         # Verify we got meaningful content
         if not text or len(text) < 100:  # Arbitrary minimum length for a reasonable CV
@@ -135,6 +394,7 @@ async def extract_docs(cv_file: UploadFile) -> str:
         
         logger.info(f"Successfully extracted {len(text)} characters from {filename}")
         
+        await text_cache.set(cache_key, text)
         return text
     
     except Exception as e:
@@ -146,12 +406,3 @@ async def extract_docs(cv_file: UploadFile) -> str:
                 details={"filename": filename, "error_type": type(e).__name__}
             ) from e
         raise
-    
-    finally:
-        # Clean up the temporary file
-        if temp_path and os.path.exists(temp_path):
-            try:
-                os.remove(temp_path)
-                logger.debug(f"Deleted temporary file: {temp_path}")
-            except Exception as e:
-                logger.warning(f"Failed to delete temporary file {temp_path}: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,71 @@
+"""
+Streaming DOCX text extraction.
+
+Reads word/document.xml straight out of the DOCX zip and walks it with
+iterparse, emitting paragraph text as it goes. Unlike python-docx this never
+builds the full object model (styles, numbering, headers, relationships), and
+it includes paragraphs inside table cells.
+"""
+import io
+import zipfile
+from typing import BinaryIO, Iterator, Union
+from xml.etree import ElementTree
+
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+PARAGRAPH_TAG = f"{WORD_NAMESPACE}p"
+TEXT_TAG = f"{WORD_NAMESPACE}t"
+TAB_TAG = f"{WORD_NAMESPACE}tab"
+BREAK_TAGS = {f"{WORD_NAMESPACE}br", f"{WORD_NAMESPACE}cr"}
+DOCUMENT_PART = "word/document.xml"
+
+def iter_docx_paragraphs(source: Union[bytes, BinaryIO]) -> Iterator[str]:
+    """
+    Yield the text of each paragraph of a DOCX document in document order.
+
+    Args:
+        source: DOCX content as bytes or a seekable binary file object
+
+    Raises:
+        zipfile.BadZipFile: If the content is not a zip archive
+        KeyError: If the archive has no word/document.xml
+        ElementTree.ParseError: If the document XML is malformed
+    """
+    if isinstance(source, (bytes, bytearray)):
+        source = io.BytesIO(source)
+
+    with zipfile.ZipFile(source) as archive:
+        with archive.open(DOCUMENT_PART) as document_xml:
+            # w:document > w:body > paragraphs, tables and section properties
+            body = None
+            depth = 0
+            for event, element in ElementTree.iterparse(document_xml, events=("start", "end")):
+                if event == "start":
+                    depth += 1
+                    if depth == 2:
+                        body = element
+                    continue
+                depth -= 1
+
+                if element.tag == PARAGRAPH_TAG:
+                    parts = []
+                    for node in element.iter():
+                        if node.tag == TEXT_TAG:
+                            parts.append(node.text or "")
+                        elif node.tag == TAB_TAG:
+                            parts.append("\t")
+                        elif node.tag in BREAK_TAGS:
+                            parts.append("\n")
+                    yield "".join(parts)
+
+                    # Drop the paragraph's subtree (a paragraph in a table or
+                    # text box must not show up again in the enclosing one)
+                    element.clear()
+
+                if depth == 2 and body is not None:
+                    # A top-level body element is finished: detach it so the
+                    # tree stays small however long the document is
+                    body.clear()
+
+def extract_docx_text_streaming(source: Union[bytes, BinaryIO]) -> str:
+    """Return the text of a DOCX document, one paragraph per line"""
+    return "\n".join(iter_docx_paragraphs(source)) + "\n"
@@ -0,0 +1,259 @@
+"""
+Process pool for CPU-bound document extraction.
+
+Parsing PDFs and DOCX files is CPU-bound and would block the event loop, so it
+runs in a small pool of worker processes. Each worker runs under an address
+space limit, and a task that exceeds its wall-clock timeout gets its worker
+killed and replaced, so a pathological document can't take the API worker (or
+other documents being extracted) down with it.
+"""
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, List, Optional
+
+from config import get_settings
+from modules.errors.exceptions import DocumentProcessingError
+from modules.monitoring.prometheus import (
+    DOCUMENT_EXTRACTION_DURATION,
+    DOCUMENT_EXTRACTION_FAILURES,
+    DOCUMENT_EXTRACTION_QUEUE_DEPTH,
+)
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+def _init_worker(memory_limit_bytes: int) -> None:
+    """Worker initializer: cap the address space of the worker process"""
+    if not memory_limit_bytes:
+        return
+    try:
+        import resource
+        resource.setrlimit(resource.RLIMIT_AS, (memory_limit_bytes, memory_limit_bytes))
+    except (ImportError, ValueError, OSError) as e:
+        # Not supported on every platform (e.g. Windows, some macOS versions)
+        logging.getLogger(__name__).warning(f"Could not set worker memory limit: {str(e)}")
+
+def _warm_up() -> bool:
+    """No-op task used to make sure every worker process has started"""
+    return True
+
+
+class ExtractionPool:
+    """
+    Pool of worker processes with per-task timeouts that kills stuck workers.
+
+    Each worker is a single-process executor, handed to one task at a time.
+    The timeout runs from the moment a worker picks the task up, so waiting
+    for a free worker doesn't count against it, and a stuck task only gets
+    its own worker killed and replaced. Tasks still waiting for a worker
+    after the timeout are rejected as the pool being saturated.
+
+    Args:
+        max_workers: Number of worker processes
+        task_timeout: Wall-clock limit per task in seconds, also the longest
+            a task waits for a free worker
+        memory_limit_mb: Address space limit per worker in MB (0 disables it)
+    """
+    def __init__(self, max_workers: int, task_timeout: float, memory_limit_mb: int):
+        self.max_workers = max_workers
+        self.task_timeout = task_timeout
+        self.memory_limit_bytes = memory_limit_mb * 1024 * 1024
+        self._workers: List[ProcessPoolExecutor] = []
+        # Workers not running a task, bound to the event loop that created it
+        self._idle: Optional["asyncio.Queue[ProcessPoolExecutor]"] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _create_worker(self) -> ProcessPoolExecutor:
+        # spawn: never fork a process that is running an event loop and threads
+        return ProcessPoolExecutor(
+            max_workers=1,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.memory_limit_bytes,),
+        )
+
+    def _idle_workers(self) -> "asyncio.Queue[ProcessPoolExecutor]":
+        """Return the idle worker queue, creating the workers on first use"""
+        if not self._workers:
+            self._workers = [self._create_worker() for _ in range(self.max_workers)]
+            self._idle = None
+        loop = asyncio.get_running_loop()
+        if self._idle is None or self._loop is not loop:
+            # Tasks never outlive the loop that ran them, so every worker is idle
+            self._idle = asyncio.Queue()
+            self._loop = loop
+            for worker in self._workers:
+                self._idle.put_nowait(worker)
+        return self._idle
+
+    async def start(self) -> None:
+        """Create the worker processes and wait until they are all up"""
+        if self._workers:
+            return
+        self._idle_workers()
+        await self._warm_up()
+        logger.info(
+            f"Document extraction pool started ({self.max_workers} workers, "
+            f"timeout={self.task_timeout}s, memory_limit={self.memory_limit_bytes // (1024 * 1024)}MB)"
+        )
+
+    async def _warm_up(self) -> None:
+        loop = asyncio.get_running_loop()
+        await asyncio.gather(*(loop.run_in_executor(worker, _warm_up) for worker in self._workers))
+
+    def _release(self, worker: ProcessPoolExecutor, idle: "asyncio.Queue[ProcessPoolExecutor]") -> None:
+        """Make a worker available again unless it was replaced or the pool stopped"""
+        if worker in self._workers and idle is self._idle:
+            idle.put_nowait(worker)
+
+    def _replace_worker(self, worker: ProcessPoolExecutor, idle: "asyncio.Queue[ProcessPoolExecutor]") -> None:
+        """Kill a worker's process and start the worker taking its place"""
+        replacement = self._create_worker()
+        if worker in self._workers:
+            self._workers[self._workers.index(worker)] = replacement
+
+        # ProcessPoolExecutor can't cancel a running task, so kill its process
+        for process in list((worker._processes or {}).values()):
+            if process.is_alive():
+                process.kill()
+        worker.shutdown(wait=False, cancel_futures=True)
+
+        # Hand the replacement out once its process is up, so that its start-up
+        # time isn't counted against the next task
+        def warmed_up(future: asyncio.Future) -> None:
+            if not future.cancelled():
+                future.exception()
+            self._release(replacement, idle)
+
+        asyncio.get_running_loop().run_in_executor(replacement, _warm_up).add_done_callback(warmed_up)
+
+    async def _acquire(self, idle: "asyncio.Queue[ProcessPoolExecutor]", timeout: float) -> Optional[ProcessPoolExecutor]:
+        """Wait up to timeout for a free worker, returning None if none became free"""
+        getter = asyncio.ensure_future(idle.get())
+        try:
+            done, _ = await asyncio.wait({getter}, timeout=timeout)
+        except asyncio.CancelledError:
+            # Don't lose a worker handed over just as the request went away
+            if getter.done() and not getter.cancelled():
+                idle.put_nowait(getter.result())
+            getter.cancel()
+            raise
+        if not done:
+            getter.cancel()
+            return None
+        return getter.result()
+
+    def shutdown(self) -> None:
+        """Stop the worker processes"""
+        if self._workers:
+            for worker in self._workers:
+                worker.shutdown(wait=False, cancel_futures=True)
+            self._workers = []
+            self._idle = None
+            logger.info("Document extraction pool stopped")
+
+    async def run(self, func: Callable[..., Any], *args, doc_type: str = "Unknown", timeout: Optional[float] = None) -> Any:
+        """
+        Run func(*args) in a worker process.
+
+        Args:
+            func: Picklable (module-level) function to run
+            args: Picklable arguments
+            doc_type: Document type for metrics and error messages
+            timeout: Wall-clock limit overriding the pool default
+
+        Returns:
+            The function's result
+
+        Raises:
+            DocumentProcessingError: If no worker becomes free in time (503), or
+                the task times out or its worker dies (422); errors raised by
+                func itself are re-raised unchanged
+        """
+        timeout = timeout or self.task_timeout
+        idle = self._idle_workers()
+        loop = asyncio.get_running_loop()
+        start_time = time.time()
+        DOCUMENT_EXTRACTION_QUEUE_DEPTH.inc()
+
+        try:
+            worker = await self._acquire(idle, timeout)
+            if worker is None:
+                logger.error(f"{doc_type} extraction found no free worker within {timeout}s")
+                DOCUMENT_EXTRACTION_FAILURES.labels(reason="saturated").inc()
+                raise DocumentProcessingError(
+                    "Document processing is busy, please try again shortly",
+                    doc_type=doc_type,
+                    status_code=503,
+                    details={"waited_seconds": timeout}
+                )
+
+            try:
+                return await asyncio.wait_for(loop.run_in_executor(worker, func, *args), timeout=timeout)
+
+            except asyncio.TimeoutError:
+                logger.error(f"{doc_type} extraction exceeded {timeout}s, killing its worker process")
+                DOCUMENT_EXTRACTION_FAILURES.labels(reason="timeout").inc()
+                self._replace_worker(worker, idle)
+                raise DocumentProcessingError(
+                    f"Document took too long to process (limit {timeout:.0f}s)",
+                    doc_type=doc_type,
+                    status_code=422,
+                    details={"timeout_seconds": timeout}
+                )
+
+            except BrokenProcessPool as e:
+                # Only this task ran on the worker, e.g. it hit the memory limit
+                DOCUMENT_EXTRACTION_FAILURES.labels(reason="worker_crashed").inc()
+                self._replace_worker(worker, idle)
+                raise DocumentProcessingError(
+                    "Document could not be processed within the allowed resources",
+                    doc_type=doc_type,
+                    status_code=422,
+                    details={"error_type": type(e).__name__}
+                ) from e
+
+            finally:
+                self._release(worker, idle)
+
+        finally:
+            DOCUMENT_EXTRACTION_QUEUE_DEPTH.dec()
+            DOCUMENT_EXTRACTION_DURATION.labels(doc_type=doc_type).observe(time.time() - start_time)
+
+
+# Process-wide pool, started by start_extraction_pool() at startup
+_pool: Optional[ExtractionPool] = None
+
+def get_extraction_pool() -> Optional[ExtractionPool]:
+    """
+    Return the shared extraction pool, or None if extraction should run inline
+    (DOCUMENT_WORKERS=0).
+    """
+    global _pool
+    if _pool is None:
+        document_config = get_settings().document
+        if document_config.workers <= 0:
+            return None
+        _pool = ExtractionPool(
+            max_workers=document_config.workers,
+            task_timeout=document_config.task_timeout,
+            memory_limit_mb=document_config.memory_limit_mb,
+        )
+    return _pool
+
+async def start_extraction_pool() -> None:
+    """Start and warm up the shared extraction pool. Called at application startup."""
+    pool = get_extraction_pool()
+    if pool is not None:
+        await pool.start()
+
+def shutdown_extraction_pool() -> None:
+    """Stop the shared extraction pool. Called at application shutdown."""
+    global _pool
+    if _pool is not None:
+        _pool.shutdown()
+        _pool = None
@@ -3,6 +3,14 @@ Custom exception classes for better error handling.
 """
 from typing import Optional, Dict, Any
 
+def _restore_exception(cls, state: Dict[str, Any]) -> "AppBaseException":
+    """Recreate a pickled application exception without re-running its __init__"""
+    exc = cls.__new__(cls)
+    Exception.__init__(exc, state.get("message"))
+    exc.__dict__.update(state)
+    return exc
+
+
 class AppBaseException(Exception):
     """Base exception for all application exceptions"""
     def __init__(self, message: str, status_code: int = 500, details: Optional[Dict[str, Any]] = None):
@@ -11,11 +19,19 @@ class AppBaseException(Exception):
         self.details = details
         super().__init__(self.message)
 
+    def __reduce__(self):
+        # Subclass constructors take different arguments and re-format the message,
+        # so pickle the attributes instead (errors raised in worker processes are
+        # sent back to the parent this way)
+        return (_restore_exception, (type(self), dict(self.__dict__)))
+
 
 class APIRequestError(AppBaseException):
     """Exception for errors when calling external APIs"""
-    def __init__(self, message: str, service_name: str, status_code: int = 500, details: Optional[Dict[str, Any]] = None):
+    def __init__(self, message: str, service_name: str, status_code: int = 500, details: Optional[Dict[str, Any]] = None, retry_after: Optional[float] = None):
         self.service_name = service_name
+        # Seconds the upstream asked us to wait before retrying (Retry-After header)
+        self.retry_after = retry_after
         super().__init__(
             message=f"{service_name} API Error: {message}", 
             status_code=status_code, 
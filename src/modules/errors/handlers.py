@@ -2,6 +2,7 @@
 Error handling middleware and utilities.
 """
 import logging
+import math
 import traceback
 from fastapi import Request, status
 from fastapi.responses import JSONResponse
@@ -23,6 +24,7 @@ async def exception_handler(request: Request, exc: Exception) -> JSONResponse:
     
     # Default error response
     status_code = status.HTTP_500_INTERNAL_SERVER_ERROR
+    headers = None
     error_detail = {
         "error": exception_type,
         "message": exception_msg,
@@ -35,6 +37,10 @@ async def exception_handler(request: Request, exc: Exception) -> JSONResponse:
         error_detail["message"] = exc.message
         if exc.details:
             error_detail["details"] = exc.details
+        # Upstream Retry-After hints we did not wait for are passed on
+        retry_after = getattr(exc, "retry_after", None)
+        if retry_after is not None:
+            headers = {"Retry-After": str(math.ceil(retry_after))}
     
     # Handle FastAPI validation errors
     elif isinstance(exc, RequestValidationError):
@@ -54,7 +60,8 @@ async def exception_handler(request: Request, exc: Exception) -> JSONResponse:
     # Return consistent JSON response
     return JSONResponse(
         status_code=status_code,
-        content=error_detail
+        content=error_detail,
+        headers=headers
     )
 
 
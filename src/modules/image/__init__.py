@@ -0,0 +1,9 @@
+from .preprocess import (
+    PreparedImage,
+    combined_hash,
+    fit_image_count,
+    prepare_image,
+    prepare_image_for_vision,
+    prepare_images_for_vision,
+    tile_images,
+)
@@ -0,0 +1,298 @@
+"""
+Image preprocessing for vision model calls.
+
+Uploaded job description images are often phone photos or full-resolution
+screenshots several megabytes in size, far more than the vision model uses:
+the provider downsamples them anyway, after we have paid to upload them as
+base64. Images are decoded, downscaled to the resolution the model works at,
+optionally converted to grayscale (job postings are text) and re-encoded as a
+compact JPEG or WebP before they are sent.
+"""
+import asyncio
+import io
+import logging
+import math
+import time
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+from config import ImageSettings, get_settings
+from modules.errors.exceptions import ValidationError
+from modules.monitoring.prometheus import IMAGE_BYTES, IMAGE_PREPROCESS_DURATION
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Blank space between screenshots combined into one composite image
+TILE_GAP_PIXELS = 16
+
+# Pillow save format and MIME type per configured output format
+OUTPUT_FORMATS = {
+    "jpeg": ("JPEG", "image/jpeg"),
+    "webp": ("WEBP", "image/webp"),
+}
+
+class PreparedImage(NamedTuple):
+    """An image ready to be sent to the vision model"""
+    data: bytes
+    mime_type: str
+    width: int
+    height: int
+    original_bytes: int
+    # Perceptual hash of the normalized image, see difference_hash()
+    dhash: int
+
+
+def target_size(width: int, height: int, max_side: int, max_pixels: int) -> Tuple[int, int]:
+    """
+    Compute the size an image is downscaled to so that it fits both limits.
+
+    The aspect ratio is preserved and images are never upscaled.
+    """
+    scale = 1.0
+    if max_side > 0 and max(width, height) > max_side:
+        scale = max_side / max(width, height)
+    if max_pixels > 0 and width * height * scale * scale > max_pixels:
+        scale = math.sqrt(max_pixels / (width * height))
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+def has_transparency(image: Image.Image) -> bool:
+    """Whether an image has an alpha channel or a transparent colour"""
+    return image.mode in ("RGBA", "LA", "PA", "RGBa", "La") or "transparency" in image.info
+
+def flatten_transparency(image: Image.Image) -> Image.Image:
+    """
+    Composite an image with transparency onto a white background.
+
+    Converting to RGB or grayscale drops the alpha channel, turning transparent
+    areas of pasted screenshots black and dark text on them unreadable.
+    """
+    rgba = image.convert("RGBA")
+    background = Image.new("RGBA", rgba.size, "white")
+    return Image.alpha_composite(background, rgba).convert("RGB")
+
+def difference_hash(image: Image.Image, hash_size: int = 16) -> int:
+    """
+    Compute the dHash of an image.
+
+    The image is reduced to a (hash_size + 1) x hash_size grayscale thumbnail
+    and each bit records whether a pixel is brighter than its right neighbour.
+    Recompressed or rescaled copies of an image produce hashes a small Hamming
+    distance apart. Text-heavy images such as job postings look alike at low
+    resolution, so the default 16x16 (256-bit) hash is used rather than the
+    common 8x8 one, which cannot tell different postings with the same layout
+    apart.
+    """
+    thumbnail = image.convert("L").resize((hash_size + 1, hash_size), Image.BOX)
+    pixels = list(thumbnail.getdata())
+
+    value = 0
+    for row in range(hash_size):
+        offset = row * (hash_size + 1)
+        for col in range(hash_size):
+            value = (value << 1) | (pixels[offset + col] > pixels[offset + col + 1])
+    return value
+
+def prepare_image(image_bytes: bytes, content_type: str, image_config: ImageSettings) -> PreparedImage:
+    """
+    Decode, downscale and re-encode an image for a vision call.
+
+    Transparent areas are filled with white. If re-encoding would not make an
+    image that needs no resizing or flattening any smaller, the original bytes
+    are kept.
+
+    Args:
+        image_bytes: The uploaded image
+        content_type: MIME type of the upload
+        image_config: The image settings
+
+    Returns:
+        The prepared image
+
+    Raises:
+        ValidationError: If the image cannot be decoded
+    """
+    save_format, mime_type = OUTPUT_FORMATS.get(image_config.format, OUTPUT_FORMATS["jpeg"])
+    grayscale = image_config.grayscale
+
+    try:
+        image = Image.open(io.BytesIO(image_bytes))
+        original_size = image.size
+        width, height = target_size(*original_size, image_config.max_side, image_config.max_pixels)
+
+        # Let the JPEG decoder downscale by a power of two while decoding,
+        # which is much cheaper than decoding at full size and resizing
+        image.draft("L" if grayscale else "RGB", (width, height))
+        decoded_size = image.size
+
+        # Apply the EXIF orientation of phone photos, which swaps the axes of
+        # images rotated by 90 degrees
+        image = ImageOps.exif_transpose(image)
+        if image.size != decoded_size:
+            width, height = height, width
+
+        transparent = has_transparency(image)
+        if transparent:
+            image = flatten_transparency(image)
+
+        if grayscale:
+            image = image.convert("L")
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        if image.size != (width, height):
+            image = image.resize((width, height), Image.LANCZOS)
+
+        dhash = difference_hash(image)
+
+        output = io.BytesIO()
+        image.save(output, format=save_format, quality=image_config.quality, optimize=True)
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as e:
+        raise ValidationError(
+            "Could not decode image",
+            field="job_desc_image",
+            details={"provided_content_type": content_type, "error": str(e)}
+        ) from e
+
+    data = output.getvalue()
+    if (width, height) == original_size and not transparent and len(data) >= len(image_bytes):
+        return PreparedImage(image_bytes, content_type, width, height, len(image_bytes), dhash)
+    return PreparedImage(data, mime_type, width, height, len(image_bytes), dhash)
+
+def tile_images(images: Sequence[PreparedImage], image_config: ImageSettings) -> PreparedImage:
+    """
+    Arrange prepared images in a grid, left to right and top to bottom, in one composite image.
+
+    Used when a posting was captured as more screenshots than the model accepts
+    per request. The composite is downscaled to the same limits as a single
+    image, so the number of columns is chosen to keep the text as large as
+    possible: tall phone screenshots end up side by side, wide ones stacked.
+
+    Args:
+        images: Prepared images in reading order
+        image_config: The image settings
+
+    Returns:
+        The composite image
+    """
+    save_format, mime_type = OUTPUT_FORMATS.get(image_config.format, OUTPUT_FORMATS["jpeg"])
+    mode = "L" if image_config.grayscale else "RGB"
+
+    decoded = [Image.open(io.BytesIO(image.data)).convert(mode) for image in images]
+    cell_width = max(tile.width for tile in decoded)
+    cell_height = max(tile.height for tile in decoded)
+
+    def grid_size(columns: int) -> Tuple[int, int]:
+        rows = math.ceil(len(decoded) / columns)
+        return (
+            columns * cell_width + (columns - 1) * TILE_GAP_PIXELS,
+            rows * cell_height + (rows - 1) * TILE_GAP_PIXELS,
+        )
+
+    # Pick the layout that is downscaled the least
+    columns = max(
+        range(1, len(decoded) + 1),
+        key=lambda columns: target_size(*grid_size(columns), image_config.max_side, image_config.max_pixels)[0] / grid_size(columns)[0]
+    )
+    canvas = Image.new(mode, grid_size(columns), "white")
+    for index, tile in enumerate(decoded):
+        row, column = divmod(index, columns)
+        canvas.paste(tile, (column * (cell_width + TILE_GAP_PIXELS), row * (cell_height + TILE_GAP_PIXELS)))
+
+    width, height = target_size(*canvas.size, image_config.max_side, image_config.max_pixels)
+    if canvas.size != (width, height):
+        canvas = canvas.resize((width, height), Image.LANCZOS)
+
+    output = io.BytesIO()
+    canvas.save(output, format=save_format, quality=image_config.quality, optimize=True)
+    return PreparedImage(
+        output.getvalue(), mime_type, width, height,
+        sum(image.original_bytes for image in images), difference_hash(canvas)
+    )
+
+def combined_hash(images: Sequence[PreparedImage]) -> int:
+    """
+    Concatenate the perceptual hashes of an ordered set of images.
+
+    The Hamming distance between two combined hashes is the sum of the
+    distances between corresponding images, so a set of screenshots matches a
+    cached set when each screenshot is a near-duplicate of its counterpart.
+    Leading images with an all-zero hash (blank ones) leave the value
+    unchanged, so only compare hashes of sets with the same number of images.
+    """
+    value = 0
+    for image in images:
+        value = (value << 256) | image.dhash
+    return value
+
+async def prepare_image_for_vision(image_bytes: bytes, content_type: str, image_config: Optional[ImageSettings] = None) -> PreparedImage:
+    """
+    Preprocess an image off the event loop and record size metrics.
+
+    Args:
+        image_bytes: The uploaded image
+        content_type: MIME type of the upload
+        image_config: Preprocessing settings (defaults to the application config)
+
+    Returns:
+        The prepared image
+    """
+    if image_config is None:
+        image_config = get_settings().image
+
+    start_time = time.perf_counter()
+    prepared = await asyncio.to_thread(prepare_image, image_bytes, content_type, image_config)
+    IMAGE_PREPROCESS_DURATION.observe(time.perf_counter() - start_time)
+
+    IMAGE_BYTES.labels(stage="original").observe(prepared.original_bytes)
+    IMAGE_BYTES.labels(stage="prepared").observe(len(prepared.data))
+    logger.info(
+        f"Prepared job description image: {prepared.original_bytes} -> {len(prepared.data)} bytes "
+        f"({prepared.width}x{prepared.height} {prepared.mime_type})"
+    )
+    return prepared
+
+async def prepare_images_for_vision(images: Sequence[Tuple[bytes, str]], image_config: Optional[ImageSettings] = None) -> List[PreparedImage]:
+    """
+    Preprocess several images concurrently.
+
+    Args:
+        images: (image bytes, MIME type) pairs in reading order
+        image_config: Preprocessing settings (defaults to the application config)
+
+    Returns:
+        The prepared images in reading order
+    """
+    if image_config is None:
+        image_config = get_settings().image
+
+    return list(await asyncio.gather(*(
+        prepare_image_for_vision(image_bytes, content_type, image_config)
+        for image_bytes, content_type in images
+    )))
+
+async def fit_image_count(images: List[PreparedImage], max_images: int, image_config: Optional[ImageSettings] = None) -> List[PreparedImage]:
+    """
+    Combine consecutive images into composite tiles so at most max_images remain.
+
+    Args:
+        images: Prepared images in reading order
+        max_images: Most images the model accepts in one request (0 = no limit)
+        image_config: Preprocessing settings (defaults to the application config)
+
+    Returns:
+        The images, or composite tiles, in reading order
+    """
+    if not max_images or len(images) <= max_images:
+        return images
+
+    if image_config is None:
+        image_config = get_settings().image
+
+    # Spread the screenshots evenly over the tiles, keeping their order
+    per_tile = math.ceil(len(images) / max_images)
+    groups = [images[start:start + per_tile] for start in range(0, len(images), per_tile)]
+    tiles = await asyncio.gather(*(asyncio.to_thread(tile_images, group, image_config) for group in groups))
+    logger.info(f"Tiled {len(images)} job description images into {len(tiles)} composite images")
+    return list(tiles)
@@ -0,0 +1,102 @@
+"""
+Caches for job description analysis results.
+
+Popular postings are uploaded again and again, usually as screenshots that
+differ only in scale or compression. Image analyses are cached under a
+perceptual hash of the normalized image so that near-duplicates reuse the
+previously extracted text instead of making another vision call. Hashes are
+only compared within the same model and number of images. Postings
+from the same job board share a layout and can hash close together, so a
+hash match is only used if every image also has the aspect ratio of its
+cached counterpart.
+
+Text descriptions are pasted by many applicants with only whitespace or case
+differences, so requirement analyses are cached under a hash of the
+normalized text and the model name.
+"""
+import hashlib
+from typing import NamedTuple, Optional, Sequence, Tuple
+
+from config import get_settings
+from modules.cache import PerceptualHashCache, SingleFlight, TTLCache, hamming_distance
+from modules.image import PreparedImage
+
+# Process-wide caches, created on first use
+_image_cache: Optional[PerceptualHashCache] = None
+_requirements_cache: Optional[TTLCache] = None
+
+# Concurrent vision calls for the same images, keyed by model, image count and
+# exact combined perceptual hash
+_image_flights = SingleFlight("job_image_analysis")
+
+# Largest relative difference in aspect ratio between an image and its cached
+# counterpart; rescaling only changes it by rounding
+ASPECT_RATIO_TOLERANCE = 0.02
+
+
+class CachedImageAnalysis(NamedTuple):
+    """A job image analysis with the images it was made from"""
+    analysis: str
+    # (width, height, dhash) of each prepared image, in reading order
+    images: Tuple[Tuple[int, int, int], ...]
+
+
+def cached_image_analysis(analysis: str, images: Sequence[PreparedImage]) -> CachedImageAnalysis:
+    """Return the cache value for an analysis of prepared images"""
+    return CachedImageAnalysis(analysis, tuple((image.width, image.height, image.dhash) for image in images))
+
+def matches_images(cached: CachedImageAnalysis, images: Sequence[PreparedImage], max_distance: int) -> bool:
+    """
+    Confirm that a cached analysis was made from near-duplicates of images.
+
+    The combined hash lookup only bounds the total distance over all images;
+    each image must also be within max_distance bits of its counterpart and
+    have the same aspect ratio.
+    """
+    if len(cached.images) != len(images):
+        return False
+    for (width, height, dhash), image in zip(cached.images, images):
+        if hamming_distance(dhash, image.dhash) > max_distance:
+            return False
+        cached_ratio = width / height
+        if abs(image.width / image.height - cached_ratio) > ASPECT_RATIO_TOLERANCE * cached_ratio:
+            return False
+    return True
+
+def get_image_analysis_cache() -> PerceptualHashCache:
+    """Return the shared job image analysis cache"""
+    global _image_cache
+    if _image_cache is None:
+        cache_config = get_settings().image.cache
+        _image_cache = PerceptualHashCache(
+            "job_image_analysis",
+            max_entries=cache_config.max_entries,
+            max_distance=cache_config.max_distance,
+        )
+    return _image_cache
+
+def get_image_analysis_flights() -> SingleFlight:
+    """Return the single-flight group coalescing identical job image analyses"""
+    return _image_flights
+
+def normalize_job_description(job_description: str) -> str:
+    """Collapse whitespace and case so trivially different copies of a posting match"""
+    return " ".join(job_description.split()).casefold()
+
+def requirements_cache_key(job_description: str, model: str) -> str:
+    """Return the requirements cache key for a job description analyzed by a model"""
+    normalized = normalize_job_description(job_description)
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+def get_requirements_cache() -> TTLCache:
+    """Return the shared job requirements analysis cache"""
+    global _requirements_cache
+    if _requirements_cache is None:
+        cache_config = get_settings().job_analysis.cache
+        _requirements_cache = TTLCache(
+            "job_requirements",
+            max_entries=cache_config.max_entries,
+            ttl=cache_config.ttl,
+            stale_ttl=cache_config.stale_ttl,
+        )
+    return _requirements_cache
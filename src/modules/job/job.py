@@ -1,127 +1,138 @@
-import requests
-import base64
 import logging
-import time
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from fastapi import UploadFile, File, HTTPException, Request
 
-from config import load_config
+from config import ImageSettings, OpenRouterSettings, get_settings
 from modules.errors.exceptions import APIRequestError, ConfigurationError, ValidationError
+from modules.image import PreparedImage, combined_hash, fit_image_count, prepare_images_for_vision
+from modules.openrouter import Base64Data, call_openrouter_api
 from modules.rate_limit import limiter
 from . import router
+from .cache import (
+    cached_image_analysis,
+    get_image_analysis_cache,
+    get_image_analysis_flights,
+    get_requirements_cache,
+    matches_images,
+    requirements_cache_key,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-async def call_openrouter_api(payload: Dict[str, Any], api_key: str, api_url: str, max_retries: int = 3) -> Dict[str, Any]:
+async def analyze_job_description_image(image_bytes, content_type):
     """
-    Makes an API call to OpenRouter with retry logic.
+    Analyze job description image using Gemini 2.0 via OpenRouter API.
     
     Args:
-        payload: The request payload
-        api_key: OpenRouter API key
-        api_url: OpenRouter API URL
-        max_retries: Maximum number of retry attempts
+        image_bytes: The binary content of the image file
+        content_type: The MIME type of the image
         
     Returns:
-        The parsed JSON response
-        
-    Raises:
-        APIRequestError: If the API call fails after all retries
+        Structured analysis of the job description
     """
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json"
-    }
-    
-    # Retry configuration
-    retry_delays = [1, 3, 5]  # Delays in seconds between retries
-    last_exception = None
-    
-    # Try the request with retries
-    for attempt in range(max_retries):
-        try:
-            response = requests.post(api_url, json=payload, headers=headers, timeout=30)
-            response_data = response.json()
-            
-            # Check for API errors
-            if response.status_code != 200:
-                error_message = response_data.get('error', {}).get('message', 'Unknown error')
-                logger.warning(f"OpenRouter API error (attempt {attempt+1}/{max_retries}): {error_message}")
-                
-                # If we've exhausted our retries, raise an exception
-                if attempt == max_retries - 1:
-                    raise APIRequestError(
-                        message=error_message,
-                        service_name="OpenRouter",
-                        status_code=response.status_code,
-                        details={"status_code": response.status_code, "response": response_data}
-                    )
-                
-                # Otherwise, wait and retry
-                time.sleep(retry_delays[min(attempt, len(retry_delays)-1)])
-                continue
-            
-            # Success - return the data
-            return response_data
-            
-        except requests.RequestException as e:
-            last_exception = e
-            logger.warning(f"Request error to OpenRouter API (attempt {attempt+1}/{max_retries}): {str(e)}")
-            
-            # If we've exhausted our retries, raise an exception
-            if attempt == max_retries - 1:
-                break
-                
-            # Otherwise, wait and retry
-            time.sleep(retry_delays[min(attempt, len(retry_delays)-1)])
-    
-    # If we get here, all retries failed
-    raise APIRequestError(
-        message=f"Failed after {max_retries} attempts: {str(last_exception)}",
-        service_name="OpenRouter",
-        details={"last_error": str(last_exception)}
-    )
+    return await analyze_job_description_images([(image_bytes, content_type)])
 
-async def analyze_job_description_image(image_bytes, content_type):
+async def analyze_job_description_images(images: List[Tuple[bytes, str]]) -> str:
     """
-    Analyze job description image using Gemini 2.0 via OpenRouter API.
+    Analyze a job description captured as one or more images in a single vision request.
+    
+    Long postings are often captured as several screenshots. They are
+    preprocessed concurrently and sent together as one multi-part message; if
+    there are more than the model accepts per request, consecutive screenshots
+    are combined into composite images first.
     
     Args:
-        image_bytes: The binary content of the image file
-        content_type: The MIME type of the image
+        images: (binary content, MIME type) of each image, in reading order
         
     Returns:
         Structured analysis of the job description
     """
     # Validate inputs
-    if not image_bytes:
+    if not images:
         raise ValidationError("Image data is empty", field="job_desc_image")
-        
-    if not content_type or not content_type.startswith("image/"):
-        raise ValidationError(
-            "Invalid content type for image", 
-            field="job_desc_image",
-            details={"provided_content_type": content_type, "expected": "image/*"}
-        )
+    
+    for image_bytes, content_type in images:
+        if not image_bytes:
+            raise ValidationError("Image data is empty", field="job_desc_image")
+            
+        if not content_type or not content_type.startswith("image/"):
+            raise ValidationError(
+                "Invalid content type for image", 
+                field="job_desc_image",
+                details={"provided_content_type": content_type, "expected": "image/*"}
+            )
     
     # Load configuration
-    config = load_config()
-    openrouter_config = config["openrouter"]
+    config = get_settings()
+    openrouter_config = config.openrouter
+    image_config = config.image
     
-    if not openrouter_config["api_key"]:
+    if not openrouter_config.api_key:
         raise ConfigurationError(
             message="API key is missing or empty",
             config_item="OPENROUTER_API_KEY"
         )
     
+    if len(images) > image_config.max_uploads:
+        raise ValidationError(
+            f"At most {image_config.max_uploads} images can be analyzed at once",
+            field="job_desc_image",
+            details={"provided_images": len(images)}
+        )
+    
+    # Downscale and re-encode the images to what the vision model actually uses
+    prepared_images = await prepare_images_for_vision(images, image_config)
+    
+    # Re-uploads of a posting we have already read (recompressed or rescaled
+    # screenshots) match the cached analysis by perceptual hash
+    image_cache = get_image_analysis_cache()
+    image_hash = combined_hash(prepared_images)
+    # Analyses by another model, or of another number of images, never match
+    image_group = (openrouter_config.model, len(prepared_images))
+    cached = image_cache.get(
+        image_hash,
+        max_distance=image_cache.max_distance * len(prepared_images),
+        match=lambda cached: matches_images(cached, prepared_images, image_cache.max_distance),
+        group=image_group,
+    )
+    if cached is not None:
+        logger.info("Reusing cached analysis for near-duplicate job description images")
+        return cached.analysis
+    
+    # Identical uploads arriving at the same time share one vision call
+    return await get_image_analysis_flights().do(
+        (image_group, image_hash),
+        lambda: _request_image_analysis(images, prepared_images, image_group, image_hash, openrouter_config, image_config)
+    )
+
+async def _request_image_analysis(
+    images: List[Tuple[bytes, str]],
+    prepared_images: List[PreparedImage],
+    image_group: Tuple[str, int],
+    image_hash: int,
+    openrouter_config: OpenRouterSettings,
+    image_config: ImageSettings
+) -> str:
+    """Send prepared job description images to the vision model and cache the analysis"""
+    # Stay within the number of images the model accepts per request
+    request_images = await fit_image_count(prepared_images, image_config.model_max_images, image_config)
+    content_types = ", ".join(sorted({content_type for _, content_type in images}))
+    
+    if len(images) == 1:
+        instruction = "Extract the job description details from this image."
+    else:
+        instruction = (
+            f"Extract the job description details from these {len(images)} screenshots. "
+            "They are consecutive parts of one job posting, in reading order."
+        )
+        if len(request_images) < len(images):
+            instruction += " Some images combine several screenshots, arranged left to right, then top to bottom."
+    
     try:
-        # Convert image to base64
-        base64_image = base64.b64encode(image_bytes).decode("utf-8")
-        
         # Prepare the request to OpenRouter API
         payload = {
-            "model": openrouter_config["model"],
+            "model": openrouter_config.model,
             "messages": [
                 {
                     "role": "system",
@@ -129,9 +140,9 @@ async def analyze_job_description_image(image_bytes, content_type):
                 },
                 {
                     "role": "user",
-                    "content": [
-                        {"type": "text", "text": "Extract the job description details from this image."},
-                        {"type": "image_url", "image_url": {"url": f"data:image/{content_type.split('/')[1]};base64,{base64_image}"}}
+                    "content": [{"type": "text", "text": instruction}] + [
+                        {"type": "image_url", "image_url": {"url": Base64Data.data_url(image.data, image.mime_type)}}
+                        for image in request_images
                     ]
                 }
             ]
@@ -140,8 +151,8 @@ async def analyze_job_description_image(image_bytes, content_type):
         # Make the API request with retry logic
         response_data = await call_openrouter_api(
             payload=payload,
-            api_key=openrouter_config["api_key"],
-            api_url=openrouter_config["api_url"]
+            api_key=openrouter_config.api_key,
+            api_url=openrouter_config.api_url
         )
         
         # Extract and return the analysis
@@ -151,9 +162,10 @@ async def analyze_job_description_image(image_bytes, content_type):
             raise APIRequestError(
                 message="Received empty analysis from image",
                 service_name="OpenRouter",
-                details={"content_type": content_type}
+                details={"content_type": content_types, "images": len(images)}
             )
         
+        get_image_analysis_cache().set(image_hash, cached_image_analysis(analysis, prepared_images), group=image_group)
         return analysis
     
     except Exception as e:
@@ -162,7 +174,7 @@ async def analyze_job_description_image(image_bytes, content_type):
             raise APIRequestError(
                 message=f"Error analyzing job description image: {str(e)}",
                 service_name="OpenRouter", 
-                details={"content_type": content_type, "error_type": type(e).__name__}
+                details={"content_type": content_types, "images": len(images), "error_type": type(e).__name__}
             ) from e
         raise
 
@@ -170,6 +182,9 @@ async def analyze_job_requirements(job_description: str) -> Dict[str, Any]:
     """
     Analyze a job description text and extract key requirements.
     
+    The same posting is submitted by many applicants, so analyses are cached
+    by the normalized description text and model (see modules.job.cache).
+    
     Args:
         job_description: Text of the job description
         
@@ -181,18 +196,33 @@ async def analyze_job_requirements(job_description: str) -> Dict[str, Any]:
         raise ValidationError("Job description cannot be empty", field="job_desc")
     
     # Load configuration
-    config = load_config()
-    openrouter_config = config["openrouter"]
+    config = get_settings()
+    openrouter_config = config.openrouter
     
-    if not openrouter_config["api_key"]:
+    if not openrouter_config.api_key:
         raise ConfigurationError(
             message="API key is missing or empty",
             config_item="OPENROUTER_API_KEY"
         )
     
+    cache_key = requirements_cache_key(job_description, openrouter_config.model)
+    analysis_text = await get_requirements_cache().get_or_load(
+        cache_key,
+        lambda: _request_job_requirements(job_description, openrouter_config)
+    )
+    
+    # Return the raw analysis text for now
+    # In a production environment, you'd want to parse this into proper JSON
+    return {
+        "analysis": analysis_text,
+        "raw_length": len(job_description)
+    }
+
+async def _request_job_requirements(job_description: str, openrouter_config: OpenRouterSettings) -> str:
+    """Ask the model for the requirements analysis of a job description"""
     # Prepare the request to OpenRouter API
     payload = {
-        "model": openrouter_config["model"],
+        "model": openrouter_config.model,
         "messages": [
             {
                 "role": "system",
@@ -209,8 +239,8 @@ async def analyze_job_requirements(job_description: str) -> Dict[str, Any]:
         # Make the API request with retry logic
         response_data = await call_openrouter_api(
             payload=payload,
-            api_key=openrouter_config["api_key"],
-            api_url=openrouter_config["api_url"]
+            api_key=openrouter_config.api_key,
+            api_url=openrouter_config.api_url
         )
         
         # Extract and parse the analysis
@@ -223,16 +253,11 @@ async def analyze_job_requirements(job_description: str) -> Dict[str, Any]:
                 details={"job_description_length": len(job_description)}
             )
         
-        # Return the raw analysis text for now
-        # In a production environment, you'd want to parse this into proper JSON
-        return {
-            "analysis": analysis_text,
-            "raw_length": len(job_description)
-        }
+        return analysis_text
         
     except Exception as e:
         # Add monitoring metric for API errors
-        from modules.monitoring.metrics import API_ERRORS
+        from modules.monitoring.prometheus import API_ERRORS
         API_ERRORS.labels(api_name="openrouter").inc()
         
         # If it's not already an APIRequestError, wrap it
@@ -246,37 +271,39 @@ async def analyze_job_requirements(job_description: str) -> Dict[str, Any]:
 
 # API Routes
 @router.post("/analyze_job_desc_image")
-@limiter.limit(load_config()["rate_limits"]["endpoints"]["analyze_job_desc_image"])
+@limiter.limit(get_settings().rate_limits.endpoints["analyze_job_desc_image"])
 async def analyze_job_desc_image_route(
     request: Request,  # Required for rate limiting
-    job_desc_image: UploadFile = File(...)
+    job_desc_image: List[UploadFile] = File(...)
 ):
     """
-    Analyze job description image using AI model.
+    Analyze job description image(s) using AI model.
     
     Args:
         request: The HTTP request (required for rate limiting)
-        job_desc_image: The image file containing the job description
+        job_desc_image: One or more image files containing the job description,
+            in reading order
     """
-    # Validate file is an image
-    if not job_desc_image.content_type.startswith("image/"):
-        raise ValidationError(
-            "Uploaded file is not an image", 
-            field="job_desc_image",
-            details={"provided_content_type": job_desc_image.content_type}
-        )
+    # Validate files are images
+    for image_file in job_desc_image:
+        if not image_file.content_type.startswith("image/"):
+            raise ValidationError(
+                "Uploaded file is not an image", 
+                field="job_desc_image",
+                details={"provided_content_type": image_file.content_type}
+            )
     
     try:
-        # Read the image file
-        image_bytes = await job_desc_image.read()
+        # Read the image files
+        images = [(await image_file.read(), image_file.content_type) for image_file in job_desc_image]
         
         # Use the service to analyze the job description
-        result = await analyze_job_description_image(image_bytes, job_desc_image.content_type)
-        logger.info(f"Successfully analyzed job description image. Response length: {len(result)}")
+        result = await analyze_job_description_images(images)
+        logger.info(f"Successfully analyzed {len(images)} job description image(s). Response length: {len(result)}")
         
         return result
         
     except Exception as e:
         # Let our global exception handler handle this
         logger.error(f"Error analyzing job description image: {str(e)}")
-        raise 
\ No newline at end of file
+        raise
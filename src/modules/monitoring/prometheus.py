@@ -4,7 +4,9 @@ Prometheus metrics configuration for FastAPI
 import time
 import platform
 import os
-from prometheus_client import Counter, Histogram, Info, REGISTRY
+from contextvars import ContextVar
+from typing import List, Optional
+from prometheus_client import Counter, Gauge, Histogram, Info, REGISTRY
 from prometheus_client.openmetrics.exposition import CONTENT_TYPE_LATEST, generate_latest
 from fastapi import Request, Response
 import logging
@@ -26,7 +28,28 @@ COVER_LETTER_GENERATED = Counter(
 PROCESSING_TIME = Histogram(
     "cover_letter_processing_time_seconds",
     "Time taken to process cover letter generation steps",
-    ["step"]  # document_processing, job_analysis, company_analysis, letter_generation
+    ["step"]  # document_processing, job_description, job_analysis, company_analysis, letter_generation
+)
+
+COVER_LETTER_FIRST_BYTE = Histogram(
+    "cover_letter_time_to_first_byte_seconds",
+    "Time from receiving a cover letter request to sending the first text of the letter",
+    ["mode"],  # stream (Server-Sent Events) or full (whole letter at once)
+    buckets=[0.5, 1.0, 2.0, 3.0, 5.0, 8.0, 13.0, 20.0, 30.0, 60.0]
+)
+
+LLM_TOKENS = Histogram(
+    "llm_tokens_per_request",
+    "Tokens sent to (in) and generated by (out) the model per request",
+    ["operation", "direction"],  # direction: in, out
+    buckets=[100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000]
+)
+
+CV_SELECTION_CHARS = Histogram(
+    "cv_selection_chars",
+    "Size of CV text before and after relevance selection against the job description",
+    ["stage"],  # original, selected
+    buckets=[500, 1000, 2000, 4000, 8000, 16000, 32000, 64000]
 )
 
 API_ERRORS = Counter(
@@ -35,6 +58,145 @@ API_ERRORS = Counter(
     ["api_name"]  # openrouter, exa
 )
 
+API_RETRIES = Counter(
+    "external_api_retries_total",
+    "Number of retries performed when calling external APIs",
+    ["api_name", "reason"]  # reason: status code, timeout, connection, ...
+)
+
+API_RETRY_BACKOFF = Counter(
+    "external_api_retry_backoff_seconds_total",
+    "Total time spent sleeping between retries of external API calls",
+    ["api_name"]
+)
+
+API_RETRY_BUDGET_EXHAUSTED = Counter(
+    "external_api_retry_budget_exhausted_total",
+    "Number of retries skipped because the per-process retry budget was exhausted",
+    ["api_name"]
+)
+
+UPSTREAM_CALLS = Counter(
+    "external_api_calls_total",
+    "Number of requests sent to external APIs (including retries)",
+    ["api_name"]
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "external_api_request_duration_seconds",
+    "Latency of single requests to external APIs (each retry attempt separately)",
+    ["api_name"],
+    buckets=[0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0]
+)
+
+UPSTREAM_CALLS_PER_REQUEST = Histogram(
+    "upstream_calls_per_request",
+    "Number of external API requests made while serving one API request",
+    ["endpoint"],
+    buckets=[0, 1, 2, 3, 4, 5, 8, 13]
+)
+
+DOCUMENT_EXTRACTION_QUEUE_DEPTH = Gauge(
+    "document_extraction_queue_depth",
+    "Number of document extraction tasks submitted to the process pool and not yet finished"
+)
+
+DOCUMENT_EXTRACTION_DURATION = Histogram(
+    "document_extraction_task_duration_seconds",
+    "Time taken by a document extraction task in the process pool, including queueing",
+    ["doc_type"],
+    buckets=[0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+)
+
+DOCUMENT_EXTRACTION_FAILURES = Counter(
+    "document_extraction_task_failures_total",
+    "Number of document extraction tasks killed, lost or rejected in the process pool",
+    ["reason"]  # timeout, worker_crashed, saturated
+)
+
+DOCUMENT_PAGES = Histogram(
+    "document_pages",
+    "Pages per processed document",
+    ["doc_type", "kind"],  # kind: total, extracted
+    buckets=[1, 2, 3, 5, 10, 20, 50, 100, 200]
+)
+
+DOCUMENT_TEXT_BYTES = Histogram(
+    "document_text_bytes",
+    "Bytes of text produced per processed document",
+    ["doc_type"],
+    buckets=[1000, 2500, 5000, 10000, 25000, 50000, 100000, 250000]
+)
+
+IMAGE_BYTES = Histogram(
+    "image_preprocess_bytes",
+    "Size of job description images before and after preprocessing for vision calls",
+    ["stage"],  # original, prepared
+    buckets=[25000, 50000, 100000, 250000, 500000, 1000000, 2500000, 5000000]
+)
+
+IMAGE_PREPROCESS_DURATION = Histogram(
+    "image_preprocess_duration_seconds",
+    "Time taken to decode, downscale and re-encode an image",
+    buckets=[0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5]
+)
+
+UPSTREAM_REQUEST_BYTES = Histogram(
+    "external_api_request_bytes",
+    "Size of request bodies sent to external APIs",
+    ["api_name"],
+    buckets=[1000, 5000, 25000, 100000, 250000, 500000, 1000000, 2500000, 7500000]
+)
+
+CACHE_REQUESTS = Counter(
+    "cache_requests_total",
+    "Number of cache lookups",
+    ["cache", "result"]  # result: hit, stale, miss
+)
+
+CACHE_EVICTIONS = Counter(
+    "cache_evictions_total",
+    "Number of entries evicted from a cache",
+    ["cache", "tier"]  # tier: memory, disk
+)
+
+CACHE_ENTRIES = Gauge(
+    "cache_entries",
+    "Number of entries currently held in a cache",
+    ["cache", "tier"]
+)
+
+COALESCED_REQUESTS = Counter(
+    "coalesced_requests_total",
+    "Number of calls that joined an identical call already in flight instead of making their own",
+    ["name"]  # company_profiles, job_requirements, job_image_analysis, cover_letter_idempotency
+)
+
+COMPANY_NAME_MATCHES = Counter(
+    "company_name_matches_total",
+    "Number of company names resolved through the company name index",
+    ["match"]  # exact, alias, fuzzy, none
+)
+
+CACHE_HIT_RATIO = Gauge(
+    "cache_hit_ratio",
+    "Fraction of lookups served from a cache (fresh or stale) since the process started",
+    ["cache"]
+)
+
+CACHE_MEMORY_BYTES = Gauge(
+    "cache_memory_bytes",
+    "Approximate memory held by the keys and values of a cache",
+    ["cache"]
+)
+
+PERCEPTUAL_CACHE_MATCH_DISTANCE = Histogram(
+    "perceptual_cache_match_distance",
+    "Hamming distance between a perceptual hash and the cached hash it matched",
+    ["cache"],
+    buckets=[0, 2, 4, 8, 12, 16, 20, 24, 32]
+)
+
 # System information metrics
 SYSTEM_INFO = Info(
     "application_info", 
@@ -104,4 +266,51 @@ class StepTimer:
             duration, 
             exemplar=exemplar
         )
-        logger.debug(f"Step {self.step_name} completed in {duration:.2f} seconds") 
\ No newline at end of file
+        logger.debug(f"Step {self.step_name} completed in {duration:.2f} seconds") 
+
+# Per-request upstream call counter; a mutable list so that stages running in
+# child tasks (which get a copy of the context) update the same counter
+_upstream_calls_ctx: ContextVar[Optional[List[int]]] = ContextVar("upstream_calls", default=None)
+
+def record_upstream_call(api_name: str) -> None:
+    """Record one request sent to an external API"""
+    UPSTREAM_CALLS.labels(api_name=api_name).inc()
+    counter = _upstream_calls_ctx.get()
+    if counter is not None:
+        counter[0] += 1
+
+class UpstreamCallTracker:
+    """
+    Context manager counting the external API requests made while serving a request
+    
+    Usage:
+        with UpstreamCallTracker("generate_cover_letter", request_id) as tracker:
+            # code making upstream calls
+        tracker.count
+    """
+    def __init__(self, endpoint, request_id=None):
+        self.endpoint = endpoint
+        self.request_id = request_id
+        self._counter = [0]
+        self._token = None
+        
+    @property
+    def count(self) -> int:
+        return self._counter[0]
+        
+    def __enter__(self):
+        self._token = _upstream_calls_ctx.set(self._counter)
+        return self
+        
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        _upstream_calls_ctx.reset(self._token)
+        
+        exemplar = {}
+        if self.request_id:
+            exemplar = {"request_id": self.request_id}
+            
+        UPSTREAM_CALLS_PER_REQUEST.labels(endpoint=self.endpoint).observe(
+            self.count,
+            exemplar=exemplar
+        )
+        logger.debug(f"Request to {self.endpoint} made {self.count} upstream call(s)")
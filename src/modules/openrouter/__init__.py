@@ -0,0 +1,8 @@
+from .body import Base64Data, JSONRequestBody
+from .client import (
+    call_openrouter_api,
+    close_openrouter_client,
+    get_openrouter_client,
+    init_openrouter_client,
+    stream_openrouter_api,
+)
@@ -0,0 +1,93 @@
+"""
+Streaming JSON request bodies.
+
+Vision payloads embed images as base64 data URLs. Building the data URL string
+and then serializing the payload with json.dumps holds the image three times
+over (raw bytes, base64 string, JSON document). JSONRequestBody instead
+serializes the payload with a placeholder for each Base64Data value and
+base64-encodes the image bytes chunk by chunk while the body is being sent.
+"""
+import base64
+import json
+import uuid
+from typing import Any, AsyncIterator, Dict, Iterator, List, Union
+
+# Raw bytes encoded per chunk; a multiple of 3 so chunks concatenate into valid base64
+BASE64_CHUNK_BYTES = 3 * 16 * 1024
+
+class Base64Data:
+    """
+    Binary data serialized as a base64 string (with an optional prefix) in a JSONRequestBody.
+
+    Args:
+        data: The raw bytes
+        prefix: Text placed before the base64, e.g. "data:image/jpeg;base64,"
+    """
+    def __init__(self, data: bytes, prefix: str = ""):
+        self.data = data
+        self.prefix = prefix
+
+    @classmethod
+    def data_url(cls, data: bytes, mime_type: str) -> "Base64Data":
+        """Build a data URL value"""
+        return cls(data, prefix=f"data:{mime_type};base64,")
+
+    @property
+    def encoded_length(self) -> int:
+        """Length of the serialized value in bytes, excluding quotes"""
+        return len(self.prefix.encode("utf-8")) + 4 * ((len(self.data) + 2) // 3)
+
+
+class JSONRequestBody:
+    """
+    A JSON document sent as a streamed request body.
+
+    The body can be iterated any number of times, so the same instance can be
+    resent when a request is retried.
+
+    Args:
+        payload: JSON-serializable payload, which may contain Base64Data values
+    """
+    def __init__(self, payload: Dict[str, Any]):
+        token = uuid.uuid4().hex
+        blobs: List[Base64Data] = []
+
+        def placeholder(value: Any) -> str:
+            if not isinstance(value, Base64Data):
+                raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+            blobs.append(value)
+            return f"__base64_{token}_{len(blobs) - 1}__"
+
+        document = json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=placeholder)
+
+        # Split the document around the placeholders, keeping the quotes
+        self._parts: List[Union[bytes, Base64Data]] = []
+        for index, blob in enumerate(blobs):
+            before, document = document.split(f"__base64_{token}_{index}__", 1)
+            self._parts.append(before.encode("utf-8"))
+            self._parts.append(blob)
+        self._parts.append(document.encode("utf-8"))
+
+    def __len__(self) -> int:
+        return sum(len(part) if isinstance(part, bytes) else part.encoded_length for part in self._parts)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        """Content headers for the body; the explicit length avoids chunked encoding"""
+        return {"Content-Type": "application/json", "Content-Length": str(len(self))}
+
+    def iter_chunks(self) -> Iterator[bytes]:
+        """Yield the serialized body in chunks"""
+        for part in self._parts:
+            if isinstance(part, bytes):
+                yield part
+                continue
+
+            yield part.prefix.encode("utf-8")
+            view = memoryview(part.data)
+            for offset in range(0, len(view), BASE64_CHUNK_BYTES):
+                yield base64.b64encode(view[offset:offset + BASE64_CHUNK_BYTES])
+
+    async def __aiter__(self) -> AsyncIterator[bytes]:
+        for chunk in self.iter_chunks():
+            yield chunk
@@ -0,0 +1,278 @@
+"""
+Shared async client for the OpenRouter API.
+
+A single httpx.AsyncClient is created at application startup and reused by every
+module that talks to OpenRouter, so connections (and TLS sessions) are kept alive
+and pooled instead of being re-established on each call.
+
+Completions can also be streamed: stream_openrouter_api() sends the request with
+"stream": true and yields the generated text as the server-sent events arrive.
+"""
+import json
+import logging
+import time
+from typing import AsyncIterator, Dict, Any, Optional, Tuple
+
+import httpx
+
+from config import OpenRouterSettings, get_settings
+from modules.errors.exceptions import APIRequestError
+from .body import JSONRequestBody
+from modules.monitoring.prometheus import UPSTREAM_LATENCY, UPSTREAM_REQUEST_BYTES, record_upstream_call
+from modules.retry import build_retry_policy, is_retryable_status, parse_retry_after
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Process-wide client, created by init_openrouter_client() at startup
+_client: Optional[httpx.AsyncClient] = None
+
+def create_openrouter_client(openrouter_config: OpenRouterSettings) -> httpx.AsyncClient:
+    """
+    Build an AsyncClient with a keep-alive connection pool.
+
+    Args:
+        openrouter_config: The OpenRouter settings
+
+    Returns:
+        A configured httpx.AsyncClient
+    """
+    pool_config = openrouter_config.pool
+    limits = httpx.Limits(
+        max_connections=pool_config.max_connections,
+        max_keepalive_connections=pool_config.max_keepalive_connections,
+        keepalive_expiry=pool_config.keepalive_expiry,
+    )
+
+    # HTTP/2 requires the optional 'h2' package; fall back to HTTP/1.1 without it
+    http2 = openrouter_config.http2
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            logger.warning("HTTP/2 requested for OpenRouter but 'h2' is not installed, using HTTP/1.1")
+            http2 = False
+
+    return httpx.AsyncClient(
+        http2=http2,
+        limits=limits,
+        timeout=httpx.Timeout(openrouter_config.timeout),
+    )
+
+async def init_openrouter_client() -> httpx.AsyncClient:
+    """Create the shared OpenRouter client. Called once at application startup."""
+    global _client
+    if _client is None:
+        openrouter_config = get_settings().openrouter
+        _client = create_openrouter_client(openrouter_config)
+        logger.info(
+            f"OpenRouter client initialized (http2={openrouter_config.http2}, "
+            f"max_connections={openrouter_config.pool.max_connections})"
+        )
+    return _client
+
+async def close_openrouter_client() -> None:
+    """Close the shared OpenRouter client and release pooled connections."""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("OpenRouter client closed")
+
+def get_openrouter_client() -> httpx.AsyncClient:
+    """
+    Return the shared OpenRouter client.
+
+    The client is normally created at startup; it is created lazily here so that
+    the service functions keep working when used outside the FastAPI app.
+    """
+    global _client
+    if _client is None:
+        _client = create_openrouter_client(get_settings().openrouter)
+    return _client
+
+def classify_openrouter_error(exc: BaseException) -> Tuple[bool, str, Optional[float]]:
+    """
+    Decide whether a failed OpenRouter call should be retried.
+
+    Returns:
+        (retryable, reason, retry_after) as expected by RetryPolicy
+    """
+    if isinstance(exc, APIRequestError):
+        status_code = exc.status_code
+        return is_retryable_status(status_code), str(status_code), exc.retry_after
+    if isinstance(exc, httpx.TimeoutException):
+        return True, "timeout", None
+    if isinstance(exc, httpx.TransportError):
+        return True, "connection", None
+    return False, type(exc).__name__, None
+
+async def _post_once(client: httpx.AsyncClient, api_url: str, body: JSONRequestBody, headers: Dict[str, str]) -> Dict[str, Any]:
+    """Perform a single OpenRouter request, raising APIRequestError on non-200 responses"""
+    record_upstream_call("openrouter")
+    UPSTREAM_REQUEST_BYTES.labels(api_name="openrouter").observe(len(body))
+    start_time = time.perf_counter()
+    try:
+        response = await client.post(api_url, content=body, headers=headers)
+    finally:
+        UPSTREAM_LATENCY.labels(api_name="openrouter").observe(time.perf_counter() - start_time)
+    try:
+        response_data = response.json()
+    except ValueError:
+        response_data = {"error": {"message": response.text or "Invalid JSON response"}}
+
+    if response.status_code != 200:
+        error_message = response_data.get('error', {}).get('message', 'Unknown error')
+        raise APIRequestError(
+            message=error_message,
+            service_name="OpenRouter",
+            status_code=response.status_code,
+            details={"status_code": response.status_code, "response": response_data},
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+
+    return response_data
+
+async def call_openrouter_api(payload: Dict[str, Any], api_key: str, api_url: str, max_retries: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Makes an API call to OpenRouter with retry logic.
+
+    Args:
+        payload: The request payload; binary values (images) can be passed as
+            Base64Data and are base64-encoded while the request is streamed
+        api_key: OpenRouter API key
+        api_url: OpenRouter API URL
+        max_retries: Maximum number of attempts (defaults to the configured retry policy)
+
+    Returns:
+        The parsed JSON response
+
+    Raises:
+        APIRequestError: If the API call fails after all retries
+    """
+    body = JSONRequestBody(payload)
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        **body.headers
+    }
+    client = get_openrouter_client()
+    policy = build_retry_policy("openrouter", classify_openrouter_error, max_attempts=max_retries)
+
+    try:
+        return await policy.call(_post_once, client, api_url, body, headers)
+    except httpx.HTTPError as e:
+        raise APIRequestError(
+            message=f"Request failed: {str(e)}",
+            service_name="OpenRouter",
+            details={"last_error": str(e), "error_type": type(e).__name__}
+        ) from e
+
+
+async def _open_stream_once(client: httpx.AsyncClient, api_url: str, body: JSONRequestBody, headers: Dict[str, str]) -> httpx.Response:
+    """
+    Send a streaming OpenRouter request and return the response once its headers arrive.
+
+    Raises:
+        APIRequestError: If the response status is not 200 (the response is closed)
+    """
+    record_upstream_call("openrouter")
+    UPSTREAM_REQUEST_BYTES.labels(api_name="openrouter").observe(len(body))
+    start_time = time.perf_counter()
+    try:
+        request = client.build_request("POST", api_url, content=body, headers=headers)
+        response = await client.send(request, stream=True)
+    finally:
+        UPSTREAM_LATENCY.labels(api_name="openrouter").observe(time.perf_counter() - start_time)
+
+    if response.status_code != 200:
+        try:
+            await response.aread()
+            response_data = response.json()
+        except (ValueError, httpx.HTTPError):
+            response_data = {"error": {"message": response.text or "Invalid JSON response"}}
+        finally:
+            await response.aclose()
+        error_message = response_data.get('error', {}).get('message', 'Unknown error')
+        raise APIRequestError(
+            message=error_message,
+            service_name="OpenRouter",
+            status_code=response.status_code,
+            details={"status_code": response.status_code, "response": response_data},
+            retry_after=parse_retry_after(response.headers.get("Retry-After")),
+        )
+
+    return response
+
+async def stream_openrouter_api(payload: Dict[str, Any], api_key: str, api_url: str, max_retries: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Stream a chat completion from OpenRouter.
+
+    Opening the stream is retried like call_openrouter_api(); once text has
+    been received a failure is raised instead, since the caller has already
+    consumed part of the answer.
+
+    Args:
+        payload: The request payload ("stream": true is added)
+        api_key: OpenRouter API key
+        api_url: OpenRouter API URL
+        max_retries: Maximum number of attempts to open the stream (defaults to the configured retry policy)
+
+    Yields:
+        Pieces of the generated text as they arrive
+
+    Raises:
+        APIRequestError: If the stream cannot be opened or fails part way
+    """
+    body = JSONRequestBody({**payload, "stream": True})
+    headers = {
+        "Authorization": f"Bearer {api_key}",
+        "Accept": "text/event-stream",
+        **body.headers
+    }
+    client = get_openrouter_client()
+    policy = build_retry_policy("openrouter", classify_openrouter_error, max_attempts=max_retries)
+
+    try:
+        response = await policy.call(_open_stream_once, client, api_url, body, headers)
+    except httpx.HTTPError as e:
+        raise APIRequestError(
+            message=f"Request failed: {str(e)}",
+            service_name="OpenRouter",
+            details={"last_error": str(e), "error_type": type(e).__name__}
+        ) from e
+
+    try:
+        async for line in response.aiter_lines():
+            # Lines starting with ":" are keep-alive comments; events carry one "data:" line each
+            if not line.startswith("data:"):
+                continue
+            data = line[len("data:"):].strip()
+            if data == "[DONE]":
+                break
+
+            try:
+                chunk = json.loads(data)
+            except ValueError:
+                logger.warning(f"Skipping malformed OpenRouter stream event: {data[:200]}")
+                continue
+
+            if "error" in chunk:
+                raise APIRequestError(
+                    message=chunk["error"].get("message", "Unknown error"),
+                    service_name="OpenRouter",
+                    status_code=502,
+                    details={"response": chunk},
+                )
+
+            choices = chunk.get("choices") or [{}]
+            text = (choices[0].get("delta") or {}).get("content")
+            if text:
+                yield text
+    except httpx.HTTPError as e:
+        raise APIRequestError(
+            message=f"Stream interrupted: {str(e)}",
+            service_name="OpenRouter",
+            details={"last_error": str(e), "error_type": type(e).__name__}
+        ) from e
+    finally:
+        await response.aclose()
@@ -0,0 +1 @@
+from .graph import Stage, run_stages
@@ -0,0 +1,167 @@
+"""
+Minimal dependency graph executor for request processing stages.
+
+Each stage is an async function that receives the results of the stages it
+depends on. Stages without a dependency between them run concurrently, and if
+any stage fails every other running stage is cancelled.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from modules.monitoring.prometheus import StepTimer
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+class Stage:
+    """
+    A single step in a processing pipeline.
+
+    Args:
+        name: Unique stage name, used as the key for its result
+        func: Async callable taking a dict of {dependency name: result}
+        depends_on: Names of the stages whose results this stage needs
+        step_name: StepTimer metric label (defaults to the stage name)
+    """
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[Dict[str, Any]], Awaitable[Any]],
+        depends_on: Sequence[str] = (),
+        step_name: Optional[str] = None,
+    ):
+        self.name = name
+        self.func = func
+        self.depends_on = list(depends_on)
+        self.step_name = step_name or name
+
+    def __repr__(self) -> str:
+        return f"Stage({self.name!r}, depends_on={self.depends_on!r})"
+
+
+def _topological_order(stages: List[Stage]) -> List[Stage]:
+    """
+    Order stages so that every stage comes after its dependencies.
+
+    Raises:
+        ValueError: If a dependency is unknown or the graph has a cycle
+    """
+    by_name = {stage.name: stage for stage in stages}
+    if len(by_name) != len(stages):
+        raise ValueError("Stage names must be unique")
+
+    ordered: List[Stage] = []
+    state: Dict[str, str] = {}  # name -> "visiting" | "done"
+
+    def visit(stage: Stage) -> None:
+        if state.get(stage.name) == "done":
+            return
+        if state.get(stage.name) == "visiting":
+            raise ValueError(f"Dependency cycle detected at stage '{stage.name}'")
+
+        state[stage.name] = "visiting"
+        for dep in stage.depends_on:
+            if dep not in by_name:
+                raise ValueError(f"Stage '{stage.name}' depends on unknown stage '{dep}'")
+            visit(by_name[dep])
+        state[stage.name] = "done"
+        ordered.append(stage)
+
+    for stage in stages:
+        visit(stage)
+    return ordered
+
+
+def _required_stages(stages: List[Stage], targets: Sequence[str]) -> List[Stage]:
+    """
+    Select the stages needed to produce the target stages.
+
+    Stages that no target (directly or transitively) depends on are dropped,
+    so their work - and any upstream calls they would make - is skipped.
+    """
+    by_name = {stage.name: stage for stage in stages}
+    required = set()
+    to_visit = list(targets)
+    while to_visit:
+        name = to_visit.pop()
+        if name in required:
+            continue
+        if name not in by_name:
+            raise ValueError(f"Unknown target stage '{name}'")
+        required.add(name)
+        to_visit.extend(by_name[name].depends_on)
+    return [stage for stage in stages if stage.name in required]
+
+
+async def run_stages(
+    stages: List[Stage],
+    request_id: Optional[str] = None,
+    targets: Optional[Sequence[str]] = None,
+    inputs: Optional[Dict[str, Any]] = None,
+) -> Dict[str, Any]:
+    """
+    Run a set of stages, executing independent stages concurrently.
+
+    Args:
+        stages: The stages to run
+        request_id: Request ID attached as exemplar to the step metrics
+        targets: Names of the stages whose results are wanted. When given, only
+            these stages and their dependencies run; all other stages are skipped.
+        inputs: Results already available, by stage name (e.g. shared by several
+            runs); those stages do not run and their given result is used.
+
+    Returns:
+        Dictionary mapping the name of every stage that ran to its result
+
+    Raises:
+        The exception of the first failing stage; all other stages are cancelled.
+    """
+    ordered = _topological_order(stages)
+    if targets is not None:
+        ordered = _required_stages(ordered, targets)
+        skipped = len(stages) - len(ordered)
+        if skipped:
+            logger.debug(f"Skipping {skipped} stage(s) not needed for targets {list(targets)}")
+    tasks: Dict[str, asyncio.Future] = {}
+
+    async def run_stage(stage: Stage) -> Any:
+        # Wait for dependencies outside the timer so the metric only covers this stage's own work
+        dep_results = {dep: await tasks[dep] for dep in stage.depends_on}
+        with StepTimer(stage.step_name, request_id):
+            return await stage.func(dep_results)
+
+    for stage in ordered:
+        if inputs and stage.name in inputs:
+            tasks[stage.name] = asyncio.get_running_loop().create_future()
+            tasks[stage.name].set_result(inputs[stage.name])
+        else:
+            tasks[stage.name] = asyncio.ensure_future(run_stage(stage))
+
+    try:
+        done, pending = await asyncio.wait(tasks.values(), return_when=asyncio.FIRST_EXCEPTION)
+    except BaseException:
+        # The caller was cancelled (e.g. client disconnected): stop all stages
+        for task in tasks.values():
+            task.cancel()
+        await asyncio.gather(*tasks.values(), return_exceptions=True)
+        raise
+
+    if pending:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    # Report the failure of the earliest failing stage in dependency order
+    # (dependents of a failed stage re-raise the same error while awaiting it)
+    first_error = None
+    for stage in ordered:
+        task = tasks[stage.name]
+        if task in done and not task.cancelled() and task.exception() is not None:
+            if first_error is None:
+                logger.debug(f"Stage {stage.name} failed, cancelled {len(pending)} pending stage(s)")
+                first_error = task.exception()
+    if first_error is not None:
+        raise first_error
+
+    return {name: task.result() for name, task in tasks.items()}
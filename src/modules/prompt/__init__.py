@@ -0,0 +1,9 @@
+from .budget import (
+    PromptSection,
+    estimate_tokens,
+    fit_sections,
+    max_tokens_for_words,
+    record_token_usage,
+    trim_to_tokens,
+)
+from .relevance import bm25_scores, segment_cv, select_relevant_cv
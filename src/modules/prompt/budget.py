@@ -0,0 +1,114 @@
+"""
+Token budgeting for prompt assembly.
+
+Prompts are built from sections of user-supplied text (CV, job description,
+company profile) whose size is not under our control. Each section's tokens
+are estimated from its length, and when the prompt would exceed the input
+budget the sections are trimmed in priority order, lowest first, down to a
+per-section floor. Output limits are derived from the requested word count
+rather than a fixed maximum.
+
+Token counts are estimates (no tokenizer of the model is available here);
+the configured characters per token are calibrated for English prose.
+"""
+import logging
+import math
+from typing import Dict, List, Optional
+
+from modules.monitoring.prometheus import LLM_TOKENS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Appended to a section that had to be shortened
+TRIM_MARKER = "\n[...]"
+
+class PromptSection:
+    """
+    A variable-size part of a prompt.
+
+    Args:
+        name: Section name, used in logs
+        text: The section content
+        priority: Sections with lower priority are trimmed first
+        min_tokens: The section is never trimmed below this many tokens
+    """
+    def __init__(self, name: str, text: str, priority: int, min_tokens: int = 0):
+        self.name = name
+        self.text = text or ""
+        self.priority = priority
+        self.min_tokens = min_tokens
+
+    def __repr__(self) -> str:
+        return f"PromptSection({self.name!r}, priority={self.priority}, chars={len(self.text)})"
+
+
+def estimate_tokens(text: str, chars_per_token: float) -> int:
+    """Estimate the number of tokens in a text"""
+    return math.ceil(len(text) / chars_per_token) if text else 0
+
+def trim_to_tokens(text: str, max_tokens: int, chars_per_token: float) -> str:
+    """
+    Shorten a text to about max_tokens tokens, keeping its beginning.
+
+    The text is cut at the last line break (or failing that, the last space)
+    before the limit, so no line or word is split, and TRIM_MARKER is appended.
+    """
+    if estimate_tokens(text, chars_per_token) <= max_tokens:
+        return text
+
+    limit = max(0, int(max_tokens * chars_per_token) - len(TRIM_MARKER))
+    cut = text.rfind("\n", 0, limit)
+    if cut < limit // 2:
+        cut = text.rfind(" ", 0, limit)
+    if cut <= 0:
+        cut = limit
+    return text[:cut].rstrip() + TRIM_MARKER
+
+def fit_sections(sections: List[PromptSection], budget_tokens: int, chars_per_token: float) -> Dict[str, str]:
+    """
+    Trim prompt sections so that together they fit a token budget.
+
+    Sections are trimmed lowest priority first, each down to its min_tokens
+    floor at most, until the total fits. If the floors alone exceed the
+    budget, every section is left at its floor.
+
+    Args:
+        sections: The sections of the prompt
+        budget_tokens: Tokens available to the sections
+        chars_per_token: Characters per token used for estimates
+
+    Returns:
+        Mapping of section name to its (possibly trimmed) text
+    """
+    texts = {section.name: section.text for section in sections}
+    sizes = {section.name: estimate_tokens(section.text, chars_per_token) for section in sections}
+    excess = sum(sizes.values()) - budget_tokens
+
+    for section in sorted(sections, key=lambda section: section.priority):
+        if excess <= 0:
+            break
+        size = sizes[section.name]
+        target = max(section.min_tokens, size - excess)
+        if target >= size:
+            continue
+
+        texts[section.name] = trim_to_tokens(section.text, target, chars_per_token)
+        trimmed_size = estimate_tokens(texts[section.name], chars_per_token)
+        excess -= size - trimmed_size
+        logger.info(f"Trimmed prompt section {section.name!r} from ~{size} to ~{trimmed_size} tokens")
+
+    if excess > 0:
+        logger.warning(f"Prompt exceeds its input budget by ~{excess} tokens after trimming every section to its minimum")
+    return texts
+
+def max_tokens_for_words(word_limit: int, tokens_per_word: float) -> int:
+    """Output token limit for a text of at most word_limit words"""
+    return math.ceil(word_limit * tokens_per_word)
+
+def record_token_usage(operation: str, prompt_tokens: Optional[int], completion_tokens: Optional[int]) -> None:
+    """Record the tokens sent to and generated by a model for one request"""
+    if prompt_tokens is not None:
+        LLM_TOKENS.labels(operation=operation, direction="in").observe(prompt_tokens)
+    if completion_tokens is not None:
+        LLM_TOKENS.labels(operation=operation, direction="out").observe(completion_tokens)
@@ -1 +1 @@
-from .limiter import setup_rate_limiting, limiter, get_remote_address 
\ No newline at end of file
+from .limiter import setup_rate_limiting, limiter, get_remote_address, hit_shared_limit
\ No newline at end of file
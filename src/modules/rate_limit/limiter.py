@@ -3,13 +3,16 @@ Rate limiting implementation for the API.
 Uses slowapi to implement IP-based rate limiting with standard headers.
 """
 import logging
-from typing import Dict, Any
 from fastapi import FastAPI, Request
 from fastapi.responses import JSONResponse
+from limits import parse
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from slowapi.middleware import SlowAPIMiddleware
+from slowapi.wrappers import Limit
+
+from config import Settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -39,13 +42,43 @@ def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> JSO
     
     return response
 
-def setup_rate_limiting(app: FastAPI, config: Dict[str, Any]) -> None:
+def hit_shared_limit(request: Request, limit_value: str, scope: str) -> None:
+    """
+    Count one hit against a shared limit, like a request to an endpoint
+    decorated with @limiter.shared_limit(limit_value, scope=scope).
+    
+    For endpoints that do several units of work per request (batch items),
+    which account each unit separately.
+    
+    Args:
+        request: The request, identifying the client
+        limit_value: The limit, e.g. "5/hour"
+        scope: Name of the shared limit
+        
+    Raises:
+        RateLimitExceeded: If the limit is exhausted (the hit is not counted)
+    """
+    limit = Limit(
+        parse(limit_value),
+        key_func=get_remote_address,
+        scope=scope,
+        per_method=False,
+        methods=None,
+        error_message=None,
+        exempt_when=None,
+        cost=1,
+        override_defaults=True,
+    )
+    if not limiter.limiter.hit(limit.limit, limit.key_func(request), scope):
+        raise RateLimitExceeded(limit)
+
+def setup_rate_limiting(app: FastAPI, settings: Settings) -> None:
     """
     Configure rate limiting for the FastAPI application.
     
     Args:
         app: The FastAPI application instance
-        config: Configuration dict containing rate limit settings
+        settings: Application settings containing the rate limits
     """
     # Store limiter in app state (required by slowapi)
     app.state.limiter = limiter
@@ -57,10 +90,9 @@ def setup_rate_limiting(app: FastAPI, config: Dict[str, Any]) -> None:
     app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
     
     # Log rate limiting configuration
-    env = config.get("env", "development")
-    limits = config.get("rate_limits", {})
-    logger.info(f"Rate limiting enabled in {env} environment")
-    logger.info(f"Global rate limit: {limits.get('global', 'Not set')}")
+    limits = settings.rate_limits
+    logger.info(f"Rate limiting enabled in {settings.env} environment")
+    logger.info(f"Global rate limit: {limits.global_limit}")
     
-    for endpoint, limit in limits.get("endpoints", {}).items():
+    for endpoint, limit in limits.endpoints.items():
         logger.info(f"Endpoint rate limit - {endpoint}: {limit}") 
\ No newline at end of file
@@ -0,0 +1,8 @@
+from .policy import (
+    RetryBudget,
+    RetryPolicy,
+    build_retry_policy,
+    get_retry_budget,
+    is_retryable_status,
+    parse_retry_after,
+)
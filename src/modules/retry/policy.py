@@ -0,0 +1,226 @@
+"""
+Async retry policy shared by the external API integrations.
+
+Retries sleep with asyncio.sleep (never blocking the event loop), use
+exponential backoff with full jitter, honour upstream Retry-After hints (giving
+up when the upstream asks for a longer wait than we are willing to hold a
+request for) and
+draw from a per-process retry budget so that an upstream outage cannot turn
+into a retry storm.
+"""
+import asyncio
+import logging
+import random
+import time
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Tuple
+
+from config import get_settings
+from modules.monitoring.prometheus import API_RETRIES, API_RETRY_BACKOFF, API_RETRY_BUDGET_EXHAUSTED
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# HTTP status codes that indicate a transient upstream problem
+RETRYABLE_STATUS_CODES = {408, 425, 429, 500, 502, 503, 504}
+
+def is_retryable_status(status_code: Optional[int]) -> bool:
+    """Return True if an HTTP status code is worth retrying"""
+    return status_code in RETRYABLE_STATUS_CODES
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """
+    Parse a Retry-After header value.
+
+    Args:
+        value: Header value, either delta-seconds or an HTTP date
+
+    Returns:
+        Number of seconds to wait, or None if the header is missing/invalid
+    """
+    if not value:
+        return None
+
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at is None:
+        return None
+    return max(0.0, retry_at.timestamp() - time.time())
+
+
+class RetryBudget:
+    """
+    Sliding-window cap on the number of retries a process may perform.
+
+    Shared by every call to the same upstream, so when the upstream is down the
+    first few failures are retried and the rest fail fast.
+    """
+    def __init__(self, max_retries: int, window_seconds: float):
+        self.max_retries = max_retries
+        self.window_seconds = window_seconds
+        self._timestamps: Deque[float] = deque()
+
+    def try_acquire(self) -> bool:
+        """Consume one retry from the budget; return False if none are left"""
+        now = time.monotonic()
+        while self._timestamps and now - self._timestamps[0] > self.window_seconds:
+            self._timestamps.popleft()
+
+        if len(self._timestamps) >= self.max_retries:
+            return False
+
+        self._timestamps.append(now)
+        return True
+
+
+class RetryPolicy:
+    """
+    Retry an async operation with jittered exponential backoff.
+
+    Usage:
+        policy = RetryPolicy("openrouter", classify=classify_openrouter_error)
+        result = await policy.call(do_request, payload)
+
+    The classify callable decides whether an exception is retryable. It returns a
+    (retryable, reason, retry_after) tuple where reason is used as a metric label
+    and retry_after (seconds) overrides the computed backoff when provided. A
+    retry_after above max_retry_after is not waited for: the exception is
+    raised so the caller can pass the hint on to its own client.
+    """
+    def __init__(
+        self,
+        api_name: str,
+        classify: Callable[[BaseException], Tuple[bool, str, Optional[float]]],
+        max_attempts: int = 3,
+        base_delay: float = 1.0,
+        max_delay: float = 10.0,
+        max_retry_after: float = 30.0,
+        budget: Optional[RetryBudget] = None,
+    ):
+        self.api_name = api_name
+        self.classify = classify
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_retry_after = max_retry_after
+        self.budget = budget
+
+    def compute_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        """
+        Compute how long to wait before the next attempt.
+
+        Args:
+            attempt: Zero-based index of the attempt that just failed
+            retry_after: Upstream Retry-After hint in seconds, if any (at most
+                max_retry_after; call() gives up on longer ones)
+
+        Returns:
+            Delay in seconds
+        """
+        if retry_after is not None:
+            return retry_after
+
+        # Full jitter: uniform in [0, min(cap, base * 2^attempt)]
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def call(self, func: Callable[..., Awaitable[Any]], *args, **kwargs) -> Any:
+        """
+        Call func(*args, **kwargs), retrying retryable failures.
+
+        Raises:
+            The last exception raised by func if it is not retryable, the attempts
+            are exhausted, the upstream asked to wait longer than max_retry_after
+            or the retry budget is empty.
+        """
+        for attempt in range(self.max_attempts):
+            try:
+                return await func(*args, **kwargs)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                retryable, reason, retry_after = self.classify(e)
+
+                if not retryable or attempt == self.max_attempts - 1:
+                    raise
+
+                if retry_after is not None and retry_after > self.max_retry_after:
+                    logger.warning(
+                        f"{self.api_name} asked to retry after {retry_after:.0f}s "
+                        f"(more than {self.max_retry_after:.0f}s), not retrying: {str(e)}"
+                    )
+                    raise
+
+                if self.budget is not None and not self.budget.try_acquire():
+                    logger.warning(f"{self.api_name} retry budget exhausted, not retrying: {str(e)}")
+                    API_RETRY_BUDGET_EXHAUSTED.labels(api_name=self.api_name).inc()
+                    raise
+
+                delay = self.compute_delay(attempt, retry_after)
+                logger.warning(
+                    f"{self.api_name} call failed (attempt {attempt+1}/{self.max_attempts}, "
+                    f"reason={reason}), retrying in {delay:.2f}s: {str(e)}"
+                )
+                API_RETRIES.labels(api_name=self.api_name, reason=reason).inc()
+                API_RETRY_BACKOFF.labels(api_name=self.api_name).inc(delay)
+
+                await asyncio.sleep(delay)
+
+
+# Retry budgets are per upstream and shared by all policies for that upstream
+_budgets: Dict[str, RetryBudget] = {}
+
+def get_retry_budget(api_name: str) -> RetryBudget:
+    """
+    Return the process-wide retry budget for an upstream API.
+
+    The budget is rebuilt (starting empty) when its settings changed since
+    it was created, e.g. after a settings reload.
+    """
+    retry_config = get_settings().retry
+    budget = _budgets.get(api_name)
+    if (
+        budget is None
+        or budget.max_retries != retry_config.budget_max_retries
+        or budget.window_seconds != retry_config.budget_window_seconds
+    ):
+        budget = _budgets[api_name] = RetryBudget(
+            max_retries=retry_config.budget_max_retries,
+            window_seconds=retry_config.budget_window_seconds,
+        )
+    return budget
+
+def build_retry_policy(
+    api_name: str,
+    classify: Callable[[BaseException], Tuple[bool, str, Optional[float]]],
+    max_attempts: Optional[int] = None,
+) -> RetryPolicy:
+    """
+    Build a RetryPolicy for an upstream API from the application config.
+
+    Args:
+        api_name: Upstream name used for metrics and the shared retry budget
+        classify: Callable deciding whether an exception is retryable
+        max_attempts: Override for the configured number of attempts
+
+    Returns:
+        A RetryPolicy drawing from the upstream's shared retry budget
+    """
+    retry_config = get_settings().retry
+    return RetryPolicy(
+        api_name=api_name,
+        classify=classify,
+        max_attempts=max_attempts or retry_config.max_attempts,
+        base_delay=retry_config.base_delay,
+        max_delay=retry_config.max_delay,
+        max_retry_after=retry_config.max_retry_after,
+        budget=get_retry_budget(api_name),
+    )
@@ -0,0 +1 @@
+from .guard import FieldRule, UploadGuardMiddleware, sniff_file_type
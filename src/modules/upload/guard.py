@@ -0,0 +1,218 @@
+"""
+Streaming validation of multipart file uploads.
+
+The multipart form is normally parsed (and every file spooled to disk) before an
+endpoint runs, so size and type checks in the endpoint only happen after the
+whole upload has been received. UploadGuardMiddleware instead inspects the
+request body as it streams in: it enforces per-field size limits, rejecting the
+request as soon as a limit is crossed, and sniffs the magic bytes at the start
+of each file so that mislabelled files never reach the document or image
+processing code.
+"""
+import logging
+from typing import Dict, Iterable, Optional
+
+from fastapi import HTTPException, status
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    from python_multipart.multipart import MultipartParser, parse_options_header
+except ImportError:  # python-multipart < 0.0.13
+    from multipart.multipart import MultipartParser, parse_options_header
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Leading bytes identifying the file types we accept
+MAGIC_BYTES = {
+    "pdf": [b"%PDF-"],
+    "docx": [b"PK\x03\x04"],  # DOCX is a zip package
+    "png": [b"\x89PNG\r\n\x1a\n"],
+    "jpeg": [b"\xff\xd8\xff"],
+}
+
+# Bytes needed before a file type can be decided
+SNIFF_BYTES = max(len(magic) for magics in MAGIC_BYTES.values() for magic in magics)
+
+# Allowance for the multipart framing and the non-file form fields
+FORM_OVERHEAD_BYTES = 1024 * 1024
+
+def sniff_file_type(head: bytes) -> Optional[str]:
+    """
+    Identify a file type from its first bytes.
+
+    Returns:
+        One of the MAGIC_BYTES keys, or None if the type is not recognized
+    """
+    for file_type, magics in MAGIC_BYTES.items():
+        if any(head.startswith(magic) for magic in magics):
+            return file_type
+    return None
+
+
+class FieldRule:
+    """
+    Limits for one file field of a multipart form.
+
+    Args:
+        max_bytes: Maximum size of each file
+        allowed_types: File types (MAGIC_BYTES keys) accepted for the field
+        max_files: Maximum number of files sent under the field name
+    """
+    def __init__(self, max_bytes: int, allowed_types: Iterable[str], max_files: int = 1):
+        self.max_bytes = max_bytes
+        self.allowed_types = set(allowed_types)
+        self.max_files = max_files
+
+
+class _MultipartInspector:
+    """Incremental multipart parser that checks file parts against FieldRules"""
+    def __init__(self, boundary: bytes, rules: Dict[str, FieldRule]):
+        self.rules = rules
+        self.max_total_bytes = sum(rule.max_bytes * rule.max_files for rule in rules.values()) + FORM_OVERHEAD_BYTES
+        self.total_bytes = 0
+        self.file_counts: Dict[str, int] = {}
+
+        self._header_field = b""
+        self._header_value = b""
+        self._field: Optional[str] = None
+        self._size = 0
+        self._head = b""
+        self._sniffed = False
+
+        self._parser = MultipartParser(boundary, callbacks={
+            "on_part_begin": self._on_part_begin,
+            "on_header_field": self._on_header_field,
+            "on_header_value": self._on_header_value,
+            "on_header_end": self._on_header_end,
+            "on_part_data": self._on_part_data,
+            "on_part_end": self._on_part_end,
+        })
+
+    def feed(self, chunk: bytes) -> None:
+        self.total_bytes += len(chunk)
+        if self.total_bytes > self.max_total_bytes:
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail="Upload too large"
+            )
+        self._parser.write(chunk)
+
+    def _on_part_begin(self) -> None:
+        self._field = None
+        self._size = 0
+        self._head = b""
+        self._sniffed = False
+
+    def _on_header_field(self, data: bytes, start: int, end: int) -> None:
+        self._header_field += data[start:end]
+
+    def _on_header_value(self, data: bytes, start: int, end: int) -> None:
+        self._header_value += data[start:end]
+
+    def _on_header_end(self) -> None:
+        if self._header_field.lower() == b"content-disposition":
+            _, options = parse_options_header(self._header_value)
+            name = options.get(b"name", b"").decode("latin-1")
+            if name in self.rules:
+                self._field = name
+                self._count_file(name)
+        self._header_field = b""
+        self._header_value = b""
+
+    def _count_file(self, name: str) -> None:
+        count = self.file_counts.get(name, 0) + 1
+        self.file_counts[name] = count
+        if count > self.rules[name].max_files:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid {name}: At most {self.rules[name].max_files} files can be uploaded"
+            )
+
+    def _on_part_data(self, data: bytes, start: int, end: int) -> None:
+        if self._field is None:
+            return
+
+        rule = self.rules[self._field]
+        self._size += end - start
+        if self._size > rule.max_bytes:
+            max_size_mb = rule.max_bytes / (1024 * 1024)
+            raise HTTPException(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                detail=f"Invalid {self._field}: File too large. Maximum allowed size is {max_size_mb:g}MB"
+            )
+
+        if not self._sniffed:
+            self._head += data[start:end][:SNIFF_BYTES]
+            if len(self._head) >= SNIFF_BYTES:
+                self._check_type()
+
+    def _on_part_end(self) -> None:
+        # Empty parts are optional file fields left blank; short files are sniffed here
+        if self._field is not None and not self._sniffed and self._size > 0:
+            self._check_type()
+
+    def _check_type(self) -> None:
+        self._sniffed = True
+        rule = self.rules[self._field]
+        file_type = sniff_file_type(self._head)
+        if file_type not in rule.allowed_types:
+            allowed = ", ".join(sorted(rule.allowed_types))
+            raise HTTPException(
+                status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+                detail=f"Invalid {self._field}: File content is not a valid {allowed} file"
+            )
+
+
+class UploadGuardMiddleware:
+    """
+    ASGI middleware validating multipart uploads while they stream in.
+
+    Args:
+        app: The ASGI application
+        rules: {path: {field name: FieldRule}} for the endpoints to guard
+    """
+    def __init__(self, app: ASGIApp, rules: Dict[str, Dict[str, FieldRule]]):
+        self.app = app
+        self.rules = rules
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.rules:
+            await self.app(scope, receive, send)
+            return
+
+        headers = Headers(scope=scope)
+        content_type, options = parse_options_header(headers.get("content-type", ""))
+        boundary = options.get(b"boundary")
+        if content_type != b"multipart/form-data" or not boundary:
+            await self.app(scope, receive, send)
+            return
+
+        inspector = _MultipartInspector(boundary, self.rules[scope["path"]])
+
+        # Reject on the declared length before reading any of the body
+        content_length = headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > inspector.max_total_bytes:
+            logger.warning(f"Rejected {content_length} byte upload to {scope['path']} before reading it")
+            response = JSONResponse(
+                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                content={"detail": "Upload too large"}
+            )
+            await response(scope, receive, send)
+            return
+
+        async def guarded_receive() -> Message:
+            message = await receive()
+            if message["type"] == "http.request" and message.get("body"):
+                try:
+                    inspector.feed(message["body"])
+                except HTTPException as e:
+                    # FastAPI re-raises HTTPExceptions from body parsing as-is, so
+                    # this aborts the upload and becomes the response
+                    logger.warning(f"Rejected upload to {scope['path']} while streaming: {e.detail}")
+                    raise
+            return message
+
+        await self.app(scope, guarded_receive, send)